@@ -0,0 +1,222 @@
+"""Hot/cold tiering: detections older than HF_RETENTION_DAYS leave the database.
+
+Each UTC day past the cutoff is written as gzipped JSON lines, one file per run, under
+`HF_ARCHIVE_DIR/<kind>/day=YYYY-MM-DD/` for kind detections (by created_at), verifications
+(with their detection) and events (fire events, by last_seen). A day's files are complete
+and renamed into place before any of its rows are deleted, and deletes then go in
+HF_ARCHIVE_BATCH_SIZE batches, one short transaction each, so voting never waits long. Each
+batch deletes exactly the votes it wrote and bumps the data version, so ETags and cached
+bodies that still include the archived rows are not served again.
+Hourly metrics rollups before the cutoff are folded into `metricsdailyrollup`, so historical
+metric windows still add up.
+
+A run interrupted between writing and deleting leaves the rows in both places; the next run
+archives them again into a new file and `iter_archive` keeps one copy per id.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from enum import Enum
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .config import settings
+from .db import get_session
+from .repositories import (
+    DataVersionRepository,
+    DetectionRepository,
+    FireEventRepository,
+    MetricsRollupRepository,
+    VerificationRepository,
+)
+
+KINDS = ("detections", "verifications", "events")
+
+
+@dataclass
+class ArchiveStats:
+    cutoff: str = ""
+    days: int = 0
+    detections: int = 0
+    verifications: int = 0
+    events: int = 0
+    rollup_days: int = 0
+
+
+def _jsonable(v: Any) -> Any:
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Enum):
+        return v.value
+    return v
+
+
+class _PartWriter:
+    """One gzipped JSONL file, visible under its final name only once closed without error."""
+
+    def __init__(self, archive_dir: str, kind: str, day: date) -> None:
+        self.dir = os.path.join(archive_dir, kind, f"day={day.isoformat()}")
+        self.path = os.path.join(self.dir, f"part-{time.time_ns()}.jsonl.gz")
+        self.rows = 0
+        self._tmp = ""
+        self._file: Optional[IO[bytes]] = None
+
+    def __enter__(self) -> "_PartWriter":
+        os.makedirs(self.dir, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(dir=self.dir, prefix=".part-")
+        self._file = gzip.GzipFile(fileobj=os.fdopen(fd, "wb"), mode="wb")
+        return self
+
+    def write(self, rows: Iterable[Dict[str, Any]]) -> None:
+        assert self._file is not None
+        for row in rows:
+            self._file.write(json.dumps({k: _jsonable(v) for k, v in row.items()}, separators=(",", ":")).encode("utf-8"))
+            self._file.write(b"\n")
+            self.rows += 1
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        assert self._file is not None
+        raw = self._file.fileobj
+        self._file.close()
+        raw.flush()  # type: ignore[union-attr]
+        os.fsync(raw.fileno())  # type: ignore[union-attr]
+        raw.close()  # type: ignore[union-attr]
+        if exc_type is None and self.rows:
+            os.replace(self._tmp, self.path)
+        else:
+            os.unlink(self._tmp)
+
+
+def _chunks(items: Sequence[str], size: int) -> Iterator[Sequence[str]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _midnight(d: date) -> datetime:
+    return datetime(d.year, d.month, d.day, tzinfo=timezone.utc)
+
+
+class Archiver:
+    def __init__(
+        self,
+        archive_dir: Optional[str] = None,
+        retention_days: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ) -> None:
+        self.archive_dir = archive_dir or settings.archive_dir
+        self.retention_days = retention_days if retention_days is not None else settings.retention_days
+        self.batch_size = batch_size or settings.archive_batch_size
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """UTC midnight starting the oldest day that stays in the database."""
+        now = now or datetime.now(timezone.utc)
+        return _midnight((now - timedelta(days=self.retention_days)).date())
+
+    def plan(self, now: Optional[datetime] = None) -> ArchiveStats:
+        """What `run` would move, without touching anything."""
+        cutoff = self.cutoff(now)
+        with get_session() as s:
+            return ArchiveStats(
+                cutoff=cutoff.isoformat(),
+                detections=DetectionRepository(s).count_created_before(cutoff),
+                verifications=VerificationRepository(s).count_for_detections_before(cutoff),
+                events=len(FireEventRepository(s).column_dicts_last_seen_before(cutoff)),
+            )
+
+    def run(self, now: Optional[datetime] = None) -> ArchiveStats:
+        cutoff = self.cutoff(now)
+        stats = ArchiveStats(cutoff=cutoff.isoformat())
+        with get_session() as s:
+            oldest = DetectionRepository(s).oldest_created_at()
+        if oldest is not None:
+            day = oldest.date()
+            while _midnight(day) < cutoff:
+                if self._archive_day(day, stats):
+                    stats.days += 1
+                day += timedelta(days=1)
+        self._archive_events(cutoff, stats)
+        with get_session() as s:
+            stats.rollup_days = MetricsRollupRepository(s).compact_before(cutoff)
+            s.commit()
+        return stats
+
+    def _archive_day(self, day: date, stats: ArchiveStats) -> bool:
+        start = _midnight(day)
+        with get_session() as s:
+            detections = DetectionRepository(s)
+            votes = VerificationRepository(s)
+            ids = detections.ids_created_between(start, start + timedelta(days=1))
+            if not ids:
+                return False
+            chunks = list(_chunks(ids, self.batch_size))
+            vote_ids: List[List[int]] = []
+            with _PartWriter(self.archive_dir, "detections", day) as dw, \
+                    _PartWriter(self.archive_dir, "verifications", day) as vw:
+                for chunk in chunks:
+                    dw.write(detections.column_dicts(chunk))
+                    rows = votes.column_dicts_for_detections(chunk)
+                    vw.write(rows)
+                    vote_ids.append([r["id"] for r in rows])
+            s.rollback()  # end the read transaction before the deletes
+
+            # Only the votes just written are deleted. A detection that got a vote since keeps it
+            # and stays in the database; the next run archives both (iter_archive dedups by id).
+            for chunk, chunk_votes in zip(chunks, vote_ids):
+                votes.delete_many(chunk_votes)
+                detections.delete_without_votes(chunk)
+                DataVersionRepository(s).bump()  # cached map and metrics bodies included these rows
+                s.commit()
+        stats.detections += dw.rows
+        stats.verifications += vw.rows
+        return True
+
+    def _archive_events(self, cutoff: datetime, stats: ArchiveStats) -> None:
+        with get_session() as s:
+            events = FireEventRepository(s)
+            rows = events.column_dicts_last_seen_before(cutoff)
+            by_day: Dict[date, List[Dict[str, Any]]] = {}
+            for row in rows:
+                by_day.setdefault(row["last_seen"].date(), []).append(row)
+            for day, day_rows in sorted(by_day.items()):
+                with _PartWriter(self.archive_dir, "events", day) as w:
+                    w.write(day_rows)
+            for chunk in _chunks([r["id"] for r in rows], self.batch_size):
+                events.delete(chunk)
+                DataVersionRepository(s).bump()
+                s.commit()
+        stats.events += len(rows)
+
+
+def iter_archive(
+    kind: str, start: date, end: date, archive_dir: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """Archived rows of `kind` for the days in [start, end], day by day (values as JSON types).
+
+    Rows archived twice by an interrupted run are returned once.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    base = os.path.join(archive_dir or settings.archive_dir, kind)
+    if not os.path.isdir(base):
+        return
+    for name in sorted(os.listdir(base)):
+        if not name.startswith("day="):
+            continue
+        day = date.fromisoformat(name[4:])
+        if day < start or day > end:
+            continue
+        rows: Dict[Any, Dict[str, Any]] = {}
+        for part in sorted(os.listdir(os.path.join(base, name))):
+            if not part.endswith(".jsonl.gz") or part.startswith("."):
+                continue
+            with gzip.open(os.path.join(base, name, part), "rt", encoding="utf-8") as f:
+                for line in f:
+                    row = json.loads(line)
+                    rows[row["id"]] = row
+        yield from rows.values()
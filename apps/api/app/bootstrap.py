@@ -0,0 +1,71 @@
+"""One-time database and data-directory preparation, and the check each worker runs at startup.
+
+`prepare()` migrates the schema (init_db), seeds the demo detections into an empty database,
+creates the photo shard directories and records db.SCHEMA_VERSION. It is meant to run once per
+deploy, before any worker exists: `python -m apps.api.app.cli init`, or gunicorn's `on_starting`
+hook in gunicorn.conf.py. Both also (re)create the photo directories when the schema is already
+current, e.g. for a new photos volume. A worker then only runs `startup_check()`, which per
+HF_DB_INIT is
+
+- auto: one version query, and prepare() only if the database is behind (a plain
+  `uvicorn apps.api.app.main:app` keeps working on a fresh checkout)
+- check: one version query, and a refusal to start if the database is behind
+- off: nothing
+"""
+
+from __future__ import annotations
+
+from .config import settings
+from .db import SCHEMA_VERSION, engine, ensure_sqlite_dir, get_session, init_db, schema_version
+
+INIT_MODES = ("auto", "check", "off")
+
+
+def prepare_photo_dirs() -> None:
+    if settings.save_photos:
+        from .photos import PhotoStorage
+
+        PhotoStorage(settings.photos_dir).prepare()
+
+
+def prepare(force: bool = False) -> bool:
+    """Bring the database up to SCHEMA_VERSION unless it already is; returns whether it ran."""
+    from .models import SchemaVersion
+    from .seed import seed_if_empty
+
+    ensure_sqlite_dir()
+    if not force and schema_version() >= SCHEMA_VERSION:
+        return False
+
+    prepare_photo_dirs()
+    init_db()
+    with get_session() as s:
+        seed_if_empty(s)
+        s.merge(SchemaVersion(id=1, version=SCHEMA_VERSION))
+        s.commit()
+    return True
+
+
+def startup_check(mode: str = settings.db_init) -> None:
+    if mode not in INIT_MODES:
+        raise ValueError(f"HF_DB_INIT must be one of {', '.join(INIT_MODES)}, not {mode!r}.")
+    if mode == "off":
+        return
+    if mode == "auto":
+        prepare()
+        return
+    ensure_sqlite_dir()
+    found = schema_version()
+    if found < SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema is at version {found}, this build needs {SCHEMA_VERSION}: "
+            "run `python -m apps.api.app.cli init` first."
+        )
+
+
+def prepare_before_fork() -> None:
+    """prepare() and the photo directories, then drop the pooled connections so forked workers
+    do not share them."""
+    if not prepare():
+        prepare_photo_dirs()
+    engine.dispose()
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+from .config import settings
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {c.strip().removeprefix("W/") for c in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+class ResponseCache:
+    """Small in-process LRU of serialized response bodies with a short TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None:
+                return None
+            expires, body, etag = hit
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body, etag
+
+    def put(self, key: Hashable, body: bytes, etag: str) -> Tuple[bytes, str]:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, body, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body, etag
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache(settings.response_cache_size, settings.response_cache_ttl_seconds)
+
+
+def _stream_and_cache(key: Hashable, etag: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    # Bodies up to response_cache_max_bytes are kept once fully sent; bigger ones only stream.
+    kept: Optional[List[bytes]] = []
+    size = 0
+    for chunk in chunks:
+        if kept is not None:
+            size += len(chunk)
+            if size > settings.response_cache_max_bytes:
+                kept = None
+            else:
+                kept.append(chunk)
+        yield chunk
+    if kept is not None:
+        response_cache.put(key, b"".join(kept), etag)
+
+
+def _etag(data: bytes) -> str:
+    return '"' + hashlib.sha1(data).hexdigest() + '"'
+
+
+def versioned_response(
+    request: Request,
+    key: Tuple[Hashable, ...],
+    version: int,
+    render: Callable[[], Union[bytes, Iterable[bytes]]],
+    media_type: str = "application/json",
+    window_start: Optional[Callable[[], Hashable]] = None,
+) -> Response:
+    """Serve `render()` with a strong ETag that only changes when the body does.
+
+    With `window_start` (the oldest timestamp inside the response's time window) the body is
+    fixed by (key, data version, window start), so the ETag is derived from those and a 304
+    costs no render; `render` may then return an iterator of chunks, which is streamed.
+    Without it the ETag is the hash of the body, rendered at most once per TTL bucket
+    (windows are relative to now) and kept in the response cache.
+    """
+    if window_start is not None:
+        full_key: Tuple[Hashable, ...] = (*key, version, window_start())
+        etag = _etag(repr(full_key).encode("utf-8"))
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        hit = response_cache.get(full_key)
+        if hit is None:
+            body = render()
+            if not isinstance(body, bytes):
+                chunks = _stream_and_cache(full_key, etag, body)
+                return StreamingResponse(chunks, media_type=media_type, headers=headers)
+            hit = response_cache.put(full_key, body, etag)
+        return Response(content=hit[0], media_type=media_type, headers=headers)
+
+    full_key = (*key, version, int(time.time() // max(1, settings.response_cache_ttl_seconds)))
+    hit = response_cache.get(full_key)
+    if hit is None:
+        body = render()
+        if not isinstance(body, bytes):
+            body = b"".join(body)
+        hit = response_cache.put(full_key, body, _etag(body))
+    headers = {"ETag": hit[1], "Cache-Control": "no-cache"}
+    if etag_matches(request, hit[1]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=hit[0], media_type=media_type, headers=headers)
@@ -0,0 +1,118 @@
+"""Maintenance commands.
+
+Usage: python -m apps.api.app.cli <command>
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import asdict
+from datetime import date
+from typing import List, Optional
+
+from .archive import KINDS, Archiver, iter_archive
+from .bootstrap import prepare, prepare_photo_dirs
+from .clustering import cluster_all
+from .db import SCHEMA_VERSION, init_db, get_session
+from .repositories import DataVersionRepository, DetectionRepository, MetricsRollupRepository
+from .services import VerificationService
+
+
+def init(force: bool) -> None:
+    ran = prepare(force=force)
+    if not ran:
+        prepare_photo_dirs()
+    print(f"Schema at version {SCHEMA_VERSION}; " + ("database prepared." if ran else "already up to date."))
+
+
+def rebuild_counts() -> None:
+    init_db()
+    with get_session() as s:
+        repaired = DetectionRepository(s).rebuild_counts()
+        DataVersionRepository(s).bump()
+        s.commit()
+    print(f"Rebuilt vote counters; {repaired} detection(s) repaired.")
+
+
+def rebuild_rollups() -> None:
+    init_db()
+    with get_session() as s:
+        hours = MetricsRollupRepository(s).rebuild()
+        DataVersionRepository(s).bump()
+        s.commit()
+    print(f"Rebuilt metrics rollups; {hours} hour(s) written.")
+
+
+def cluster_events() -> None:
+    init_db()
+    with get_session() as s:
+        stats = cluster_all(s, DataVersionRepository(s).bump())
+        s.commit()
+    print(
+        f"Clustered {stats.assigned} detection(s): {stats.created} new event(s), {stats.merged} merge(s)."
+    )
+
+
+def reevaluate_status(hours: Optional[int], chunk_size: int, dry_run: bool) -> None:
+    init_db()
+    with get_session() as s:
+        stats = VerificationService(s).reevaluate_statuses(hours=hours, chunk_size=chunk_size, dry_run=dry_run)
+    print(json.dumps({"dry_run": dry_run, **asdict(stats)}))
+
+
+def archive(days: Optional[int], dry_run: bool) -> None:
+    init_db()
+    archiver = Archiver(retention_days=days)
+    stats = archiver.plan() if dry_run else archiver.run()
+    print(json.dumps({"dry_run": dry_run, **asdict(stats)}))
+
+
+def archive_export(kind: str, start: date, end: date) -> None:
+    """Archived rows as JSON lines on stdout, e.g. for post-season analysis."""
+    for row in iter_archive(kind, start, end):
+        sys.stdout.write(json.dumps(row, separators=(",", ":")) + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m apps.api.app.cli")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_init = sub.add_parser("init", help="Migrate the schema and seed an empty DB, once per deploy (before workers start).")
+    p_init.add_argument("--force", action="store_true", help="run even if the schema version is current")
+    sub.add_parser("rebuild-counts", help="Recompute detection vote counters from the verification table.")
+    sub.add_parser("rebuild-rollups", help="Recompute hourly metrics rollups from the raw tables.")
+    sub.add_parser("cluster-events", help="Group detections that are not in a fire event yet.")
+    p_status = sub.add_parser(
+        "reevaluate-status", help="Re-apply the dismiss/accept rule (e.g. after HF_DISMISS_* changed)."
+    )
+    p_status.add_argument("--hours", type=int, help="only detections created within this many hours (default all)")
+    p_status.add_argument("--chunk-size", type=int, default=1000, help="rows updated per transaction")
+    p_status.add_argument("--dry-run", action="store_true", help="only count what would change")
+    p_archive = sub.add_parser("archive", help="Move detections past the retention age to archive files.")
+    p_archive.add_argument("--days", type=int, help="retention in days (default HF_RETENTION_DAYS)")
+    p_archive.add_argument("--dry-run", action="store_true", help="only count what would be archived")
+    p_export = sub.add_parser("archive-export", help="Print archived rows of a date range as JSON lines.")
+    p_export.add_argument("kind", choices=KINDS)
+    p_export.add_argument("--from", dest="start", type=date.fromisoformat, required=True, help="YYYY-MM-DD")
+    p_export.add_argument("--to", dest="end", type=date.fromisoformat, required=True, help="YYYY-MM-DD, inclusive")
+
+    args = parser.parse_args(argv)
+    if args.command == "init":
+        init(args.force)
+    elif args.command == "rebuild-counts":
+        rebuild_counts()
+    elif args.command == "rebuild-rollups":
+        rebuild_rollups()
+    elif args.command == "cluster-events":
+        cluster_events()
+    elif args.command == "reevaluate-status":
+        reevaluate_status(args.hours, args.chunk_size, args.dry_run)
+    elif args.command == "archive":
+        archive(args.days, args.dry_run)
+    elif args.command == "archive-export":
+        archive_export(args.kind, args.start, args.end)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlmodel import Session
+
+from .config import settings
+from .db import as_utc
+from .geo import KM_PER_DEG_LAT, grid_cell, grid_reach, haversine_km
+from .repositories import DetectionRepository, FireEventRepository
+
+Member = Tuple[float, float, float, str]  # lat, lon, epoch seconds, event id
+
+
+def _datetime(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+@dataclass
+class ClusterStats:
+    assigned: int = 0
+    created: int = 0
+    merged: int = 0
+
+
+class EventClusterer:
+    """Groups hotspots into fire events: a detection joins every event that has a member within
+    `radius_km` and `window_hours` of it, merging them if there are several (single linkage).
+
+    Members are kept in a grid of ~radius-sized cells, so each new point is compared with a few
+    neighbouring cells only. The grid persists between `assign` calls, so an ingestion run that
+    clusters after every batch reads each existing member from the DB once. One clusterer should
+    write at a time (the ingestion job or the CLI), as it trusts its grid between calls.
+    """
+
+    def __init__(self, radius_km: Optional[float] = None, window_hours: Optional[float] = None) -> None:
+        self.radius_km = radius_km if radius_km is not None else settings.event_radius_km
+        self.window = (window_hours if window_hours is not None else settings.event_window_hours) * 3600.0
+        self.cell_deg = self.radius_km / KM_PER_DEG_LAT
+        self._grid: Dict[Tuple[int, int], List[Member]] = defaultdict(list)
+        self._span: Optional[Tuple[float, float]] = None  # created_at range whose members are in the grid
+        self._alias: Dict[str, str] = {}  # merged-away event -> the event it was merged into
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return grid_cell(lat, lon, self.cell_deg)
+
+    def _canonical(self, event_id: str) -> str:
+        root = event_id
+        while root in self._alias:
+            root = self._alias[root]
+        while event_id != root:  # path compression
+            nxt = self._alias[event_id]
+            self._alias[event_id] = root
+            event_id = nxt
+        return root
+
+    def _neighbours(self, lat: float, lon: float, t: float) -> Set[str]:
+        ci, cj = self._cell(lat, lon)
+        di, dj = grid_reach(lat, self.radius_km, self.cell_deg)
+        hits: Set[str] = set()
+        for i in range(ci - di, ci + di + 1):
+            for j in range(cj - dj, cj + dj + 1):
+                for m_lat, m_lon, m_t, ev in self._grid.get((i, j), ()):
+                    if abs(m_t - t) > self.window:
+                        continue
+                    ev = self._canonical(ev)
+                    if ev not in hits and haversine_km(lat, lon, m_lat, m_lon) <= self.radius_km:
+                        hits.add(ev)
+        return hits
+
+    def _load(self, session: Session, lo: float, hi: float) -> None:
+        """Make sure every stored member created in [lo, hi] is in the grid."""
+        if self._span is None:
+            missing = [(lo, hi)]
+        else:
+            a, b = self._span
+            missing = ([(lo, a)] if lo < a else []) + ([(b, hi)] if hi > b else [])
+            lo, hi = min(lo, a), max(hi, b)
+        repo = DetectionRepository(session)
+        for start, end in missing:
+            for lat, lon, created_at, ev in repo.event_members_between(_datetime(start), _datetime(end)):
+                self._grid[self._cell(lat, lon)].append((lat, lon, as_utc(created_at).timestamp(), ev))
+        self._span = (lo, hi)
+
+    def _prune(self, before: float) -> None:
+        """Drop members older than `before`; they are re-read if an older hotspot turns up."""
+        if self._span is None or self._span[0] >= before:
+            return
+        for key in list(self._grid):
+            kept = [m for m in self._grid[key] if m[2] >= before]
+            if kept:
+                self._grid[key] = kept
+            else:
+                del self._grid[key]
+        self._span = (before, max(before, self._span[1]))
+
+    def assign(self, session: Session, seq: int, batch_size: int = 5000) -> ClusterStats:
+        """Cluster every detection without an event, in the caller's transaction.
+
+        Touched events get their aggregates recomputed and `change_seq = seq`.
+        """
+        detections = DetectionRepository(session)
+        events = FireEventRepository(session)
+        stats = ClusterStats()
+        while True:
+            rows = detections.unclustered(batch_size)
+            if not rows:
+                return stats
+            times = [as_utc(r[3]).timestamp() for r in rows]
+            self._load(session, min(times) - self.window, max(times) + self.window)
+
+            assignments: Dict[str, str] = {}
+            merged: Dict[str, str] = {}
+            for (det_id, lat, lon, _), t in zip(rows, times):
+                hits = self._neighbours(lat, lon, t)
+                if not hits:
+                    event_id = f"evt-{det_id}"
+                    stats.created += 1
+                else:
+                    event_id = min(hits)
+                    for other in hits - {event_id}:
+                        self._alias[other] = event_id
+                        merged[other] = event_id
+                        stats.merged += 1
+                assignments[det_id] = event_id
+                self._grid[self._cell(lat, lon)].append((lat, lon, t, event_id))
+
+            assignments = {d: self._canonical(e) for d, e in assignments.items()}
+            merged = {old: self._canonical(new) for old, new in merged.items()}
+            detections.set_event_ids(assignments)
+            detections.move_event_members(merged)
+            events.delete(merged)
+            events.refresh(set(assignments.values()) | set(merged.values()), seq)
+            stats.assigned += len(rows)
+            self._prune(max(times) - 2 * self.window)
+
+
+def cluster_all(session: Session, seq: int) -> ClusterStats:
+    """One-off clustering of everything unassigned (CLI, seed data)."""
+    return EventClusterer().assign(session, seq)
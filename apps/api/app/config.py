@@ -12,16 +12,80 @@ def _env(name: str, default: str) -> str:
 @dataclass(frozen=True)
 class Settings:
     db_url: str = _env("HF_DB_URL", "sqlite:///./var/app.db")
+    # What a worker does at startup about schema/seed (see bootstrap.py): "auto" prepares the DB
+    # when its schema version is behind, "check" refuses to start instead, "off" skips even the check.
+    db_init: str = _env("HF_DB_INIT", "auto").lower()
+    # WAL + synchronous=NORMAL + busy_timeout + mmap on every SQLite connection (multi-worker deployments).
+    sqlite_production: bool = _env("HF_SQLITE_PRODUCTION", "False").lower() in {"1", "true", "yes", "y"}
+    sqlite_busy_timeout_ms: int = int(_env("HF_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    sqlite_mmap_bytes: int = int(_env("HF_SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
     rate_limit_per_minute: int = int(_env("HF_RATE_LIMIT_PER_MINUTE", "30"))
     verify_cooldown_seconds: int = int(_env("HF_VERIFY_COOLDOWN_SECONDS", "30"))
+    # "memory" (per process) or "sqlite" (one file shared by all workers on the host).
+    limiter_backend: str = _env("HF_LIMITER_BACKEND", "memory").lower()
+    limiter_sqlite_path: str = _env("HF_LIMITER_SQLITE_PATH", "./var/limiter.db")
+    limiter_max_keys: int = int(_env("HF_LIMITER_MAX_KEYS", "100000"))
+    batch_max_items: int = int(_env("HF_BATCH_MAX_ITEMS", "50"))
+    batch_max_age_hours: int = int(_env("HF_BATCH_MAX_AGE_HOURS", "24"))
 
     dismiss_deny_threshold: int = int(_env("HF_DISMISS_DENY_THRESHOLD", "2"))
     dismiss_deny_over_confirm: bool = _env("HF_DISMISS_DENY_OVER_CONFIRM", "True").lower() in {
         "1", "true", "yes", "y"
     }
 
+    tile_cache_size: int = int(_env("HF_TILE_CACHE_SIZE", "2048"))
+    tile_cache_ttl_seconds: int = int(_env("HF_TILE_CACHE_TTL_SECONDS", "30"))
+
+    response_cache_size: int = int(_env("HF_RESPONSE_CACHE_SIZE", "256"))
+    response_cache_ttl_seconds: int = int(_env("HF_RESPONSE_CACHE_TTL_SECONDS", "5"))
+    response_cache_max_bytes: int = int(_env("HF_RESPONSE_CACHE_MAX_BYTES", str(2 * 1024 * 1024)))
+
+    stream_queue_size: int = int(_env("HF_STREAM_QUEUE_SIZE", "100"))
+    stream_max_subscribers: int = int(_env("HF_STREAM_MAX_SUBSCRIBERS", "1000"))
+    stream_keepalive_seconds: int = int(_env("HF_STREAM_KEEPALIVE_SECONDS", "15"))
+    change_feed_interval_seconds: float = float(_env("HF_CHANGE_FEED_INTERVAL_SECONDS", "1"))
+    change_feed_max_events: int = int(_env("HF_CHANGE_FEED_MAX_EVENTS", "500"))
+
+    # Hotspots within this distance and time of an event member join that fire event.
+    event_radius_km: float = float(_env("HF_EVENT_RADIUS_KM", "2"))
+    event_window_hours: float = float(_env("HF_EVENT_WINDOW_HOURS", "24"))
+
+    # GET /api/detections/nearby searches an in-memory grid of the last HF_NEARBY_HOURS of detections.
+    nearby_hours: int = int(_env("HF_NEARBY_HOURS", "24"))
+    nearby_cell_km: float = float(_env("HF_NEARBY_CELL_KM", "10"))
+    nearby_max_radius_km: float = float(_env("HF_NEARBY_MAX_RADIUS_KM", "100"))
+    nearby_max_limit: int = int(_env("HF_NEARBY_MAX_LIMIT", "500"))
+
+    # Static GeoJSON snapshots written by data-pipeline/build_geojson.py, served at /snapshots/.
+    snapshot_dir: str = _env("HF_SNAPSHOT_DIR", "./var/snapshots")
+    snapshot_windows_hours: str = _env("HF_SNAPSHOT_WINDOWS_HOURS", "6,24,72")
+    snapshot_cache_seconds: int = int(_env("HF_SNAPSHOT_CACHE_SECONDS", "30"))
+
+    # Detections older than this many days (and their votes) are moved to gzipped JSONL files.
+    retention_days: int = int(_env("HF_RETENTION_DAYS", "30"))
+    archive_dir: str = _env("HF_ARCHIVE_DIR", "./var/archive")
+    archive_batch_size: int = int(_env("HF_ARCHIVE_BATCH_SIZE", "2000"))
+
+    db_offload_threads: int = int(_env("HF_DB_OFFLOAD_THREADS", "8"))
+    io_offload_threads: int = int(_env("HF_IO_OFFLOAD_THREADS", "4"))
+
+    # Single-request votes are queued to one writer thread per worker and committed together.
+    group_commit: bool = _env("HF_GROUP_COMMIT", "True").lower() in {"1", "true", "yes", "y"}
+    group_commit_window_ms: float = float(_env("HF_GROUP_COMMIT_WINDOW_MS", "2"))
+    group_commit_max_batch: int = int(_env("HF_GROUP_COMMIT_MAX_BATCH", "200"))
+
+    # Requests slower than this are logged with the SQL they issued (0 = off).
+    slow_request_ms: int = int(_env("HF_SLOW_REQUEST_MS", "0"))
+    # When set, /api/ops/metrics requires "Authorization: Bearer <token>".
+    ops_metrics_token: str = _env("HF_OPS_METRICS_TOKEN", "")
+
     save_photos: bool = _env("HF_SAVE_PHOTOS", "True").lower() in {"1", "true", "yes", "y"}
     photos_dir: str = _env("HF_PHOTOS_DIR", "./var/photos")
+    photo_max_bytes: int = int(_env("HF_PHOTO_MAX_BYTES", str(4 * 1024 * 1024)))
+    # Background downscale/EXIF strip/thumbnail (needs Pillow); 0 workers disables it.
+    photo_workers: int = int(_env("HF_PHOTO_WORKERS", "2"))
+    photo_max_edge: int = int(_env("HF_PHOTO_MAX_EDGE", "2048"))
+    photo_thumb_edge: int = int(_env("HF_PHOTO_THUMB_EDGE", "320"))
 
 
 settings = Settings()
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import os
 import sys
+from datetime import datetime, timezone
+from typing import List, Tuple
 
 # --- SQLite fallback for environments where built-in sqlite3 is broken (common on some Anaconda setups)
 try:
@@ -11,17 +13,148 @@ except Exception:
     sys.modules["sqlite3"] = pysqlite3
 # --------------------------------------------------------------------
 
+from sqlalchemy import event, inspect, text
 from sqlmodel import SQLModel, create_engine, Session
 
 from .config import settings
-
-os.makedirs("./var", exist_ok=True)
+from .telemetry import install_sqlalchemy_hooks
 
 engine = create_engine(settings.db_url, echo=False)
+install_sqlalchemy_hooks(engine)
+
+
+if settings.sqlite_production and engine.dialect.name == "sqlite":
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record) -> None:  # type: ignore[no-untyped-def]
+        # WAL lets readers run alongside the single writer; NORMAL only fsyncs at checkpoints
+        # (a power cut can lose the last commits, never corrupt the file); busy_timeout makes
+        # a second worker wait for the write lock instead of failing with "database is locked".
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cur.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_bytes)}")
+        cur.close()
+
+# Bump whenever init_db gains a migration step. bootstrap.prepare() records it once init_db and
+# the seed have run, so workers can start with a single version query instead of inspecting
+# every table.
+SCHEMA_VERSION = 1
+
+# Columns added after the first release. create_all() never alters existing tables,
+# so these are added in place on startup: (table, column, DDL).
+_ADDED_COLUMNS: List[Tuple[str, str, str]] = [
+    ("detection", "confirms", "INTEGER NOT NULL DEFAULT 0"),
+    ("detection", "denies", "INTEGER NOT NULL DEFAULT 0"),
+    ("detection", "unsure", "INTEGER NOT NULL DEFAULT 0"),
+    ("detection", "early_votes", "INTEGER NOT NULL DEFAULT 0"),
+    ("detection", "geohash", "VARCHAR NOT NULL DEFAULT ''"),
+    ("detection", "change_seq", "INTEGER NOT NULL DEFAULT 0"),
+    ("detection", "updated_at", "TIMESTAMP"),
+    ("detection", "event_id", "VARCHAR"),
+]
+
+
+# Single-column indexes of the first release, superseded by the composite ones declared on
+# the models (every insert paid for all of them; none matched a real query).
+_DROPPED_INDEXES: List[str] = [
+    "ix_detection_created_at",
+    "ix_detection_confidence",
+    "ix_detection_status",
+    "ix_verification_detection_id",
+    "ix_verification_verdict",
+    "ix_verification_device_fp_hash",
+    "ix_verification_ip_hash",
+]
+
+
+def _add_missing_columns() -> List[str]:
+    insp = inspect(engine)
+    added: List[str] = []
+    with engine.begin() as conn:
+        for table, column, ddl in _ADDED_COLUMNS:
+            existing = {c["name"] for c in insp.get_columns(table)}
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+                added.append(f"{table}.{column}")
+    return added
+
+
+def _sync_indexes() -> int:
+    """Bring indexes on existing tables in line with the models; returns duplicate votes removed.
+
+    Before the unique (detection_id, device_fp_hash) index existed, two concurrent votes from
+    one device could both get in; the earliest of each such group is kept.
+    """
+    removed = 0
+    with engine.begin() as conn:
+        existing = {ix["name"] for ix in inspect(conn).get_indexes("verification")}
+        if "uq_verification_detection_device" not in existing:
+            result = conn.execute(text(
+                "DELETE FROM verification WHERE id NOT IN "
+                "(SELECT MIN(id) FROM verification GROUP BY detection_id, device_fp_hash)"
+            ))
+            removed = int(result.rowcount or 0)
+        for name in _DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        # create_all() skips indexes on tables that already existed.
+        for tbl in SQLModel.metadata.sorted_tables:
+            for index in tbl.indexes:
+                index.create(conn, checkfirst=True)
+    return removed
+
+
+def ensure_sqlite_dir() -> None:
+    """Create the directory of a SQLite database file (SQLite creates the file, not its parent)."""
+    path = engine.url.database
+    if engine.dialect.name == "sqlite" and path and path != ":memory:" and not path.startswith("file:"):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+
+def schema_version() -> int:
+    """The SCHEMA_VERSION this database was last prepared for; 0 before the first bootstrap."""
+    from .models import SchemaVersion
+
+    if not inspect(engine).has_table(SchemaVersion.__tablename__):
+        return 0
+    with get_session() as s:
+        row = s.get(SchemaVersion, 1)
+    return row.version if row is not None else 0
 
 
 def init_db() -> None:
+    # Registers every table (and index) on SQLModel.metadata; _sync_indexes drops the
+    # superseded indexes, so it must never run against a partial metadata.
+    from .models import DataVersion
+
+    ensure_sqlite_dir()
+    existing = set(inspect(engine).get_table_names())
     SQLModel.metadata.create_all(engine)
+    added = _add_missing_columns()
+    duplicates = _sync_indexes()
+
+    with get_session() as s:
+        if s.get(DataVersion, 1) is None:
+            s.add(DataVersion(id=1, version=0))
+            s.commit()
+
+    if existing and (added or duplicates or "metricsrollup" not in existing or "fireevent" not in existing):
+        # Derived columns/tables were just created (or votes removed) on an existing DB: fill them from the raw tables.
+        from .clustering import cluster_all
+        from .repositories import DataVersionRepository, DetectionRepository, MetricsRollupRepository
+
+        with get_session() as s:
+            DetectionRepository(s).rebuild_counts()
+            DetectionRepository(s).backfill_geohash()
+            MetricsRollupRepository(s).rebuild()
+            cluster_all(s, DataVersionRepository(s).bump())
+            s.commit()
+
+
+def as_utc(dt: datetime) -> datetime:
+    """`dt` as an aware UTC datetime: SQLite hands datetimes back naive; they are stored in UTC."""
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
 
 
 def get_session() -> Session:
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .db import get_session
+from .geojson import FEATURE_COLUMNS, row_to_feature
+from .repositories import DataVersionRepository, DetectionRepository
+from .tiles import tile_cache
+
+logger = logging.getLogger(__name__)
+
+Event = Dict[str, Any]
+
+
+class Broadcaster:
+    """In-process fan-out of small map events to Server-Sent Events subscribers.
+
+    `publish` may be called from the event loop or from threadpool routes; delivery always
+    happens on the loop. A subscriber that falls `queue_size` events behind gets its queue
+    replaced by a single `resync` event so it reloads instead of holding memory.
+    """
+
+    def __init__(self, queue_size: int, max_subscribers: int) -> None:
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: Set["asyncio.Queue[Event]"] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator["asyncio.Queue[Event]"]:
+        self._loop = asyncio.get_running_loop()
+        q: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(q)
+        try:
+            yield q
+        finally:
+            self._subscribers.discard(q)
+
+    def publish(self, event: Event) -> None:
+        loop = self._loop
+        if loop is None or not self._subscribers or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(event)
+        else:
+            loop.call_soon_threadsafe(self._deliver, event)
+
+    def _deliver(self, event: Event) -> None:
+        for q in list(self._subscribers):
+            try:
+                q.put_nowait(event)
+            except asyncio.QueueFull:
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait({"type": "resync"})
+
+
+broadcaster = Broadcaster(settings.stream_queue_size, settings.stream_max_subscribers)
+
+
+class ChangeFeed:
+    """Per-worker poller of `Detection.change_seq`.
+
+    Every worker tails the same DB-backed change sequence, so writes made by other workers or
+    by out-of-process ingestion reach this worker's SSE listeners and tile cache. One indexed
+    query per interval per worker, regardless of how many clients are connected.
+    """
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self.cursor: Optional[int] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def poll(self) -> List[Event]:
+        """Fetch changes after the cursor, drop their tiles, and return the events to push."""
+        with get_session() as s:
+            if self.cursor is None:
+                self.cursor = DataVersionRepository(s).current()
+                return []
+            limit = settings.change_feed_max_events
+            rows = DetectionRepository(s).changes_since(self.cursor, FEATURE_COLUMNS, limit=limit + 1)
+            if len(rows) > limit:
+                # Bulk change (ingestion, repair): drop every tile and have clients reload
+                # rather than pushing thousands of single features.
+                self.cursor = DataVersionRepository(s).current()
+                tile_cache.clear()
+                return [{"type": "resync"}]
+        events: List[Event] = []
+        for row in rows:
+            feature = row_to_feature(row[:-1])
+            lon, lat = feature["geometry"]["coordinates"]
+            tile_cache.invalidate_point(lat, lon)
+            self.cursor = max(self.cursor, row[-1])
+            events.append({"type": "detection.changed", "cursor": row[-1], "feature": feature})
+        return events
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                events = await run_in_threadpool(self.poll)
+            except Exception:
+                logger.exception("change feed poll failed")
+                continue
+            for event in events:
+                broadcaster.publish(event)
+
+
+change_feed = ChangeFeed(settings.change_feed_interval_seconds)
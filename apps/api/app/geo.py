@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:  # NumPy is imported on first use, not at worker startup
+    import numpy as np
+
+# (min_lon, min_lat, max_lon, max_lat) – GeoJSON / Leaflet toBBoxString() order.
+BBox = Tuple[float, float, float, float]
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+GEOHASH_PRECISION = 7  # ~150 m cells; stored on every detection
+
+# Map zoom -> geohash prefix length used to cluster; None means "return points".
+_CLUSTER_PRECISION = [(6, 3), (8, 4), (10, 5), (12, 6)]
+
+
+KM_PER_DEG_LAT = 111.32
+_EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * _EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def haversine_km_many(lat: float, lon: float, lats: "np.ndarray", lons: "np.ndarray") -> "np.ndarray":
+    """`haversine_km` from (lat, lon) to every point of `lats`/`lons`, vectorized."""
+    import numpy as np
+
+    p1 = math.radians(lat)
+    p2 = np.radians(lats)
+    a = np.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(np.radians(lons - lon) / 2) ** 2
+    return 2 * _EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def grid_cell(lat: float, lon: float, cell_deg: float) -> Tuple[int, int]:
+    """Cell of a grid of `cell_deg` x `cell_deg` degree squares that holds the point."""
+    return math.floor(lat / cell_deg), math.floor(lon / cell_deg)
+
+
+def grid_reach(lat: float, radius_km: float, cell_deg: float) -> Tuple[int, int]:
+    """(rows, columns) of `grid_cell` cells either side of the one at `lat` that a circle of
+    `radius_km` around a point in it can reach."""
+    di = math.ceil(radius_km / KM_PER_DEG_LAT / cell_deg)
+    # A cell is narrower in km east-west than north-south, by cos(lat).
+    dj = math.ceil(radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01)) / cell_deg)
+    return di, dj
+
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    out = []
+    bit, ch, even = 0, 0, True
+    while len(out) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = (ch << 1) | 1
+                lon_lo = mid
+            else:
+                ch <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            out.append(_BASE32[ch])
+            bit, ch = 0, 0
+    return "".join(out)
+
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """(lat_degrees, lon_degrees) spanned by one cell at `precision`."""
+    bits = 5 * precision
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def geohash_cover(bbox: BBox, max_cells: int = 32) -> List[str]:
+    """Smallest set of equal-length geohash prefixes (at most `max_cells`) covering `bbox`."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        dlat, dlon = geohash_cell_size(precision)
+        n_lat = math.ceil((max_lat - min_lat) / dlat) + 1
+        n_lon = math.ceil((max_lon - min_lon) / dlon) + 1
+        if n_lat * n_lon <= max_cells or precision == 1:
+            break
+    cells = set()
+    for i in range(n_lat + 1):
+        lat = min(max_lat, min_lat + i * dlat)
+        for j in range(n_lon + 1):
+            lon = min(max_lon, min_lon + j * dlon)
+            cells.add(geohash_encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def parse_bbox(raw: str) -> BBox:
+    parts = [float(p) for p in raw.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    min_lon, min_lat, max_lon, max_lat = parts
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError("bbox out of range or inverted")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def cluster_precision(zoom: Optional[int]) -> Optional[int]:
+    if zoom is None:
+        return None
+    for max_zoom, precision in _CLUSTER_PRECISION:
+        if zoom <= max_zoom:
+            return precision
+    return None
@@ -1,30 +1,296 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
 
-from .models import Detection
+from .db import as_utc
+from .models import Detection, DetectionStatus, FireEvent
 
+try:  # optional fast JSON backend
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
 
-def detections_to_feature_collection(items: List[Dict[str, Any]]) -> Dict[str, Any]:
-    features = []
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# Columns selected for the fast path; `row_to_feature` reads rows in this order.
+FEATURE_COLUMNS = (
+    Detection.id,
+    Detection.lat,
+    Detection.lon,
+    Detection.created_at,
+    Detection.confidence,
+    Detection.source,
+    Detection.fwi_bucket,
+    Detection.wind_dir_deg,
+    Detection.status,
+    Detection.confirms,
+    Detection.denies,
+    Detection.unsure,
+)
+
+
+def row_to_feature(row: Sequence[Any]) -> Dict[str, Any]:
+    det_id, lat, lon, created_at, confidence, source, fwi_bucket, wind_dir_deg, status, c, d, u = row
+    return {
+        "type": "Feature",
+        "id": det_id,
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        "properties": {
+            "id": det_id,
+            "created_at": created_at.isoformat(),
+            "confidence": confidence,
+            "source": source,
+            "fwi_bucket": fwi_bucket,
+            "wind_dir_deg": wind_dir_deg,
+            "status": status.value,
+            "community": {"confirms": c, "denies": d, "unsure": u},
+        },
+    }
+
+
+# Fire events (`group=events`); `event_row_to_feature` reads rows in this order.
+EVENT_COLUMNS = (
+    FireEvent.id,
+    FireEvent.lat,
+    FireEvent.lon,
+    FireEvent.first_seen,
+    FireEvent.last_seen,
+    FireEvent.member_count,
+    FireEvent.detection_id,
+    FireEvent.max_confidence,
+    FireEvent.max_fwi_bucket,
+    FireEvent.wind_dir_deg,
+    FireEvent.status,
+    FireEvent.confirms,
+    FireEvent.denies,
+    FireEvent.unsure,
+)
+
+
+def event_row_to_feature(row: Sequence[Any]) -> Dict[str, Any]:
+    """An event shaped like a detection feature, so the same client code draws and verifies it:
+    `properties.id` is the member that votes go to, counts are summed over all members."""
+    ev_id, lat, lon, first_seen, last_seen, n, det_id, confidence, fwi_bucket, wind_dir_deg, status, c, d, u = row
+    return {
+        "type": "Feature",
+        "id": ev_id,
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        "properties": {
+            "id": det_id,
+            "event_id": ev_id,
+            "member_count": n,
+            "first_seen": first_seen.isoformat(),
+            "created_at": last_seen.isoformat(),
+            "confidence": confidence,
+            "fwi_bucket": fwi_bucket,
+            "wind_dir_deg": wind_dir_deg,
+            "status": status.value,
+            "community": {"confirms": c, "denies": d, "unsure": u},
+        },
+    }
+
+
+def cluster_to_feature(c: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "Feature",
+        "id": f"cluster:{c['cell']}",
+        "geometry": {"type": "Point", "coordinates": [c["lon"], c["lat"]]},
+        "properties": {
+            "cluster": True,
+            "cell": c["cell"],
+            "point_count": c["count"],
+            "max_confidence": c["max_confidence"],
+            "max_fwi_bucket": c["max_fwi_bucket"],
+            "community": c["counts"],
+        },
+    }
+
+
+def detection_row(d: Detection) -> tuple:
+    return tuple(getattr(d, col.key) for col in FEATURE_COLUMNS)
+
+
+def detections_to_feature_collection(
+    items: List[Dict[str, Any]],
+    clusters: Optional[List[Dict[str, Any]]] = None,
+    format: str = "geojson",
+) -> Union[Dict[str, Any], bytes]:
+    """`format="columnar"` returns the columnar dict and `"binary"` its packed bytes instead."""
+    rows = []
     for it in items:
-        d: Detection = it["detection"]
-        counts = it["counts"]
-        features.append(
-            {
-                "type": "Feature",
-                "id": d.id,
-                "geometry": {"type": "Point", "coordinates": [d.lon, d.lat]},
-                "properties": {
-                    "id": d.id,
-                    "created_at": d.created_at.isoformat(),
-                    "confidence": d.confidence,
-                    "source": d.source,
-                    "fwi_bucket": d.fwi_bucket,
-                    "wind_dir_deg": d.wind_dir_deg,
-                    "status": d.status.value,
-                    "community": counts,
-                },
-            }
-        )
+        c = it["counts"]
+        rows.append(detection_row(it["detection"])[:-3] + (c["confirms"], c["denies"], c["unsure"]))
+    if format == "columnar":
+        return detections_to_columns(rows, clusters)
+    if format == "binary":
+        return pack_columns(detections_to_columns(rows, clusters))
+    features = [row_to_feature(r) for r in rows]
+    features.extend(cluster_to_feature(c) for c in clusters or [])
     return {"type": "FeatureCollection", "features": features}
+
+
+# Compact alternatives to GeoJSON for /api/detections and /api/tiles (`format=`), decoded by
+# `decodeDetections` in app.js: one array per property instead of one object per feature,
+# coordinates as integers of 1e-5 degree (~1 m), times as epoch seconds, vote counts packed
+# as [confirms, denies, unsure] triples and strings that repeat replaced by small indexes.
+DETECTION_FORMATS = ("geojson", "columnar", "binary")
+FORMAT_MEDIA_TYPES = {
+    "geojson": "application/geo+json",
+    "columnar": "application/json",
+    "binary": "application/octet-stream",
+}
+COORD_SCALE = 100_000
+CONFIDENCE_SCALE = 1000
+STATUSES = [s.value for s in DetectionStatus]
+BINARY_MAGIC = b"HFD1"
+
+
+def detections_to_columns(
+    rows: Iterable[Sequence[Any]], clusters: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """Columnar layout of FEATURE_COLUMNS rows (plus clusters)."""
+    status_index = {s: i for i, s in enumerate(STATUSES)}
+    sources: Dict[str, int] = {}
+    ids: List[str] = []
+    lat: List[int] = []
+    lon: List[int] = []
+    t: List[int] = []
+    confidence: List[int] = []
+    source: List[int] = []
+    fwi: List[int] = []
+    wind: List[int] = []
+    status: List[int] = []
+    counts: List[int] = []
+    for det_id, la, lo, created_at, conf, src, fwi_bucket, wind_dir_deg, st, c, d, u in rows:
+        ids.append(det_id)
+        lat.append(round(la * COORD_SCALE))
+        lon.append(round(lo * COORD_SCALE))
+        t.append(int(as_utc(created_at).timestamp()))
+        confidence.append(round(conf * CONFIDENCE_SCALE))
+        source.append(sources.setdefault(src, len(sources)))
+        fwi.append(fwi_bucket)
+        wind.append(wind_dir_deg)
+        status.append(status_index[st.value])
+        counts += (c, d, u)
+
+    cl = clusters or []
+    return {
+        "type": "DetectionColumns",
+        "coord_scale": COORD_SCALE,
+        "confidence_scale": CONFIDENCE_SCALE,
+        "statuses": STATUSES,
+        "sources": list(sources),
+        "id": ids,
+        "lat": lat,
+        "lon": lon,
+        "t": t,
+        "confidence": confidence,
+        "source": source,
+        "fwi_bucket": fwi,
+        "wind_dir_deg": wind,
+        "status": status,
+        "counts": counts,
+        "clusters": {
+            "cell": [c["cell"] for c in cl],
+            "lat": [round(c["lat"] * COORD_SCALE) for c in cl],
+            "lon": [round(c["lon"] * COORD_SCALE) for c in cl],
+            "point_count": [c["count"] for c in cl],
+            "max_confidence": [round(c["max_confidence"] * CONFIDENCE_SCALE) for c in cl],
+            "max_fwi_bucket": [c["max_fwi_bucket"] for c in cl],
+            "counts": [n for c in cl for n in (c["counts"]["confirms"], c["counts"]["denies"], c["counts"]["unsure"])],
+        },
+    }
+
+
+def _typed(code: str, values: List[int]) -> bytes:
+    a = array(code, values)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a.tobytes()
+
+
+def pack_columns(cols: Dict[str, Any]) -> bytes:
+    """The columnar layout as little-endian typed arrays a browser can view without parsing.
+
+    Header: magic "HFD1", uint32 detection count n, uint32 cluster count m, uint32 length of a
+    JSON block (space-padded to 4 bytes) holding the strings (scales, statuses, sources, ids,
+    cluster cells). Then, widest first so every array is aligned: int32 lat[n] lon[n],
+    uint32 t[n] counts[3n], int32 cluster lat[m] lon[m], uint32 point_count[m] counts[3m],
+    uint16 confidence[n] wind_dir_deg[n] source[n] cluster max_confidence[m],
+    uint8 fwi_bucket[n] status[n] cluster max_fwi_bucket[m].
+    """
+    cl = cols["clusters"]
+    meta = dumps({
+        "coord_scale": cols["coord_scale"],
+        "confidence_scale": cols["confidence_scale"],
+        "statuses": cols["statuses"],
+        "sources": cols["sources"],
+        "id": cols["id"],
+        "cell": cl["cell"],
+    })
+    meta += b" " * (-len(meta) % 4)
+    return b"".join((
+        BINARY_MAGIC,
+        struct.pack("<III", len(cols["id"]), len(cl["cell"]), len(meta)),
+        meta,
+        _typed("i", cols["lat"]),
+        _typed("i", cols["lon"]),
+        _typed("I", cols["t"]),
+        _typed("I", cols["counts"]),
+        _typed("i", cl["lat"]),
+        _typed("i", cl["lon"]),
+        _typed("I", cl["point_count"]),
+        _typed("I", cl["counts"]),
+        _typed("H", cols["confidence"]),
+        _typed("H", cols["wind_dir_deg"]),
+        _typed("H", cols["source"]),
+        _typed("H", cl["max_confidence"]),
+        _typed("B", cols["fwi_bucket"]),
+        _typed("B", cols["status"]),
+        _typed("B", cl["max_fwi_bucket"]),
+    ))
+
+
+def encode_detections(
+    rows: Iterable[Sequence[Any]], clusters: Optional[List[Dict[str, Any]]] = None, format: str = "geojson"
+) -> Iterator[bytes]:
+    """FEATURE_COLUMNS rows (plus clusters) serialized in one of DETECTION_FORMATS, in byte chunks."""
+    if format == "columnar":
+        return iter([dumps(detections_to_columns(rows, clusters))])
+    if format == "binary":
+        return iter([pack_columns(detections_to_columns(rows, clusters))])
+    return iter_feature_collection(rows, clusters=clusters)
+
+
+def iter_feature_collection(
+    rows: Iterable[Sequence[Any]],
+    clusters: Optional[List[Dict[str, Any]]] = None,
+    chunk_features: int = 500,
+    to_feature: Callable[[Sequence[Any]], Dict[str, Any]] = row_to_feature,
+) -> Iterator[bytes]:
+    """Serialize FEATURE_COLUMNS rows (plus clusters) as a FeatureCollection, in byte chunks."""
+    features = (to_feature(r) for r in rows)
+    if clusters:
+        features = (f for part in (features, map(cluster_to_feature, clusters)) for f in part)
+
+    buf: List[bytes] = [b'{"type":"FeatureCollection","features":[']
+    first = True
+    for f in features:
+        if not first:
+            buf.append(b",")
+        buf.append(dumps(f))
+        first = False
+        if len(buf) >= 2 * chunk_features:
+            yield b"".join(buf)
+            buf = []
+    buf.append(b"]}")
+    yield b"".join(buf)
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right, insort
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from .config import settings
+
+T = TypeVar("T")
+
+# Abuse counters are kept per hour so /api/metrics can report them for its window.
+COUNTER_RETENTION_HOURS = 24 * 31
+
+
+def _hour(ts: float) -> int:
+    return int(ts // 3600)
+
+
+class LimiterStore(ABC):
+    """State behind the rate limiter, the verify cooldown and the abuse counters.
+
+    Entries carry an expiry after which dropping them changes nothing (a bucket that has
+    refilled, a cooldown that has passed), so stores evict freely and stay small.
+    """
+
+    @abstractmethod
+    def take(self, key: str, capacity: float, refill_per_second: float, now: float) -> bool:
+        """Token bucket: spend one token for `key` if there is one."""
+
+    @abstractmethod
+    def cooldown(self, key: str, seconds: float, now: float, horizon: float = 0.0) -> bool:
+        """True (and record an action at `now`) unless `key` acted less than `seconds` from `now`.
+
+        Actions are kept for `horizon` seconds past the cooldown so a `now` in the past (a queued
+        offline vote cast before a later live one) is checked both ways against every action
+        it could collide with, and uses up the cooldown like a live one.
+        """
+
+    @abstractmethod
+    def incr(self, name: str, now: float, amount: int = 1) -> None:
+        ...
+
+    @abstractmethod
+    def counter_totals(self, since: float) -> Dict[str, int]:
+        """Counter sums over the hours from the one containing `since` up to now."""
+
+
+def _refill(
+    row: Optional[Tuple[float, float]], capacity: float, refill_per_second: float, now: float
+) -> Tuple[bool, float, float]:
+    tokens, last = row if row is not None else (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - last) * refill_per_second)
+    ok = tokens >= 1.0
+    if ok:
+        tokens -= 1.0
+    # The bucket is indistinguishable from a new one once it has refilled.
+    expires = now + (capacity - tokens) / refill_per_second
+    return ok, tokens, expires
+
+
+class MemoryLimiterStore(LimiterStore):
+    """Per-process store: LRU dicts capped at `max_keys`, expired entries dropped as they surface."""
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        # key -> (tokens, last, expires) and key -> (sorted action times, expires)
+        self._buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+        self._cooldowns: "OrderedDict[str, Tuple[List[float], float]]" = OrderedDict()
+        self._counters: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _put(entries: "OrderedDict[str, tuple]", key: str, value: tuple, now: float, max_keys: int) -> None:
+        entries[key] = value
+        entries.move_to_end(key)
+        while entries and (len(entries) > max_keys or next(iter(entries.values()))[-1] < now):
+            entries.popitem(last=False)
+
+    def take(self, key: str, capacity: float, refill_per_second: float, now: float) -> bool:
+        with self._lock:
+            hit = self._buckets.get(key)
+            row = hit[:2] if hit is not None and hit[2] >= now else None
+            ok, tokens, expires = _refill(row, capacity, refill_per_second, now)
+            self._put(self._buckets, key, (tokens, now, expires), now, self.max_keys)
+            return ok
+
+    def cooldown(self, key: str, seconds: float, now: float, horizon: float = 0.0) -> bool:
+        with self._lock:
+            hit = self._cooldowns.get(key)
+            times = hit[0] if hit is not None else []
+            i = bisect_right(times, now - seconds)
+            if i < len(times) and times[i] < now + seconds:
+                return False
+            times = times[bisect_left(times, now - horizon - seconds):]
+            insort(times, now)
+            self._put(self._cooldowns, key, (times, times[-1] + horizon + seconds), now, self.max_keys)
+            return True
+
+    def incr(self, name: str, now: float, amount: int = 1) -> None:
+        hour = _hour(now)
+        with self._lock:
+            self._counters[(name, hour)] = self._counters.get((name, hour), 0) + amount
+            if len(self._counters) > 4 * COUNTER_RETENTION_HOURS:
+                cutoff = hour - COUNTER_RETENTION_HOURS
+                self._counters = {k: v for k, v in self._counters.items() if k[1] >= cutoff}
+
+    def counter_totals(self, since: float) -> Dict[str, int]:
+        start = _hour(since)
+        out: Dict[str, int] = {}
+        with self._lock:
+            for (name, hour), value in self._counters.items():
+                if hour >= start:
+                    out[name] = out.get(name, 0) + value
+        return out
+
+
+class SqliteLimiterStore(LimiterStore):
+    """Store in a small SQLite file shared by every worker on the host.
+
+    Kept out of the main DB so limiter writes never queue behind vote transactions. Each
+    check is one short `BEGIN IMMEDIATE` transaction; expired rows (and the oldest ones past
+    `max_keys`) are pruned every `prune_every` writes.
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL, last REAL, expires REAL)",
+        "CREATE INDEX IF NOT EXISTS ix_bucket_expires ON bucket (expires)",
+        "DROP TABLE IF EXISTS cooldown",  # one row per key, before back-dated votes were kept
+        "CREATE TABLE IF NOT EXISTS cooldown_action (key TEXT, at REAL, expires REAL, PRIMARY KEY (key, at))",
+        "CREATE INDEX IF NOT EXISTS ix_cooldown_action_expires ON cooldown_action (expires)",
+        "CREATE TABLE IF NOT EXISTS counter (name TEXT, hour INTEGER, value INTEGER, PRIMARY KEY (name, hour))",
+    )
+
+    def __init__(self, path: str, max_keys: int, busy_timeout_ms: int, prune_every: int = 1000) -> None:
+        self.path = path
+        self.max_keys = max_keys
+        self.busy_timeout_ms = busy_timeout_ms
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork (gunicorn --preload).
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # limiter state may be lost on an OS crash
+            for ddl in self._SCHEMA:
+                conn.execute(ddl)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _write(self, now: float, fn: Callable[..., T], *args: Any) -> T:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, *args)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune(now)
+        return result
+
+    @staticmethod
+    def _take(conn: sqlite3.Connection, key: str, capacity: float, refill_per_second: float, now: float) -> bool:
+        row = conn.execute("SELECT tokens, last FROM bucket WHERE key = ? AND expires >= ?", (key, now)).fetchone()
+        ok, tokens, expires = _refill(row, capacity, refill_per_second, now)
+        conn.execute(
+            "INSERT INTO bucket (key, tokens, last, expires) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "tokens = excluded.tokens, last = excluded.last, expires = excluded.expires",
+            (key, tokens, now, expires),
+        )
+        return ok
+
+    @staticmethod
+    def _cooldown(conn: sqlite3.Connection, key: str, seconds: float, now: float, horizon: float) -> bool:
+        row = conn.execute(
+            "SELECT 1 FROM cooldown_action WHERE key = ? AND at > ? AND at < ? LIMIT 1",
+            (key, now - seconds, now + seconds),
+        ).fetchone()
+        if row is not None:
+            return False
+        conn.execute(
+            "INSERT OR IGNORE INTO cooldown_action (key, at, expires) VALUES (?, ?, ?)",
+            (key, now, now + horizon + seconds),
+        )
+        return True
+
+    @staticmethod
+    def _incr(conn: sqlite3.Connection, name: str, amount: int, now: float) -> None:
+        conn.execute(
+            "INSERT INTO counter (name, hour, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (name, hour) DO UPDATE SET value = value + excluded.value",
+            (name, _hour(now), amount),
+        )
+
+    def take(self, key: str, capacity: float, refill_per_second: float, now: float) -> bool:
+        return self._write(now, self._take, key, capacity, refill_per_second, now)
+
+    def cooldown(self, key: str, seconds: float, now: float, horizon: float = 0.0) -> bool:
+        return self._write(now, self._cooldown, key, seconds, now, horizon)
+
+    def incr(self, name: str, now: float, amount: int = 1) -> None:
+        self._write(now, self._incr, name, amount, now)
+
+    def counter_totals(self, since: float) -> Dict[str, int]:
+        rows = self._conn().execute(
+            "SELECT name, SUM(value) FROM counter WHERE hour >= ? GROUP BY name", (_hour(since),)
+        ).fetchall()
+        return {name: int(total) for name, total in rows}
+
+    def prune(self, now: float) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ("bucket", "cooldown_action"):
+                conn.execute(f"DELETE FROM {table} WHERE expires < ?", (now,))
+                conn.execute(
+                    f"DELETE FROM {table} WHERE key IN (SELECT key FROM {table} ORDER BY expires "
+                    f"LIMIT max(0, (SELECT count(*) FROM {table}) - ?))",
+                    (self.max_keys,),
+                )
+            conn.execute("DELETE FROM counter WHERE hour < ?", (_hour(now) - COUNTER_RETENTION_HOURS,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def make_store() -> LimiterStore:
+    if settings.limiter_backend == "sqlite":
+        return SqliteLimiterStore(
+            settings.limiter_sqlite_path, settings.limiter_max_keys, settings.sqlite_busy_timeout_ms
+        )
+    if settings.limiter_backend == "memory":
+        return MemoryLimiterStore(settings.limiter_max_keys)
+    raise ValueError(f"Unknown HF_LIMITER_BACKEND {settings.limiter_backend!r} (expected memory or sqlite)")
+
+
+limiter_store = make_store()
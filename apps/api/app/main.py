@@ -6,9 +6,14 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
-from .db import init_db, get_session
-from .seed import seed_if_empty
+from .bootstrap import startup_check
+from .events import change_feed
 from .routes import router as api_router
+from .config import settings
+from .photos import UploadLimitMiddleware, photo_processor
+from .services import vote_writer
+from .static import PrecompressedStaticFiles
+from .telemetry import TelemetryMiddleware
 
 
 def create_app() -> FastAPI:
@@ -21,17 +26,41 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    # Photo + form fields; larger multipart bodies are refused before they are spooled to disk.
+    app.add_middleware(UploadLimitMiddleware, max_bytes=settings.photo_max_bytes + 64 * 1024)
+    app.add_middleware(TelemetryMiddleware)  # outermost, so it times everything below it
 
     app.include_router(api_router)
 
+    app.mount(
+        "/snapshots",
+        PrecompressedStaticFiles(
+            directory=settings.snapshot_dir,
+            cache_control=f"public, max-age={settings.snapshot_cache_seconds}",
+        ),
+        name="snapshots",
+    )
+
     web_dir = Path(__file__).resolve().parents[2] / "web" / "static"
     app.mount("/", StaticFiles(directory=str(web_dir), html=True), name="web")
 
     @app.on_event("startup")
     def _startup() -> None:
-        init_db()
-        with get_session() as s:
-            seed_if_empty(s)
+        # Schema and seed are normally prepared once before the workers fork (gunicorn.conf.py).
+        startup_check()
+
+    @app.on_event("startup")
+    async def _start_change_feed() -> None:
+        change_feed.start()
+
+    @app.on_event("shutdown")
+    async def _stop_change_feed() -> None:
+        await change_feed.stop()
+
+    @app.on_event("shutdown")
+    def _stop_vote_writer() -> None:
+        vote_writer.stop()  # commits votes still queued
+        photo_processor.shutdown()
 
     return app
 
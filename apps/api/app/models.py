@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 from typing import Optional
 
 from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import String
+from sqlalchemy import Index, String
 
 
 class Verdict(str, Enum):
@@ -21,22 +21,102 @@ class DetectionStatus(str, Enum):
 
 
 class Detection(SQLModel, table=True):
+    # The map query filters on all three (created_at range first) and window totals read
+    # only these columns, so neither needs the table row to decide what matches.
+    __table_args__ = (Index("ix_detection_recent", "created_at", "confidence", "status"),)
+
     id: str = Field(sa_column=Column(String, primary_key=True))
     lat: float
     lon: float
-    created_at: datetime = Field(index=True)
-    confidence: float = Field(index=True)
+    created_at: datetime
+    confidence: float
     source: str = Field(default="seed")
-    fwi_bucket: int = Field(default=2)       # 0..5 placeholder for MVP
+    fwi_bucket: int = Field(default=2)       # EFFIS FWI class 0..5 (data-pipeline/ingest_effis.py)
     wind_dir_deg: int = Field(default=0)     # 0..359
-    status: DetectionStatus = Field(default=DetectionStatus.unconfirmed, index=True)
+    status: DetectionStatus = Field(default=DetectionStatus.unconfirmed)
+    geohash: str = Field(default="", index=True, sa_column_kwargs={"server_default": ""})  # see geo.py
+    # Data version of the last transaction that inserted/changed this row (delta sync cursor).
+    change_seq: int = Field(default=0, index=True, sa_column_kwargs={"server_default": "0"})
+    updated_at: Optional[datetime] = Field(default=None)
+    event_id: Optional[str] = Field(default=None, index=True)  # FireEvent.id, set by clustering.py
+
+    # Denormalized vote counters, kept in step with `verification` inside the vote transaction.
+    confirms: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    denies: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    unsure: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    early_votes: int = Field(default=0, sa_column_kwargs={"server_default": "0"})  # within north-star window
+
+
+class FireEvent(SQLModel, table=True):
+    """Hotspots of one fire, grouped by clustering.py; aggregates are kept in step with members."""
+
+    id: str = Field(sa_column=Column(String, primary_key=True))  # "evt-" + id of its first detection
+    lat: float                                   # mean of the members
+    lon: float
+    geohash: str = Field(default="", index=True)
+    first_seen: datetime
+    last_seen: datetime = Field(index=True)
+    member_count: int = Field(default=0)
+    detection_id: str                            # latest member; votes on the event go to it
+    max_confidence: float = Field(default=0.0)
+    max_fwi_bucket: int = Field(default=0)
+    wind_dir_deg: int = Field(default=0)         # of the latest member
+    status: DetectionStatus = Field(default=DetectionStatus.unconfirmed)
+    confirms: int = Field(default=0)             # summed over members
+    denies: int = Field(default=0)
+    unsure: int = Field(default=0)
+    change_seq: int = Field(default=0, index=True)
 
 
 class Verification(SQLModel, table=True):
+    __table_args__ = (
+        # One vote per device and detection, enforced by the database (votes insert with
+        # ON CONFLICT DO NOTHING); also serves every lookup by detection.
+        Index("uq_verification_detection_device", "detection_id", "device_fp_hash", unique=True),
+        # Per-detection counts by verdict and within the north-star window, from the index alone.
+        Index("ix_verification_detection_verdict", "detection_id", "verdict", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    detection_id: str = Field(index=True, foreign_key="detection.id")
-    created_at: datetime = Field(index=True)
-    verdict: Verdict = Field(index=True)
-    device_fp_hash: str = Field(index=True)
-    ip_hash: str = Field(index=True)
+    detection_id: str = Field(foreign_key="detection.id")
+    created_at: datetime = Field(index=True)  # metric windows and rollup rebuilds
+    verdict: Verdict
+    device_fp_hash: str
+    ip_hash: str
     photo_path: Optional[str] = Field(default=None)
+
+
+class MetricsRollup(SQLModel, table=True):
+    """Per-hour metric totals, maintained incrementally so long windows read a few rows."""
+
+    hour: datetime = Field(primary_key=True)   # UTC, truncated to the hour
+    detections: int = Field(default=0)         # by detection created_at
+    accepted: int = Field(default=0)
+    dismissed: int = Field(default=0)
+    north_star_ok: int = Field(default=0)
+    verifications: int = Field(default=0)      # by verification created_at
+
+
+class MetricsDailyRollup(SQLModel, table=True):
+    """Per-day metric totals for days whose raw rows were archived (archive.py)."""
+
+    day: date = Field(primary_key=True)        # UTC
+    detections: int = Field(default=0)
+    accepted: int = Field(default=0)
+    dismissed: int = Field(default=0)
+    north_star_ok: int = Field(default=0)
+    verifications: int = Field(default=0)
+
+
+class DataVersion(SQLModel, table=True):
+    """Single-row counter bumped in every transaction that changes what the map shows."""
+
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(default=0)
+
+
+class SchemaVersion(SQLModel, table=True):
+    """Single row: the db.SCHEMA_VERSION that init_db last brought this database up to."""
+
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(default=0)
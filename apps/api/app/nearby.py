@@ -0,0 +1,147 @@
+"""Nearby search ("Locate me") over the active detections, indexed in memory per worker.
+
+Non-dismissed detections of the last HF_NEARBY_HOURS sit in a grid of ~HF_NEARBY_CELL_KM
+cells. A search reads the few cells around the point and filters them with a vectorized
+haversine; it never touches the detection table. The index follows the same change sequence
+as events.ChangeFeed: before each search it reads the rows whose change_seq moved past its
+cursor (new detections, votes, status changes, from any worker or ingestion job) and patches
+their cells, so an idle index costs one primary-key query per search.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlmodel import Session
+
+from .config import settings
+from .db import as_utc
+from .geo import KM_PER_DEG_LAT, grid_cell, grid_reach, haversine_km_many
+from .geojson import FEATURE_COLUMNS
+from .models import DetectionStatus
+from .repositories import DataVersionRepository, DetectionRepository
+
+_EXPIRE_EVERY_SECONDS = 60.0
+
+Cell = Tuple[int, int]
+# lat, lon, created_at (epoch seconds), confidence, FEATURE_COLUMNS row
+Entry = Tuple[float, float, float, float, Tuple[Any, ...]]
+
+
+class NearbyIndex:
+    def __init__(self, cell_km: float, max_hours: int, max_changes: int) -> None:
+        self.cell_deg = cell_km / KM_PER_DEG_LAT
+        self.max_hours = max_hours
+        self.max_changes = max_changes
+        self.cursor: Optional[int] = None
+        self._cells: Dict[Cell, Dict[str, Entry]] = defaultdict(dict)
+        self._cell_of: Dict[str, Cell] = {}
+        self._expired_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cell_of)
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return grid_cell(lat, lon, self.cell_deg)
+
+    def _remove(self, det_id: str) -> None:
+        cell = self._cell_of.pop(det_id, None)
+        if cell is not None:
+            bucket = self._cells[cell]
+            bucket.pop(det_id, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def _put(self, row: Sequence[Any], oldest: float) -> None:
+        det_id, lat, lon, created_at, confidence = row[0], row[1], row[2], as_utc(row[3]).timestamp(), row[4]
+        self._remove(det_id)
+        if row[8] == DetectionStatus.dismissed or created_at < oldest:
+            return
+        cell = self._cell(lat, lon)
+        self._cells[cell][det_id] = (lat, lon, created_at, confidence, tuple(row[: len(FEATURE_COLUMNS)]))
+        self._cell_of[det_id] = cell
+
+    def _expire(self, oldest: float) -> None:
+        stale = [det_id for bucket in self._cells.values() for det_id, e in bucket.items() if e[2] < oldest]
+        for det_id in stale:
+            self._remove(det_id)
+
+    def _load(self, session: Session, oldest: float) -> None:
+        self._cells.clear()
+        self._cell_of.clear()
+        self.cursor = DataVersionRepository(session).current()
+        rows = DetectionRepository(session).iter_recent_rows(FEATURE_COLUMNS, hours=self.max_hours, min_confidence=0.0)
+        for row in rows:
+            self._put(row, oldest)
+
+    def refresh(self, session: Session) -> None:
+        """Apply everything written since the last refresh (the first one loads the lot)."""
+        now = time.time()
+        oldest = now - self.max_hours * 3600.0
+        with self._lock:
+            if self.cursor is None:
+                self._load(session, oldest)
+                self._expired_at = now
+                return
+            current = DataVersionRepository(session).current()
+            if current != self.cursor:
+                rows = DetectionRepository(session).changes_since(
+                    self.cursor, FEATURE_COLUMNS, hours=self.max_hours, limit=self.max_changes + 1
+                )
+                if len(rows) > self.max_changes:
+                    # Bulk change (ingestion, repair): rebuilding is cheaper than patching.
+                    self._load(session, oldest)
+                    self._expired_at = now
+                    return
+                for row in rows:
+                    self._put(row, oldest)
+                self.cursor = current
+            if now - self._expired_at >= _EXPIRE_EVERY_SECONDS:
+                self._expire(oldest)
+                self._expired_at = now
+
+    def search(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        hours: Optional[int] = None,
+        min_confidence: float = 0.0,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Tuple[float, Tuple[Any, ...]]], int]:
+        """(distance_km, FEATURE_COLUMNS row) pairs within `radius_km`, closest first, at most
+        `limit` of them, and how many matched in total."""
+        di, dj = grid_reach(lat, radius_km, self.cell_deg)
+        ci, cj = self._cell(lat, lon)
+        with self._lock:
+            entries = [
+                e
+                for i in range(ci - di, ci + di + 1)
+                for j in range(cj - dj, cj + dj + 1)
+                for e in self._cells.get((i, j), {}).values()
+            ]
+        if not entries:
+            return [], 0
+
+        import numpy as np
+
+        lats = np.fromiter((e[0] for e in entries), dtype=np.float64, count=len(entries))
+        lons = np.fromiter((e[1] for e in entries), dtype=np.float64, count=len(entries))
+        created = np.fromiter((e[2] for e in entries), dtype=np.float64, count=len(entries))
+        confidence = np.fromiter((e[3] for e in entries), dtype=np.float64, count=len(entries))
+        dist = haversine_km_many(lat, lon, lats, lons)
+        mask = (dist <= radius_km) & (confidence >= min_confidence)
+        if hours is not None:
+            mask &= created >= time.time() - hours * 3600.0
+        hits = np.flatnonzero(mask)
+        order = hits[np.argsort(dist[hits], kind="stable")]
+        if limit is not None:
+            order = order[:limit]
+        return [(float(dist[k]), entries[k][4]) for k in order], int(hits.size)
+
+
+nearby_index = NearbyIndex(settings.nearby_cell_km, settings.nearby_hours, settings.change_feed_max_events)
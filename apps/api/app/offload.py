@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import functools
+from typing import Any, Callable, TypeVar
+
+from anyio import CapacityLimiter, to_thread
+from anyio.lowlevel import RunVar
+
+from .config import settings
+
+T = TypeVar("T")
+
+
+class ThreadOffload:
+    """Runs blocking calls from async routes on worker threads, at most `threads` at a time.
+
+    Each pool has its own limiter, separate from the threadpool that serves sync routes, so a
+    burst of writes queues here instead of taking every thread the GET routes need. Limiters
+    are per event loop (anyio requires it), created on first use.
+    """
+
+    def __init__(self, name: str, threads: int) -> None:
+        self.threads = threads
+        self._limiter: RunVar[CapacityLimiter] = RunVar(f"hf_offload_{name}")
+
+    def limiter(self) -> CapacityLimiter:
+        try:
+            return self._limiter.get()
+        except LookupError:
+            limiter = CapacityLimiter(self.threads)
+            self._limiter.set(limiter)
+            return limiter
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=self.limiter())
+
+
+# DB work: a Session is only ever used by one thread at a time, the calls are just sequenced.
+db_offload = ThreadOffload("db", settings.db_offload_threads)
+# File IO (photo writes).
+io_offload = ThreadOffload("io", settings.io_offload_threads)
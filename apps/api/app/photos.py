@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+from .config import settings
+from .offload import io_offload
+from .telemetry import PHOTO_SAVE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = 64 * 1024
+
+_EXTENSIONS = {"image/jpeg": ".jpg", "image/jpg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+
+
+# Imported on first use, off the worker's startup path; False once known to be missing.
+_pil: Any = None
+
+
+def _pillow() -> Any:
+    """(Image, ImageOps), or None without Pillow: originals are then kept as uploaded
+    (no thumbnail, EXIF kept)."""
+    global _pil
+    if _pil is None:
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:  # pragma: no cover
+            _pil = False
+        else:
+            _pil = (Image, ImageOps)
+    return _pil or None
+
+
+class PhotoTooLarge(Exception):
+    pass
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=400, detail=f"Photo too large (max {settings.photo_max_bytes // (1024 * 1024)}MB).")
+
+
+def _store(src: BinaryIO, photos_dir: str, ext: str, max_bytes: int) -> Tuple[str, bool]:
+    """Copy `src` into `photos_dir` under its SHA-256, one chunk in memory at a time.
+
+    Returns (path, created); `created` is False when the same photo was already stored.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        fd, tmp = tempfile.mkstemp(dir=photos_dir, prefix=".upload-")
+    except FileNotFoundError:
+        # The directories are made by PhotoStorage.prepare(); this only runs if they were removed since.
+        os.makedirs(photos_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=photos_dir, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := src.read(CHUNK_BYTES):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise PhotoTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+        name = digest.hexdigest()
+        shard = os.path.join(photos_dir, name[:2])
+        path = os.path.join(shard, name + ext)
+        if os.path.exists(path):
+            os.unlink(tmp)
+            return path, False
+        try:
+            os.replace(tmp, path)
+        except FileNotFoundError:
+            os.makedirs(shard, exist_ok=True)
+            os.replace(tmp, path)
+        return path, True
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def thumbnail_path(path: str) -> str:
+    root, _ = os.path.splitext(path)
+    return root + ".thumb.jpg"
+
+
+def process_photo(path: str, max_edge: int, thumb_edge: int) -> None:
+    """Downscale to `max_edge`, drop EXIF (GPS, device) and write a JPEG thumbnail next to it.
+
+    The result replaces the file in place, so its name keeps the hash of the original upload
+    (see PhotoStorage), not of the bytes now stored.
+    """
+    pil = _pillow()
+    if pil is None:
+        return
+    Image, ImageOps = pil
+    with Image.open(path) as im:
+        im.load()
+        fmt = im.format or "JPEG"
+        img = ImageOps.exif_transpose(im)  # bake the orientation in before the EXIF goes
+    img.thumbnail((max_edge, max_edge))
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".process-")
+    with os.fdopen(fd, "wb") as out:
+        save_kwargs: Dict[str, Any] = {"quality": 85} if fmt in {"JPEG", "WEBP"} else {}
+        img.save(out, format=fmt, **save_kwargs)  # no exif= argument: metadata is not written
+    os.replace(tmp, path)
+
+    thumb = img.convert("RGB")
+    thumb.thumbnail((thumb_edge, thumb_edge))
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".process-")
+    with os.fdopen(fd, "wb") as out:
+        thumb.save(out, format="JPEG", quality=80)
+    os.replace(tmp, thumbnail_path(path))
+
+
+class PhotoProcessor:
+    """Background pool for image work, so a verify returns as soon as the upload is stored."""
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, path: str) -> None:
+        if self.workers <= 0 or _pillow() is None:
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hf-photo")
+        self._pool.submit(self._run, path)
+
+    @staticmethod
+    def _run(path: str) -> None:
+        try:
+            process_photo(path, settings.photo_max_edge, settings.photo_thumb_edge)
+        except Exception:
+            logger.exception("processing photo %s failed; the original is kept", path)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+photo_processor = PhotoProcessor(settings.photo_workers)
+
+
+class PhotoStorage:
+    """Photo store keyed by upload content: `<photos_dir>/<sha256[:2]>/<sha256><ext>`.
+
+    The key is the SHA-256 of the original upload. Background processing later rewrites the
+    file (downscaled, EXIF stripped), so the stored bytes do not hash to the name. The path
+    saved on the vote stays valid, and a repeat of the same upload still finds the stored copy.
+    """
+
+    def __init__(self, photos_dir: str) -> None:
+        self.photos_dir = photos_dir
+
+    def prepare(self) -> None:
+        """Create the store and its 256 shard directories, so saving a photo never has to."""
+        for i in range(256):
+            os.makedirs(os.path.join(self.photos_dir, f"{i:02x}"), exist_ok=True)
+
+    async def save(self, file: UploadFile) -> str:
+        ct = (file.content_type or "").lower()
+        ext = _EXTENSIONS.get(ct)
+        if ext is None:
+            raise HTTPException(status_code=400, detail="Photo must be jpeg/png/webp.")
+
+        with PHOTO_SAVE_SECONDS.time():
+            try:
+                path, created = await io_offload.run(
+                    _store, file.file, self.photos_dir, ext, settings.photo_max_bytes
+                )
+            except PhotoTooLarge:
+                raise _too_large()
+        if created:
+            photo_processor.submit(path)
+        return path
+
+
+class UploadLimitMiddleware:
+    """Refuses multipart bodies over `max_bytes` with 413 before they are parsed or spooled.
+
+    Uses Content-Length when sent; chunked bodies are counted as they arrive.
+    """
+
+    def __init__(self, app: Any, max_bytes: int) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not self._is_multipart(scope):
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive() -> Dict[str, Any]:
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True  # stop reading; whatever the app answers becomes a 413
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def limited_send(message: Dict[str, Any]) -> None:
+            if not exceeded:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                await self._reject(send)
+
+        await self.app(scope, limited_receive, limited_send)
+
+    @staticmethod
+    def _is_multipart(scope: Dict[str, Any]) -> bool:
+        ct = dict(scope["headers"]).get(b"content-type", b"")
+        return ct.startswith(b"multipart/form-data")
+
+    @staticmethod
+    async def _reject(send: Any) -> None:
+        body = b'{"detail":"Request body too large."}'
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -1,52 +1,423 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Tuple
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
+from sqlalchemy import bindparam, case, delete, insert, or_, update
+from sqlalchemy.sql.elements import ColumnElement
 from sqlmodel import Session, select, func
 
-from .models import Detection, Verification, Verdict, DetectionStatus
+from .geo import BBox, geohash_cover, geohash_encode
+from .models import (
+    DataVersion,
+    Detection,
+    DetectionStatus,
+    FireEvent,
+    MetricsDailyRollup,
+    MetricsRollup,
+    Verdict,
+    Verification,
+)
+
+COUNT_COLUMNS: Dict[Verdict, str] = {
+    Verdict.confirm: "confirms",
+    Verdict.deny: "denies",
+    Verdict.unsure: "unsure",
+}
+
+# North-star: a detection is "ok" once it has this many votes within this long of being created.
+NORTH_STAR_VOTES = 3
+NORTH_STAR_WINDOW = timedelta(minutes=30)
+
+
+def _dialect(session: Session) -> str:
+    return session.get_bind().dialect.name
+
+
+def _within_window(session: Session, later: Any, earlier: Any, window: timedelta) -> ColumnElement[bool]:
+    # SQLite stores datetimes as text, so interval arithmetic goes through julianday().
+    if _dialect(session) == "sqlite":
+        delta = func.julianday(later) - func.julianday(earlier)
+        return (delta >= 0) & (delta <= window.total_seconds() / 86400.0)
+    return (later >= earlier) & (later <= earlier + window)
+
+
+def _hour_bucket(session: Session, col: Any) -> Any:
+    if _dialect(session) == "sqlite":
+        # Same text layout SQLAlchemy uses for DateTime on SQLite.
+        return func.strftime("%Y-%m-%d %H:00:00.000000", col)
+    return func.date_trunc("hour", col)
+
+
+def _upsert(session: Session) -> Any:
+    """The dialect's INSERT construct that supports ON CONFLICT DO UPDATE / DO NOTHING."""
+    dialect = _dialect(session)
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert  # type: ignore[assignment]
+    else:
+        raise RuntimeError(f"Unsupported database dialect for upserts: {dialect}")
+    return upsert
+
+
+def _geohash_filters(model: Any, bbox: BBox) -> List[Any]:
+    min_lon, min_lat, max_lon, max_lat = bbox
+    # Geohash prefix ranges narrow the scan through the index; lat/lon trims the cell edges.
+    return [
+        or_(*(model.geohash.between(p, p + "~") for p in geohash_cover(bbox))),
+        model.lat.between(min_lat, max_lat),
+        model.lon.between(min_lon, max_lon),
+    ]
+
+
+def floor_hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
 
 
 class DetectionRepository:
     def __init__(self, session: Session) -> None:
         self.session = session
 
-    def list_recent(self, hours: int, min_confidence: float, include_dismissed: bool = False) -> List[Detection]:
+    def _recent_filters(
+        self, hours: int, min_confidence: float, include_dismissed: bool, bbox: Optional[BBox]
+    ) -> List[Any]:
         since = datetime.now(timezone.utc) - timedelta(hours=hours)
-        stmt = select(Detection).where(Detection.created_at >= since, Detection.confidence >= min_confidence)
+        conds: List[Any] = [Detection.created_at >= since, Detection.confidence >= min_confidence]
         if not include_dismissed:
-            stmt = stmt.where(Detection.status != DetectionStatus.dismissed)
+            conds.append(Detection.status != DetectionStatus.dismissed)
+        if bbox is not None:
+            conds.extend(_geohash_filters(Detection, bbox))
+        return conds
+
+    def list_recent(
+        self,
+        hours: int,
+        min_confidence: float,
+        include_dismissed: bool = False,
+        bbox: Optional[BBox] = None,
+    ) -> List[Detection]:
+        stmt = select(Detection).where(*self._recent_filters(hours, min_confidence, include_dismissed, bbox))
         stmt = stmt.order_by(Detection.created_at.desc())
         return list(self.session.exec(stmt))
 
+    def iter_recent_rows(
+        self,
+        columns: Sequence[Any],
+        hours: int,
+        min_confidence: float,
+        include_dismissed: bool = False,
+        bbox: Optional[BBox] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[Tuple[Any, ...]]:
+        """Like list_recent, but yields plain column tuples in batches instead of ORM objects."""
+        stmt = (
+            select(*columns)
+            .where(*self._recent_filters(hours, min_confidence, include_dismissed, bbox))
+            .order_by(Detection.created_at.desc())
+            .execution_options(yield_per=batch_size)
+        )
+        yield from self.session.exec(stmt)  # type: ignore[call-overload]
+
+    def clusters(
+        self, hours: int, min_confidence: float, precision: int, bbox: Optional[BBox] = None
+    ) -> List[Dict[str, Any]]:
+        """Non-dismissed detections grouped by geohash prefix of length `precision`."""
+        cell = func.substr(Detection.geohash, 1, precision)
+        stmt = (
+            select(
+                cell,
+                func.count(Detection.id),
+                func.avg(Detection.lat),
+                func.avg(Detection.lon),
+                func.max(Detection.confidence),
+                func.max(Detection.fwi_bucket),
+                func.sum(Detection.confirms),
+                func.sum(Detection.denies),
+                func.sum(Detection.unsure),
+                func.min(Detection.id),
+            )
+            .where(*self._recent_filters(hours, min_confidence, False, bbox))
+            .group_by(cell)
+        )
+        return [
+            {
+                "cell": c,
+                "count": int(n),
+                "lat": float(lat),
+                "lon": float(lon),
+                "max_confidence": float(max_conf),
+                "max_fwi_bucket": int(max_fwi),
+                "counts": {"confirms": int(conf), "denies": int(den), "unsure": int(uns)},
+                "sample_id": sample_id,
+            }
+            for c, n, lat, lon, max_conf, max_fwi, conf, den, uns, sample_id in self.session.exec(stmt)
+        ]
+
+    def window_start(self, hours: int) -> Optional[datetime]:
+        """Oldest `created_at` within `hours`; a window's rows only change without a write when it ages out."""
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        return self.session.exec(select(func.min(Detection.created_at)).where(Detection.created_at >= since)).one()
+
     def get(self, detection_id: str) -> Optional[Detection]:
         stmt = select(Detection).where(Detection.id == detection_id)
         return self.session.exec(stmt).first()
 
+    def window_totals(self, start: datetime, end: datetime) -> Dict[str, int]:
+        """Detection totals for created_at in [start, end) as one aggregate query."""
+        stmt = select(
+            func.count(Detection.id),
+            func.sum(case((Detection.status == DetectionStatus.accepted, 1), else_=0)),
+            func.sum(case((Detection.status == DetectionStatus.dismissed, 1), else_=0)),
+            func.sum(case((Detection.early_votes >= NORTH_STAR_VOTES, 1), else_=0)),
+        ).where(Detection.created_at >= start, Detection.created_at < end)
+        total, accepted, dismissed, north_ok = self.session.exec(stmt).one()
+        return {
+            "detections": int(total or 0),
+            "accepted": int(accepted or 0),
+            "dismissed": int(dismissed or 0),
+            "north_star_ok": int(north_ok or 0),
+        }
+
+    def get_many(self, detection_ids: Iterable[str]) -> Dict[str, Detection]:
+        ids = set(detection_ids)
+        if not ids:
+            return {}
+        stmt = select(Detection).where(Detection.id.in_(ids))  # type: ignore[attr-defined]
+        return {d.id: d for d in self.session.exec(stmt)}
+
+    def changes_since(
+        self,
+        since: int,
+        columns: Sequence[Any],
+        hours: Optional[int] = None,
+        min_confidence: float = 0.0,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[Any, ...]]:
+        """Rows (`columns` + change_seq) inserted or changed after cursor `since`, dismissed included."""
+        stmt = select(*columns, Detection.change_seq).where(
+            Detection.change_seq > since, Detection.confidence >= min_confidence
+        )
+        if hours is not None:
+            stmt = stmt.where(Detection.created_at >= datetime.now(timezone.utc) - timedelta(hours=hours))
+        stmt = stmt.order_by(Detection.change_seq)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return list(self.session.exec(stmt))  # type: ignore[call-overload]
+
+    def insert_new(self, rows: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Bulk-insert rows (full column dicts) whose id is not stored yet; returns those inserted.
+
+        Ids are deterministic for ingested sources, so re-running an import inserts nothing.
+        """
+        if not rows:
+            return []
+        ids = [r["id"] for r in rows]
+        existing = set(self.session.exec(select(Detection.id).where(Detection.id.in_(ids))))  # type: ignore[attr-defined]
+        new = list({r["id"]: r for r in rows if r["id"] not in existing}.values())
+        if new:
+            # Core insert on the table: skips the ORM bulk-insert bookkeeping (several times faster).
+            self.session.execute(insert(Detection.__table__), new)  # type: ignore[attr-defined]
+        return new
+
+    def mark_changed(self, detection: Detection, seq: int) -> Detection:
+        detection.change_seq = seq
+        detection.updated_at = datetime.now(timezone.utc)
+        self.session.add(detection)
+        return detection
+
     def set_status(self, detection: Detection, status: DetectionStatus) -> Detection:
         detection.status = status
         self.session.add(detection)
-        self.session.commit()
+        return detection
+
+    def increment_count(self, detection: Detection, verdict: Verdict, early: bool = False) -> Detection:
+        # Increment in SQL (not in Python) so concurrent votes on one detection never lose updates.
+        col = getattr(Detection, COUNT_COLUMNS[verdict])
+        values: Dict[Any, Any] = {col: col + 1}
+        if early:
+            values[Detection.early_votes] = Detection.early_votes + 1
+        stmt = update(Detection).where(Detection.id == detection.id).values(values)
+        self.session.exec(stmt)  # type: ignore[call-overload]
         self.session.refresh(detection)
         return detection
 
+    def backfill_geohash(self, batch_size: int = 1000) -> int:
+        """Fill `geohash` on rows that predate the column; returns rows updated."""
+        stmt = select(Detection.id, Detection.lat, Detection.lon).where(Detection.geohash == "")
+        rows = [{"b_id": i, "b_geohash": geohash_encode(lat, lon)} for i, lat, lon in self.session.exec(stmt)]
+        table = Detection.__table__  # type: ignore[attr-defined]
+        upd = update(table).where(table.c.id == bindparam("b_id")).values(geohash=bindparam("b_geohash"))
+        for i in range(0, len(rows), batch_size):
+            self.session.connection().execute(upd, rows[i : i + batch_size])
+        return len(rows)
+
+    def positions_between(
+        self, start: datetime, end: datetime
+    ) -> List[Tuple[str, float, float, int, Optional[str]]]:
+        """(id, lat, lon, fwi_bucket, event_id) of detections created in [start, end), dismissed included."""
+        stmt = select(Detection.id, Detection.lat, Detection.lon, Detection.fwi_bucket, Detection.event_id).where(
+            Detection.created_at >= start, Detection.created_at < end
+        )
+        return list(self.session.exec(stmt))  # type: ignore[call-overload]
+
+    def set_fwi_buckets(self, ids: Sequence[str], buckets: Sequence[int], seq: int, batch_size: int = 5000) -> int:
+        """Bulk-set `fwi_bucket` (one executemany per batch), stamping `change_seq` so caches
+        and live maps pick the new risk up; returns rows updated."""
+        table = Detection.__table__  # type: ignore[attr-defined]
+        upd = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(fwi_bucket=bindparam("b_fwi"), change_seq=seq, updated_at=datetime.now(timezone.utc))
+        )
+        rows = [{"b_id": i, "b_fwi": b} for i, b in zip(ids, buckets)]
+        for i in range(0, len(rows), batch_size):
+            self.session.connection().execute(upd, rows[i : i + batch_size])
+        return len(rows)
+
+    def unclustered(self, limit: int) -> List[Tuple[str, float, float, datetime]]:
+        """(id, lat, lon, created_at) of detections not in a fire event yet, oldest first."""
+        stmt = (
+            select(Detection.id, Detection.lat, Detection.lon, Detection.created_at)
+            .where(Detection.event_id.is_(None))  # type: ignore[union-attr]
+            .order_by(Detection.created_at)
+            .limit(limit)
+        )
+        return list(self.session.exec(stmt))  # type: ignore[call-overload]
+
+    def event_members_between(self, start: datetime, end: datetime) -> List[Tuple[float, float, datetime, str]]:
+        """(lat, lon, created_at, event_id) of clustered detections created in [start, end]."""
+        stmt = select(Detection.lat, Detection.lon, Detection.created_at, Detection.event_id).where(
+            Detection.created_at >= start,
+            Detection.created_at <= end,
+            Detection.event_id.is_not(None),  # type: ignore[union-attr]
+        )
+        return list(self.session.exec(stmt))  # type: ignore[call-overload]
+
+    def set_event_ids(self, assignments: Dict[str, str], batch_size: int = 5000) -> None:
+        table = Detection.__table__  # type: ignore[attr-defined]
+        upd = update(table).where(table.c.id == bindparam("b_id")).values(event_id=bindparam("b_event"))
+        rows = [{"b_id": d, "b_event": e} for d, e in assignments.items()]
+        for i in range(0, len(rows), batch_size):
+            self.session.connection().execute(upd, rows[i : i + batch_size])
+
+    def move_event_members(self, merged: Dict[str, str]) -> None:
+        """Re-point members of merged-away events (old id -> surviving id)."""
+        table = Detection.__table__  # type: ignore[attr-defined]
+        upd = update(table).where(table.c.event_id == bindparam("b_old")).values(event_id=bindparam("b_new"))
+        if merged:
+            self.session.connection().execute(upd, [{"b_old": o, "b_new": n} for o, n in merged.items()])
+
+    def rebuild_counts(self) -> int:
+        """Recompute the vote counters from `verification`; returns how many rows were repaired."""
+        fresh = {
+            name: select(func.count(Verification.id))
+            .where(Verification.detection_id == Detection.id, Verification.verdict == verdict)
+            .scalar_subquery()
+            for verdict, name in COUNT_COLUMNS.items()
+        }
+        fresh["early_votes"] = (
+            select(func.count(Verification.id))
+            .where(
+                Verification.detection_id == Detection.id,
+                _within_window(self.session, Verification.created_at, Detection.created_at, NORTH_STAR_WINDOW),
+            )
+            .scalar_subquery()
+        )
+        stale = or_(*(getattr(Detection, name) != sub for name, sub in fresh.items()))
+        stmt = update(Detection).where(stale).values(fresh).execution_options(synchronize_session=False)
+        result = self.session.exec(stmt)  # type: ignore[call-overload]
+        return int(result.rowcount or 0)
+
+    # Status re-evaluation (VerificationService.reevaluate_statuses). `status` is the rule as a
+    # SQL expression over the counter columns; rows are touched only where it disagrees.
+
+    def stale_status_ids(self, status: Any, since: Optional[datetime] = None) -> List[str]:
+        stmt = select(Detection.id).where(Detection.status != status)
+        if since is not None:
+            stmt = stmt.where(Detection.created_at >= since)
+        return list(self.session.exec(stmt.order_by(Detection.id)))  # type: ignore[call-overload]
+
+    def status_moves(self, ids: Sequence[str], status: Any) -> List[Tuple[datetime, DetectionStatus, DetectionStatus, int]]:
+        """(created_at hour, current status, new status, rows) for the stale rows among `ids`."""
+        hour = _hour_bucket(self.session, Detection.created_at)
+        stmt = (
+            select(hour, Detection.status, status, func.count(Detection.id))
+            .where(Detection.id.in_(ids), Detection.status != status)  # type: ignore[attr-defined]
+            .group_by(hour, Detection.status, status)
+        )
+        return [
+            (datetime.fromisoformat(h) if isinstance(h, str) else h, old, new, int(n))
+            for h, old, new, n in self.session.exec(stmt)  # type: ignore[call-overload]
+        ]
+
+    def stale_status_event_ids(self, ids: Sequence[str], status: Any) -> Set[str]:
+        stmt = select(Detection.event_id).where(
+            Detection.id.in_(ids), Detection.status != status, Detection.event_id.is_not(None)  # type: ignore[attr-defined,union-attr]
+        )
+        return set(self.session.exec(stmt.distinct()))  # type: ignore[call-overload,arg-type]
+
+    def set_statuses(self, ids: Sequence[str], status: Any, seq: int) -> int:
+        stmt = (
+            update(Detection)
+            .where(Detection.id.in_(ids), Detection.status != status)  # type: ignore[attr-defined]
+            .values(status=status, change_seq=seq, updated_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        return int(self.session.exec(stmt).rowcount or 0)  # type: ignore[call-overload]
+
+    # Archival (archive.py): rows go out as plain column dicts, then are deleted by id.
+
+    def oldest_created_at(self) -> Optional[datetime]:
+        return self.session.exec(select(func.min(Detection.created_at))).one()
+
+    def ids_created_between(self, start: datetime, end: datetime) -> List[str]:
+        stmt = select(Detection.id).where(Detection.created_at >= start, Detection.created_at < end)
+        return list(self.session.exec(stmt.order_by(Detection.id)))  # type: ignore[call-overload]
+
+    def count_created_before(self, cutoff: datetime) -> int:
+        return int(self.session.exec(select(func.count(Detection.id)).where(Detection.created_at < cutoff)).one())
+
+    def column_dicts(self, ids: Sequence[str]) -> List[Dict[str, Any]]:
+        table = Detection.__table__  # type: ignore[attr-defined]
+        stmt = select(table).where(table.c.id.in_(ids)).order_by(table.c.id)
+        return [dict(r._mapping) for r in self.session.connection().execute(stmt)]
+
+    def delete_without_votes(self, ids: Sequence[str]) -> int:
+        """Delete those of `ids` that have no verification left; returns rows deleted."""
+        has_votes = select(Verification.id).where(Verification.detection_id == Detection.id).exists()
+        stmt = delete(Detection).where(Detection.id.in_(ids), ~has_votes)  # type: ignore[attr-defined]
+        return int(self.session.exec(stmt).rowcount or 0)  # type: ignore[call-overload]
+
 
 class VerificationRepository:
     def __init__(self, session: Session) -> None:
         self.session = session
 
     def exists_for_device(self, detection_id: str, device_fp_hash: str) -> bool:
+        """Advisory only (e.g. before storing a photo); `add_once` is what enforces one vote."""
         stmt = select(Verification.id).where(
             Verification.detection_id == detection_id, Verification.device_fp_hash == device_fp_hash
         )
         return self.session.exec(stmt).first() is not None
 
-    def add(self, v: Verification) -> Verification:
-        self.session.add(v)
-        self.session.commit()
-        self.session.refresh(v)
-        return v
+    def add_once(self, v: Verification) -> bool:
+        """Insert `v` unless the device already voted on the detection; returns whether it did.
+
+        The unique (detection_id, device_fp_hash) index decides, so two workers racing on the
+        same vote cannot both succeed, and the transaction stays usable either way.
+        """
+        table = Verification.__table__  # type: ignore[attr-defined]
+        stmt = _upsert(self.session)(table).values(
+            detection_id=v.detection_id,
+            created_at=v.created_at,
+            verdict=v.verdict,
+            device_fp_hash=v.device_fp_hash,
+            ip_hash=v.ip_hash,
+            photo_path=v.photo_path,
+        )
+        stmt = stmt.on_conflict_do_nothing(index_elements=[table.c.detection_id, table.c.device_fp_hash])
+        return bool(self.session.exec(stmt).rowcount)  # type: ignore[call-overload]
 
     def counts(self, detection_id: str) -> Tuple[int, int, int]:
         stmt = (
@@ -60,6 +431,255 @@ class VerificationRepository:
             counts[verdict] = int(c)
         return counts[Verdict.confirm], counts[Verdict.deny], counts[Verdict.unsure]
 
-    def count_total_in_window(self, since: datetime) -> int:
+    def count_total_in_window(self, since: datetime, until: Optional[datetime] = None) -> int:
         stmt = select(func.count(Verification.id)).where(Verification.created_at >= since)
+        if until is not None:
+            stmt = stmt.where(Verification.created_at < until)
         return int(self.session.exec(stmt).one())
+
+    def count_for_detections_before(self, cutoff: datetime) -> int:
+        stmt = select(func.count(Verification.id)).join(Detection, Detection.id == Verification.detection_id)
+        return int(self.session.exec(stmt.where(Detection.created_at < cutoff)).one())
+
+    def column_dicts_for_detections(self, detection_ids: Sequence[str]) -> List[Dict[str, Any]]:
+        table = Verification.__table__  # type: ignore[attr-defined]
+        stmt = select(table).where(table.c.detection_id.in_(detection_ids)).order_by(table.c.id)
+        return [dict(r._mapping) for r in self.session.connection().execute(stmt)]
+
+    def delete_many(self, ids: Sequence[int]) -> int:
+        stmt = delete(Verification).where(Verification.id.in_(ids))  # type: ignore[union-attr]
+        return int(self.session.exec(stmt).rowcount or 0)  # type: ignore[call-overload]
+
+
+class MetricsRollupRepository:
+    FIELDS = ("detections", "accepted", "dismissed", "north_star_ok", "verifications")
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    def bump(self, at: datetime, **deltas: int) -> None:
+        """Add `deltas` to the rollup row for the hour containing `at` (upsert)."""
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not deltas:
+            return
+        upsert = _upsert(self.session)
+        table = MetricsRollup.__table__  # type: ignore[attr-defined]
+        stmt = upsert(table).values(hour=floor_hour(at), **{f: deltas.get(f, 0) for f in self.FIELDS})
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.hour],
+            set_={k: table.c[k] + v for k, v in deltas.items()},
+        )
+        self.session.exec(stmt)  # type: ignore[call-overload]
+
+    def sum_since(self, since: datetime) -> Dict[str, int]:
+        """Totals from `since` on. Archived days only have a daily row, counted from the first
+        whole day after `since`."""
+        stmt = select(*(func.coalesce(func.sum(getattr(MetricsRollup, f)), 0) for f in self.FIELDS)).where(
+            MetricsRollup.hour >= since
+        )
+        row = self.session.exec(stmt).one()
+        totals = {f: int(v) for f, v in zip(self.FIELDS, row)}
+        first_day = since.date() if since.time() == datetime.min.time() else since.date() + timedelta(days=1)
+        d_stmt = select(*(func.coalesce(func.sum(getattr(MetricsDailyRollup, f)), 0) for f in self.FIELDS)).where(
+            MetricsDailyRollup.day >= first_day
+        )
+        for f, v in zip(self.FIELDS, self.session.exec(d_stmt).one()):
+            totals[f] += int(v)
+        return totals
+
+    def compact_before(self, cutoff: datetime) -> int:
+        """Fold the hourly rows before `cutoff` (a UTC midnight) into daily rows; returns days written."""
+        days: Dict[date, Dict[str, int]] = {}
+        stmt = select(MetricsRollup.hour, *(getattr(MetricsRollup, f) for f in self.FIELDS)).where(
+            MetricsRollup.hour < cutoff
+        )
+        for hour, *values in self.session.exec(stmt):
+            day = days.setdefault(hour.date(), dict.fromkeys(self.FIELDS, 0))
+            for f, v in zip(self.FIELDS, values):
+                day[f] += int(v)
+        if not days:
+            return 0
+        upsert = _upsert(self.session)
+        table = MetricsDailyRollup.__table__  # type: ignore[attr-defined]
+        for day, vals in days.items():
+            stmt = upsert(table).values(day=day, **vals).on_conflict_do_update(
+                index_elements=[table.c.day], set_={f: table.c[f] + v for f, v in vals.items()}
+            )
+            self.session.exec(stmt)  # type: ignore[call-overload]
+        self.session.exec(delete(MetricsRollup).where(MetricsRollup.hour < cutoff))  # type: ignore[call-overload]
+        return len(days)
+
+    def rebuild(self, since: Optional[datetime] = None) -> int:
+        """Recompute rollup rows (all, or from the hour containing `since`) from the raw tables."""
+        start = floor_hour(since) if since is not None else None
+        rows: Dict[datetime, Dict[str, int]] = {}
+
+        def row(h: Any) -> Dict[str, int]:
+            key = datetime.fromisoformat(h) if isinstance(h, str) else h
+            return rows.setdefault(key, dict.fromkeys(self.FIELDS, 0))
+
+        d_hour = _hour_bucket(self.session, Detection.created_at)
+        d_stmt = select(
+            d_hour,
+            func.count(Detection.id),
+            func.sum(case((Detection.status == DetectionStatus.accepted, 1), else_=0)),
+            func.sum(case((Detection.status == DetectionStatus.dismissed, 1), else_=0)),
+            func.sum(case((Detection.early_votes >= NORTH_STAR_VOTES, 1), else_=0)),
+        ).group_by(d_hour)
+        if start is not None:
+            d_stmt = d_stmt.where(Detection.created_at >= start)
+        for h, total, accepted, dismissed, north_ok in self.session.exec(d_stmt):
+            r = row(h)
+            r.update(detections=int(total), accepted=int(accepted), dismissed=int(dismissed), north_star_ok=int(north_ok))
+
+        v_hour = _hour_bucket(self.session, Verification.created_at)
+        v_stmt = select(v_hour, func.count(Verification.id)).group_by(v_hour)
+        if start is not None:
+            v_stmt = v_stmt.where(Verification.created_at >= start)
+        for h, total in self.session.exec(v_stmt):
+            row(h)["verifications"] = int(total)
+
+        clear = delete(MetricsRollup)
+        if start is not None:
+            clear = clear.where(MetricsRollup.hour >= start)
+        self.session.exec(clear)  # type: ignore[call-overload]
+        if rows:
+            self.session.exec(  # type: ignore[call-overload]
+                insert(MetricsRollup), params=[{"hour": h, **vals} for h, vals in rows.items()]
+            )
+        return len(rows)
+
+
+class FireEventRepository:
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    def iter_recent_rows(
+        self,
+        columns: Sequence[Any],
+        hours: int,
+        min_confidence: float,
+        bbox: Optional[BBox] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[Tuple[Any, ...]]:
+        """Non-dismissed events seen within `hours`, latest first, as plain column tuples."""
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        conds: List[Any] = [
+            FireEvent.last_seen >= since,
+            FireEvent.max_confidence >= min_confidence,
+            FireEvent.status != DetectionStatus.dismissed,
+        ]
+        if bbox is not None:
+            conds.extend(_geohash_filters(FireEvent, bbox))
+        stmt = (
+            select(*columns)
+            .where(*conds)
+            .order_by(FireEvent.last_seen.desc())  # type: ignore[attr-defined]
+            .execution_options(yield_per=batch_size)
+        )
+        yield from self.session.exec(stmt)  # type: ignore[call-overload]
+
+    def window_start(self, hours: int) -> Optional[datetime]:
+        """Oldest `last_seen` within `hours` (see DetectionRepository.window_start)."""
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        return self.session.exec(select(func.min(FireEvent.last_seen)).where(FireEvent.last_seen >= since)).one()
+
+    def delete(self, event_ids: Iterable[str]) -> None:
+        ids = list(event_ids)
+        if ids:
+            self.session.exec(delete(FireEvent).where(FireEvent.id.in_(ids)))  # type: ignore[call-overload,attr-defined]
+
+    def column_dicts_last_seen_before(self, cutoff: datetime) -> List[Dict[str, Any]]:
+        table = FireEvent.__table__  # type: ignore[attr-defined]
+        stmt = select(table).where(table.c.last_seen < cutoff).order_by(table.c.id)
+        return [dict(r._mapping) for r in self.session.connection().execute(stmt)]
+
+    def refresh(self, event_ids: Iterable[str], seq: int, chunk: int = 500) -> int:
+        """Recompute the aggregates of `event_ids` from their members (upsert); returns events written.
+
+        Status: accepted once any member is, dismissed when every member is.
+        """
+        ids = sorted(set(event_ids))
+        written = 0
+        for i in range(0, len(ids), chunk):
+            written += self._refresh(ids[i : i + chunk], seq)
+        return written
+
+    def _refresh(self, ids: List[str], seq: int) -> int:
+        agg = (
+            select(
+                Detection.event_id,
+                func.count(Detection.id),
+                func.avg(Detection.lat),
+                func.avg(Detection.lon),
+                func.min(Detection.created_at),
+                func.max(Detection.created_at),
+                func.max(Detection.confidence),
+                func.max(Detection.fwi_bucket),
+                func.sum(Detection.confirms),
+                func.sum(Detection.denies),
+                func.sum(Detection.unsure),
+                func.sum(case((Detection.status == DetectionStatus.accepted, 1), else_=0)),
+                func.sum(case((Detection.status == DetectionStatus.dismissed, 1), else_=0)),
+            )
+            .where(Detection.event_id.in_(ids))  # type: ignore[union-attr]
+            .group_by(Detection.event_id)
+        )
+        latest_at = (
+            select(Detection.event_id.label("event_id"), func.max(Detection.created_at).label("at"))  # type: ignore[union-attr]
+            .where(Detection.event_id.in_(ids))  # type: ignore[union-attr]
+            .group_by(Detection.event_id)
+            .subquery()
+        )
+        latest = select(Detection.event_id, Detection.id, Detection.wind_dir_deg).join(
+            latest_at, (Detection.event_id == latest_at.c.event_id) & (Detection.created_at == latest_at.c.at)
+        )
+        rep = {ev: (det_id, wind) for ev, det_id, wind in self.session.exec(latest)}  # type: ignore[call-overload]
+
+        rows = []
+        for ev, n, lat, lon, first, last, conf, fwi, c, d, u, accepted, dismissed in self.session.exec(agg):  # type: ignore[call-overload]
+            status = (
+                DetectionStatus.accepted if accepted
+                else DetectionStatus.dismissed if dismissed == n
+                else DetectionStatus.unconfirmed
+            )
+            det_id, wind = rep[ev]
+            rows.append(
+                {
+                    "id": ev, "lat": float(lat), "lon": float(lon), "geohash": geohash_encode(float(lat), float(lon)),
+                    "first_seen": first, "last_seen": last, "member_count": int(n), "detection_id": det_id,
+                    "max_confidence": float(conf), "max_fwi_bucket": int(fwi), "wind_dir_deg": int(wind),
+                    "status": status, "confirms": int(c), "denies": int(d), "unsure": int(u), "change_seq": seq,
+                }
+            )
+        if not rows:
+            return 0
+        table = FireEvent.__table__  # type: ignore[attr-defined]
+        stmt = _upsert(self.session)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={c.name: stmt.excluded[c.name] for c in table.columns if c.name != "id"},
+        )
+        self.session.connection().execute(stmt, rows)  # one statement, executemany
+        return len(rows)
+
+
+class DataVersionRepository:
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    def current(self) -> int:
+        v = self.session.exec(select(DataVersion.version).where(DataVersion.id == 1)).first()
+        return int(v or 0)
+
+    def bump(self) -> int:
+        """Increment inside the caller's transaction and return the new version.
+
+        The row stays write-locked until the caller commits, so versions are handed out in
+        commit order and can be used as a delta-sync cursor (`Detection.change_seq`).
+        """
+        stmt = update(DataVersion).where(DataVersion.id == 1).values(version=DataVersion.version + 1)
+        if self.session.exec(stmt).rowcount == 0:  # type: ignore[call-overload]
+            self.session.add(DataVersion(id=1, version=1))
+            self.session.flush()
+        return self.current()
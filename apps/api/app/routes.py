@@ -1,16 +1,35 @@
 from __future__ import annotations
 
-from typing import Optional
+import asyncio
+import hmac
+import time
+from datetime import timezone
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, File, Form, Request, UploadFile
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
 
+from .config import settings
+from .cache import etag_matches, versioned_response
 from .db import get_session
-from .geojson import detections_to_feature_collection
+from .events import broadcaster
+from .geojson import DETECTION_FORMATS, FEATURE_COLUMNS, FORMAT_MEDIA_TYPES, dumps, row_to_feature
+from .geo import parse_bbox
 from .models import Verdict
-from .repositories import DetectionRepository
-from .schemas import MetricsResponse
+from .nearby import nearby_index
+from .offload import db_offload
+from .repositories import DataVersionRepository, DetectionRepository, FireEventRepository
+from .schemas import (
+    BatchVerificationItem,
+    BatchVerificationRequest,
+    BatchVerificationResponse,
+    BatchVerificationResult,
+    DetectionCounts,
+    MetricsResponse,
+)
 from .security import (
+    COOLDOWN_DETAIL,
     sha256_hex,
     device_fingerprint_raw,
     get_client_ip,
@@ -18,23 +37,154 @@ from .security import (
     enforce_cooldown,
     record_attempt,
 )
-from .services import VerificationService, MetricsService
+from .services import BatchOutcome, MapService, VerificationService, MetricsService
+from .telemetry import render_prometheus
+from .tiles import is_valid_tile, tile_bbox, tile_cache
 
 router = APIRouter(prefix="/api")
 
 
-def session_dep() -> Session:
-    return get_session()
+def session_dep() -> Iterator[Session]:
+    # Closed as soon as the endpoint returns (before a streamed body is sent), which hands the
+    # connection back to the pool instead of waiting for the session to be garbage collected.
+    with get_session() as session:
+        yield session
+
+
+def _check_format(format: str) -> None:
+    if format not in DETECTION_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(DETECTION_FORMATS)}.")
 
 
 @router.get("/detections")
-def list_detections(hours: int = 24, min_confidence: float = 0.0, session: Session = Depends(session_dep)):
-    repo = DetectionRepository(session)
-    dets = repo.list_recent(hours=hours, min_confidence=min_confidence, include_dismissed=False)
+def list_detections(
+    request: Request,
+    hours: int = 24,
+    min_confidence: float = 0.0,
+    bbox: Optional[str] = None,
+    zoom: Optional[int] = None,
+    group: str = "detections",
+    format: str = "geojson",
+    session: Session = Depends(session_dep),
+):
+    try:
+        box = parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bbox: {e}")
+    if group not in ("detections", "events"):
+        raise HTTPException(status_code=400, detail="group must be detections or events.")
+    _check_format(format)
+    if group == "events" and format != "geojson":
+        raise HTTPException(status_code=400, detail="group=events is only available as geojson.")
+    version = DataVersionRepository(session).current()
+
+    def render() -> Iterator[bytes]:
+        # The body streams after the request session is closed, so it owns one for its duration.
+        with get_session() as s:
+            if group == "events":
+                yield from MapService(s).event_collection(hours=hours, min_confidence=min_confidence, bbox=box)
+            else:
+                yield from MapService(s).feature_collection(
+                    hours=hours, min_confidence=min_confidence, bbox=box, zoom=zoom, format=format
+                )
+
+    key = ("detections", hours, min_confidence, box, zoom if group == "detections" else None, group, format)
+    repo = FireEventRepository(session) if group == "events" else DetectionRepository(session)
+    return versioned_response(
+        request, key, version, render,
+        media_type=FORMAT_MEDIA_TYPES[format],
+        window_start=lambda: repo.window_start(hours),
+    )
+
+
+@router.get("/detections/changes")
+def detection_changes(
+    since: Optional[int] = None,
+    hours: int = 24,
+    min_confidence: float = 0.0,
+    session: Session = Depends(session_dep),
+):
+    """Features inserted or changed after cursor `since` (dismissed ones included) + a new cursor.
+
+    Without `since` only the current cursor is returned, to start syncing from now.
+    """
+    cursor = DataVersionRepository(session).current()
+    features = []
+    if since is not None:
+        rows = DetectionRepository(session).changes_since(since, FEATURE_COLUMNS, hours, min_confidence)
+        features = [row_to_feature(r[:-1]) for r in rows]
+        if rows:
+            cursor = max(cursor, rows[-1][-1])
+    body = {"type": "FeatureCollection", "features": features, "cursor": cursor}
+    return Response(content=dumps(body), media_type="application/geo+json", headers={"Cache-Control": "no-store"})
 
-    vs = VerificationService(session)
-    enriched = [{"detection": d, "counts": vs.get_counts(d.id).as_dict()} for d in dets]
-    return detections_to_feature_collection(enriched)
+
+@router.get("/detections/nearby")
+def nearby_detections(
+    lat: float,
+    lon: float,
+    radius_km: float = 15.0,
+    limit: int = 50,
+    hours: int = 24,
+    min_confidence: float = 0.0,
+    session: Session = Depends(session_dep),
+):
+    """Non-dismissed detections within `radius_km` of (lat, lon), closest first, with
+    `properties.distance_km`; `total` counts all matches, not just the `limit` returned."""
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=400, detail="lat/lon out of range.")
+    if not 0 < radius_km <= settings.nearby_max_radius_km:
+        raise HTTPException(status_code=400, detail=f"radius_km must be in (0, {settings.nearby_max_radius_km:g}].")
+    if not 1 <= limit <= settings.nearby_max_limit:
+        raise HTTPException(status_code=400, detail=f"limit must be in [1, {settings.nearby_max_limit}].")
+    if not 1 <= hours <= settings.nearby_hours:
+        raise HTTPException(status_code=400, detail=f"hours must be in [1, {settings.nearby_hours}].")
+
+    nearby_index.refresh(session)
+    hits, total = nearby_index.search(lat, lon, radius_km, hours=hours, min_confidence=min_confidence, limit=limit)
+    features = []
+    for dist, row in hits:
+        feature = row_to_feature(row)
+        feature["properties"]["distance_km"] = round(dist, 3)
+        features.append(feature)
+    body = {"type": "FeatureCollection", "features": features, "total": total}
+    return Response(content=dumps(body), media_type="application/geo+json", headers={"Cache-Control": "no-store"})
+
+
+@router.get("/tiles/{z}/{x}/{y}")
+def get_tile(
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    hours: int = 24,
+    min_confidence: float = 0.0,
+    format: str = "geojson",
+    session: Session = Depends(session_dep),
+):
+    if not is_valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail="Tile out of range.")
+    _check_format(format)
+    key = (z, x, y, hours, round(min_confidence, 2), format)
+    hit = tile_cache.get(key)
+    if hit is None:
+        generation = tile_cache.generation((z, x, y))
+        chunks = MapService(session).feature_collection(
+            hours=hours, min_confidence=key[4], bbox=tile_bbox(z, x, y), zoom=z, format=format
+        )
+        hit = tile_cache.put(key, b"".join(chunks), generation)
+
+    body, etag = hit
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.tile_cache_ttl_seconds}"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=FORMAT_MEDIA_TYPES[format], headers=headers)
+
+
+def _admit_vote(request: Request, device_fp_hash: str) -> None:
+    record_attempt()
+    enforce_rate_limit(request)
+    enforce_cooldown(device_fp_hash)
 
 
 @router.post("/detections/{detection_id}/verify")
@@ -45,34 +195,131 @@ async def verify_detection(
     photo: Optional[UploadFile] = File(default=None),
     session: Session = Depends(session_dep),
 ):
-    record_attempt()
-    enforce_rate_limit(request)
-
     fp_raw = device_fingerprint_raw(request)
     device_fp_hash = sha256_hex(fp_raw)
-    enforce_cooldown(device_fp_hash)
+    # The limiter store may be a shared SQLite file: keep its IO off the event loop.
+    await db_offload.run(_admit_vote, request, device_fp_hash)
 
     ip_hash = sha256_hex(get_client_ip(request))
 
     svc = VerificationService(session)
-    det, counts = await svc.submit(
+    outcome = await svc.submit(
         detection_id=detection_id,
         verdict=verdict,
         device_fp_hash=device_fp_hash,
         ip_hash=ip_hash,
         photo=photo,
     )
-    return {"id": det.id, "status": det.status.value, "counts": counts.as_dict()}
+    return {"id": outcome.detection_id, "status": outcome.status.value, "counts": outcome.counts.as_dict()}
 
 
-@router.get("/metrics", response_model=MetricsResponse)
-def metrics(window_hours: int = 24, session: Session = Depends(session_dep)):
-    svc = MetricsService(session)
-    m = svc.compute(window_hours=window_hours)
-    return MetricsResponse(
-        window_hours=window_hours,
-        north_star_pct=float(m["north_star_pct"]),
-        false_alarm_rate=float(m["false_alarm_rate"]),
-        abuse_block_rate=float(m["abuse_block_rate"]),
-        totals=m["totals"],  # type: ignore[arg-type]
+def _cast_at(item: BatchVerificationItem, now: float) -> float:
+    # Client clocks are untrusted: never in the future, never older than the queue max age.
+    if item.client_timestamp is None:
+        return now
+    ts = item.client_timestamp
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return min(now, max(ts.timestamp(), now - settings.batch_max_age_hours * 3600))
+
+
+def _batch_result(o: BatchOutcome) -> BatchVerificationResult:
+    return BatchVerificationResult(
+        detection_id=o.detection_id,
+        status_code=o.status_code,
+        detail=o.detail,
+        status=o.status.value if o.status is not None else None,
+        counts=DetectionCounts(**o.counts.as_dict()) if o.counts is not None else None,
+    )
+
+
+@router.post("/verifications:batch", response_model=BatchVerificationResponse)
+def verify_batch(
+    body: BatchVerificationRequest,
+    request: Request,
+    session: Session = Depends(session_dep),
+):
+    if len(body.items) > settings.batch_max_items:
+        raise HTTPException(status_code=413, detail=f"Too many items (max {settings.batch_max_items}).")
+
+    device_fp_hash = sha256_hex(device_fingerprint_raw(request))
+    ip_hash = sha256_hex(get_client_ip(request))
+
+    # Each item is charged against the rate limit and cooldown as if it were posted on its own,
+    # in the order the votes were cast on the device.
+    now = time.time()
+    cast_at: List[Tuple[float, int]] = sorted((_cast_at(it, now), i) for i, it in enumerate(body.items))
+    outcomes: Dict[int, BatchOutcome] = {}
+    accepted: List[int] = []
+    for at, i in cast_at:
+        record_attempt()
+        try:
+            enforce_rate_limit(request)
+            enforce_cooldown(device_fp_hash, at=at)
+        except HTTPException as e:
+            status_code, detail = e.status_code, e.detail
+            if e.detail == COOLDOWN_DETAIL and body.items[i].client_timestamp is not None:
+                # Its cast time is fixed, so retrying can never clear the cooldown.
+                status_code, detail = 409, "Cast too soon after another vote from this device."
+            outcomes[i] = BatchOutcome(detection_id=body.items[i].detection_id, status_code=status_code, detail=detail)
+            continue
+        accepted.append(i)
+
+    svc = VerificationService(session)
+    applied = svc.submit_batch(
+        [(body.items[i].detection_id, body.items[i].verdict) for i in accepted],
+        device_fp_hash=device_fp_hash,
+        ip_hash=ip_hash,
+    )
+    outcomes.update(zip(accepted, applied))
+    return BatchVerificationResponse(results=[_batch_result(outcomes[i]) for i in range(len(body.items))])
+
+
+@router.get("/stream")
+async def stream(request: Request):
+    if broadcaster.subscriber_count >= settings.stream_max_subscribers:
+        raise HTTPException(status_code=503, detail="Too many live listeners; poll instead.")
+
+    async def events() -> AsyncIterator[str]:
+        async with broadcaster.subscribe() as q:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(q.get(), timeout=settings.stream_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {dumps(event).decode('utf-8')}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+@router.get("/metrics", response_model=MetricsResponse)
+def metrics(request: Request, window_hours: int = 24, session: Session = Depends(session_dep)):
+    version = DataVersionRepository(session).current()
+
+    def render() -> bytes:
+        m = MetricsService(session).compute(window_hours=window_hours)
+        resp = MetricsResponse(
+            window_hours=window_hours,
+            north_star_pct=float(m["north_star_pct"]),
+            false_alarm_rate=float(m["false_alarm_rate"]),
+            abuse_block_rate=float(m["abuse_block_rate"]),
+            totals=m["totals"],  # type: ignore[arg-type]
+        )
+        return resp.model_dump_json().encode("utf-8")
+
+    return versioned_response(request, ("metrics", window_hours), version, render)
+
+
+@router.get("/ops/metrics", include_in_schema=False)
+def ops_metrics(request: Request):
+    """Per-worker performance metrics (latency, DB, limiter) in Prometheus text format."""
+    token = settings.ops_metrics_token
+    if token and not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Missing or invalid ops token.")
+    return Response(content=render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -20,3 +20,25 @@ class MetricsResponse(BaseModel):
     false_alarm_rate: float
     abuse_block_rate: float
     totals: Dict[str, Any]
+
+
+class BatchVerificationItem(BaseModel):
+    detection_id: str
+    verdict: Verdict
+    client_timestamp: Optional[datetime] = None
+
+
+class BatchVerificationRequest(BaseModel):
+    items: List[BatchVerificationItem]
+
+
+class BatchVerificationResult(BaseModel):
+    detection_id: str
+    status_code: int
+    detail: Optional[str] = None
+    status: Optional[str] = None
+    counts: Optional[DetectionCounts] = None
+
+
+class BatchVerificationResponse(BaseModel):
+    results: List[BatchVerificationResult]
@@ -2,12 +2,15 @@ from __future__ import annotations
 
 import hashlib
 import time
-from dataclasses import dataclass
-from typing import Dict, Tuple
+from typing import Optional, Tuple
 
 from fastapi import Request, HTTPException
 
 from .config import settings
+from .limiter import LimiterStore, limiter_store
+from .telemetry import record_limiter_decision
+
+COOLDOWN_DETAIL = "Please wait before verifying again."
 
 
 def sha256_hex(value: str) -> str:
@@ -27,68 +30,51 @@ def device_fingerprint_raw(request: Request) -> str:
     return f"{ua}|{ip}"
 
 
-@dataclass
-class TokenBucket:
-    capacity: int
-    refill_per_second: float
-    tokens: float
-    last_refill: float
-
-
 class RateLimiter:
-    def __init__(self, per_minute: int) -> None:
+    """Token bucket per key (`per_minute` burst, refilled evenly), state kept in `store`."""
+
+    def __init__(self, per_minute: int, store: LimiterStore) -> None:
         self.per_minute = per_minute
-        self._buckets: Dict[str, TokenBucket] = {}
+        self.store = store
 
     def check(self, key: str) -> bool:
-        now = time.time()
-        capacity = self.per_minute
-        refill_per_second = self.per_minute / 60.0
-
-        b = self._buckets.get(key)
-        if b is None:
-            b = TokenBucket(capacity=capacity, refill_per_second=refill_per_second, tokens=capacity, last_refill=now)
-            self._buckets[key] = b
-
-        elapsed = max(0.0, now - b.last_refill)
-        b.tokens = min(b.capacity, b.tokens + elapsed * b.refill_per_second)
-        b.last_refill = now
-
-        if b.tokens >= 1.0:
-            b.tokens -= 1.0
-            return True
-        return False
-
+        return self.store.take(key, self.per_minute, self.per_minute / 60.0, time.time())
 
-rate_limiter = RateLimiter(settings.rate_limit_per_minute)
 
-_last_verify_ts: Dict[str, float] = {}
-_abuse_totals: Dict[str, int] = {"verify_attempts": 0, "blocked": 0}
+rate_limiter = RateLimiter(settings.rate_limit_per_minute, limiter_store)
 
 
 def record_attempt() -> None:
-    _abuse_totals["verify_attempts"] += 1
+    limiter_store.incr("verify_attempts", time.time())
 
 
 def record_block() -> None:
-    _abuse_totals["blocked"] += 1
+    limiter_store.incr("blocked", time.time())
 
 
-def abuse_stats() -> Tuple[int, int]:
-    return _abuse_totals["verify_attempts"], _abuse_totals["blocked"]
+def abuse_stats(since: float) -> Tuple[int, int]:
+    """(verify attempts, blocked) since `since` (hour granularity), across workers sharing the store."""
+    totals = limiter_store.counter_totals(since)
+    return totals.get("verify_attempts", 0), totals.get("blocked", 0)
 
 
 def enforce_rate_limit(request: Request) -> None:
     ip = get_client_ip(request)
-    if not rate_limiter.check(ip):
+    allowed = rate_limiter.check(ip)
+    record_limiter_decision("rate_limit", allowed)
+    if not allowed:
         record_block()
         raise HTTPException(status_code=429, detail="Too many requests. Please slow down.")
 
 
-def enforce_cooldown(device_fp_hash: str) -> None:
-    now = time.time()
-    last = _last_verify_ts.get(device_fp_hash)
-    if last is not None and (now - last) < settings.verify_cooldown_seconds:
+def enforce_cooldown(device_fp_hash: str, at: Optional[float] = None) -> None:
+    # `at` lets queued offline votes be spaced by when they were cast rather than when they arrive;
+    # actions are kept for the batch max age so back-dated votes cannot slip between them.
+    now = time.time() if at is None else at
+    allowed = limiter_store.cooldown(
+        device_fp_hash, settings.verify_cooldown_seconds, now, horizon=settings.batch_max_age_hours * 3600
+    )
+    record_limiter_decision("cooldown", allowed)
+    if not allowed:
         record_block()
-        raise HTTPException(status_code=429, detail="Please wait before verifying again.")
-    _last_verify_ts[device_fp_hash] = now
+        raise HTTPException(status_code=429, detail=COOLDOWN_DETAIL)
@@ -5,7 +5,10 @@ import uuid
 
 from sqlmodel import Session, select
 
+from .clustering import cluster_all
+from .geo import geohash_encode
 from .models import Detection
+from .repositories import DataVersionRepository, MetricsRollupRepository
 
 SEED_DETECTIONS = [
     {"name": "Attica - Mount Hymettus", "lat": 37.969, "lon": 23.798, "confidence": 0.72, "fwi_bucket": 4, "wind_dir_deg": 40},
@@ -20,6 +23,8 @@ def seed_if_empty(session: Session) -> None:
         return
 
     now = datetime.now(timezone.utc)
+    rollups = MetricsRollupRepository(session)
+    seq = DataVersionRepository(session).bump()
     for i, d in enumerate(SEED_DETECTIONS):
         det = Detection(
             id=str(uuid.uuid4()),
@@ -30,6 +35,11 @@ def seed_if_empty(session: Session) -> None:
             source="seed",
             fwi_bucket=d["fwi_bucket"],
             wind_dir_deg=d["wind_dir_deg"],
+            geohash=geohash_encode(d["lat"], d["lon"]),
+            change_seq=seq,
         )
         session.add(det)
+        rollups.bump(det.created_at, detections=1)
+    session.flush()
+    cluster_all(session, seq)
     session.commit()
@@ -1,18 +1,43 @@
 from __future__ import annotations
 
-import os
-import secrets
+import asyncio
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 
 from fastapi import UploadFile, HTTPException
+from sqlalchemy import case, literal
 from sqlmodel import Session
-from sqlmodel import select, func
 
 from .config import settings
+from .db import as_utc, get_session
+from .geo import BBox, cluster_precision
+from .geojson import (
+    EVENT_COLUMNS,
+    FEATURE_COLUMNS,
+    detection_row,
+    encode_detections,
+    event_row_to_feature,
+    iter_feature_collection,
+)
 from .models import Detection, Verification, Verdict, DetectionStatus
-from .repositories import DetectionRepository, VerificationRepository
+from .offload import db_offload
+from .photos import PhotoStorage
+from .tiles import tile_cache
+from .writer import GroupCommitQueue
+from .repositories import (
+    NORTH_STAR_VOTES,
+    NORTH_STAR_WINDOW,
+    DataVersionRepository,
+    DetectionRepository,
+    FireEventRepository,
+    MetricsRollupRepository,
+    VerificationRepository,
+    floor_hour,
+)
+
+
+ALREADY_VOTED = "You already verified this detection."
 
 
 @dataclass(frozen=True)
@@ -24,27 +49,38 @@ class AggregatedCounts:
     def as_dict(self) -> Dict[str, int]:
         return {"confirms": self.confirms, "denies": self.denies, "unsure": self.unsure}
 
+    @classmethod
+    def from_detection(cls, d: Detection) -> "AggregatedCounts":
+        return cls(confirms=d.confirms, denies=d.denies, unsure=d.unsure)
+
+
+@dataclass(frozen=True)
+class BatchOutcome:
+    detection_id: str
+    status_code: int
+    detail: Optional[str] = None
+    status: Optional[DetectionStatus] = None
+    counts: Optional[AggregatedCounts] = None
 
-class PhotoStorage:
-    def __init__(self, photos_dir: str) -> None:
-        self.photos_dir = photos_dir
-        os.makedirs(self.photos_dir, exist_ok=True)
 
-    async def save(self, file: UploadFile) -> str:
-        ct = (file.content_type or "").lower()
-        if ct not in {"image/jpeg", "image/jpg", "image/png", "image/webp"}:
-            raise HTTPException(status_code=400, detail="Photo must be jpeg/png/webp.")
-        ext = ".jpg" if "jpeg" in ct or "jpg" in ct else ".png" if "png" in ct else ".webp"
-        name = secrets.token_hex(16) + ext
-        path = os.path.join(self.photos_dir, name)
+@dataclass
+class StatusStats:
+    stale: int = 0          # detections whose stored status disagreed with the rule
+    changed: int = 0
+    accepted: int = 0       # of those, moved to each status
+    dismissed: int = 0
+    unconfirmed: int = 0
+    events: int = 0         # fire events refreshed
+    chunks: int = 0
 
-        data = await file.read()
-        if len(data) > 4 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="Photo too large (max 4MB).")
 
-        with open(path, "wb") as f:
-            f.write(data)
-        return path
+@dataclass
+class PendingVote:
+    detection_id: str
+    verdict: Verdict
+    device_fp_hash: str
+    ip_hash: str
+    photo_path: Optional[str] = None
 
 
 class VerificationService:
@@ -52,6 +88,9 @@ class VerificationService:
         self.session = session
         self.detections = DetectionRepository(session)
         self.verifications = VerificationRepository(session)
+        self.rollups = MetricsRollupRepository(session)
+        self.versions = DataVersionRepository(session)
+        self.events = FireEventRepository(session)
         self.photos = PhotoStorage(settings.photos_dir)
 
     def _evaluate_status(self, counts: AggregatedCounts) -> DetectionStatus:
@@ -68,9 +107,102 @@ class VerificationService:
                 return DetectionStatus.dismissed
         return DetectionStatus.unconfirmed
 
+    def _status_sql(self) -> Any:
+        """`_evaluate_status` as a SQL CASE over the counter columns (keep the two in step)."""
+        typ = Detection.__table__.c.status.type  # type: ignore[attr-defined]
+        dismiss = Detection.denies >= settings.dismiss_deny_threshold
+        if settings.dismiss_deny_over_confirm:
+            dismiss = dismiss & (Detection.denies > Detection.confirms)
+        return case(
+            (Detection.confirms >= 1, literal(DetectionStatus.accepted, typ)),
+            (dismiss, literal(DetectionStatus.dismissed, typ)),
+            else_=literal(DetectionStatus.unconfirmed, typ),
+        )
+
+    def reevaluate_statuses(
+        self, hours: Optional[int] = None, chunk_size: int = 1000, dry_run: bool = False
+    ) -> StatusStats:
+        """Re-apply the status rule to detections (created within `hours`, default all) whose
+        stored status disagrees with their counters, e.g. after HF_DISMISS_* changed.
+
+        Stale rows are updated with set-based statements, `chunk_size` at a time in one short
+        transaction each, so a live database never waits long for the write lock. Rollups, fire
+        events and change_seq are kept in step, so clients and other workers see the moves.
+        """
+        status = self._status_sql()
+        since = datetime.now(timezone.utc) - timedelta(hours=hours) if hours is not None else None
+        ids = self.detections.stale_status_ids(status, since)
+        self.session.rollback()  # end the read transaction before the chunks
+        stats = StatusStats(stale=len(ids))
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start : start + chunk_size]
+            # Bump first: the write lock is then held, so the moves counted are the ones updated.
+            seq = None if dry_run else self.versions.bump()
+            moves = self.detections.status_moves(chunk, status)
+            for hour, old, new, n in moves:
+                setattr(stats, new.value, getattr(stats, new.value) + n)
+                if seq is not None:
+                    delta = {k: n * ((new.value == k) - (old.value == k)) for k in ("accepted", "dismissed")}
+                    self.rollups.bump(hour, **delta)
+            stats.chunks += 1
+            if seq is None:
+                self.session.rollback()
+                continue
+            event_ids = self.detections.stale_status_event_ids(chunk, status)
+            stats.changed += self.detections.set_statuses(chunk, status, seq)
+            if event_ids:
+                stats.events += self.events.refresh(event_ids, seq)
+            self.session.commit()
+        return stats
+
     def get_counts(self, detection_id: str) -> AggregatedCounts:
-        c, d, u = self.verifications.counts(detection_id)
-        return AggregatedCounts(confirms=c, denies=d, unsure=u)
+        det = self.detections.get(detection_id)
+        if det is None:
+            return AggregatedCounts(confirms=0, denies=0, unsure=0)
+        return AggregatedCounts.from_detection(det)
+
+    def _ensure_votable(self, det: Optional[Detection], already_voted: bool) -> Detection:
+        if det is None:
+            raise HTTPException(status_code=404, detail="Detection not found.")
+        if det.status == DetectionStatus.dismissed:
+            raise HTTPException(status_code=410, detail="Detection already dismissed.")
+        if already_voted:
+            raise HTTPException(status_code=409, detail=ALREADY_VOTED)
+        return det
+
+    def _record(self, det: Detection, v: Verification, seq: int) -> Tuple[Detection, AggregatedCounts]:
+        """Apply the effects of the just-inserted vote `v` on `det`.
+
+        Insert, counter bump, rollups and status change share the caller's transaction; it commits once.
+        """
+        early = v.created_at <= as_utc(det.created_at) + NORTH_STAR_WINDOW
+        det = self.detections.increment_count(det, v.verdict, early=early)
+        self.rollups.bump(v.created_at, verifications=1)
+        if early and det.early_votes == NORTH_STAR_VOTES:
+            self.rollups.bump(det.created_at, north_star_ok=1)
+
+        counts = AggregatedCounts.from_detection(det)
+        new_status = self._evaluate_status(counts)
+        if new_status != det.status:
+            moves = {det.status.value: -1, new_status.value: 1}
+            self.rollups.bump(det.created_at, accepted=moves.get("accepted", 0), dismissed=moves.get("dismissed", 0))
+            det = self.detections.set_status(det, new_status)
+        det = self.detections.mark_changed(det, seq)
+        return det, counts
+
+    @staticmethod
+    def _after_commit(touched: List[Tuple[float, float]]) -> None:
+        # Other workers pick the change up from the change feed (see events.ChangeFeed).
+        for lat, lon in touched:
+            tile_cache.invalidate_point(lat, lon)
+
+    def _load_votable(self, detection_id: str, device_fp_hash: str) -> Detection:
+        det = self.detections.get(detection_id)
+        det = self._ensure_votable(
+            det, det is not None and self.verifications.exists_for_device(detection_id, device_fp_hash)
+        )
+        self.session.rollback()  # hand the connection back while the photo is received
+        return det
 
     async def submit(
         self,
@@ -79,35 +211,125 @@ class VerificationService:
         device_fp_hash: str,
         ip_hash: str,
         photo: Optional[UploadFile] = None,
-    ) -> Tuple[Detection, AggregatedCounts]:
-        det = self.detections.get(detection_id)
-        if det is None:
-            raise HTTPException(status_code=404, detail="Detection not found.")
-        if det.status == DetectionStatus.dismissed:
-            raise HTTPException(status_code=410, detail="Detection already dismissed.")
-        if self.verifications.exists_for_device(detection_id, device_fp_hash):
-            raise HTTPException(status_code=409, detail="You already verified this detection.")
+    ) -> BatchOutcome:
+        """Record one vote without blocking the event loop; raises HTTPException if refused.
 
+        The write goes through the worker's group-commit queue (or, with HF_GROUP_COMMIT off,
+        the DB offload pool). A photo is only stored once the vote is known to be acceptable.
+        """
         photo_path: Optional[str] = None
         if photo is not None and settings.save_photos:
+            await db_offload.run(self._load_votable, detection_id, device_fp_hash)
             photo_path = await self.photos.save(photo)
 
-        v = Verification(
-            detection_id=detection_id,
-            created_at=datetime.now(timezone.utc),
-            verdict=verdict,
-            device_fp_hash=device_fp_hash,
-            ip_hash=ip_hash,
-            photo_path=photo_path,
-        )
-        self.verifications.add(v)
+        vote = PendingVote(detection_id, verdict, device_fp_hash, ip_hash, photo_path)
+        if settings.group_commit:
+            outcome = await asyncio.wrap_future(vote_writer.submit(vote))
+        else:
+            outcome = (await db_offload.run(self.apply_votes, [vote]))[0]
+        if outcome.status_code != 200:
+            raise HTTPException(status_code=outcome.status_code, detail=outcome.detail)
+        return outcome
 
-        counts = self.get_counts(detection_id)
-        new_status = self._evaluate_status(counts)
-        if new_status != det.status:
-            det = self.detections.set_status(det, new_status)
+    def submit_batch(
+        self,
+        items: Sequence[Tuple[str, Verdict]],
+        device_fp_hash: str,
+        ip_hash: str,
+    ) -> List[BatchOutcome]:
+        """Apply queued (detection_id, verdict) votes in one transaction, one outcome per item."""
+        return self.apply_votes([PendingVote(d, v, device_fp_hash, ip_hash) for d, v in items])
 
-        return det, counts
+    def apply_votes(self, votes: Sequence[PendingVote]) -> List[BatchOutcome]:
+        """Apply votes (from any devices) in one transaction and one commit, one outcome per vote."""
+        if not votes:
+            return []
+        dets = self.detections.get_many(v.detection_id for v in votes)
+
+        outcomes: List[BatchOutcome] = []
+        touched: List[Tuple[float, float]] = []
+        event_ids: Set[str] = set()
+        seq: Optional[int] = None
+        for vote in votes:
+            try:
+                det = self._ensure_votable(dets.get(vote.detection_id), already_voted=False)
+            except HTTPException as e:
+                outcomes.append(BatchOutcome(detection_id=vote.detection_id, status_code=e.status_code, detail=e.detail))
+                continue
+            v = Verification(
+                detection_id=det.id,
+                created_at=datetime.now(timezone.utc),
+                verdict=vote.verdict,
+                device_fp_hash=vote.device_fp_hash,
+                ip_hash=vote.ip_hash,
+                photo_path=vote.photo_path,
+            )
+            # No lookup first: the unique index turns a repeat vote (even one racing in from
+            # another worker) into a no-op insert.
+            if not self.verifications.add_once(v):
+                outcomes.append(BatchOutcome(detection_id=vote.detection_id, status_code=409, detail=ALREADY_VOTED))
+                continue
+            if seq is None:
+                seq = self.versions.bump()  # one version for the whole batch
+            det, counts = self._record(det, v, seq)
+            touched.append((det.lat, det.lon))
+            if det.event_id is not None:
+                event_ids.add(det.event_id)
+            outcomes.append(
+                BatchOutcome(detection_id=vote.detection_id, status_code=200, status=det.status, counts=counts)
+            )
+
+        if event_ids and seq is not None:
+            self.events.refresh(event_ids, seq)  # summed counts and status of the fires voted on
+        self.session.commit()
+        self._after_commit(touched)
+        return outcomes
+
+
+def _apply_votes(votes: List[PendingVote]) -> List[BatchOutcome]:
+    with get_session() as session:
+        return VerificationService(session).apply_votes(votes)
+
+
+vote_writer: GroupCommitQueue[PendingVote, BatchOutcome] = GroupCommitQueue(
+    _apply_votes, settings.group_commit_window_ms, settings.group_commit_max_batch
+)
+
+
+class MapService:
+    def __init__(self, session: Session) -> None:
+        self.session = session
+        self.detections = DetectionRepository(session)
+
+    def feature_collection(
+        self,
+        hours: int,
+        min_confidence: float,
+        bbox: Optional[BBox] = None,
+        zoom: Optional[int] = None,
+        format: str = "geojson",
+    ) -> Iterator[bytes]:
+        """Serialized detection chunks in `format` (see geojson.DETECTION_FORMATS); clustered by
+        geohash cell when `zoom` calls for it."""
+        precision = cluster_precision(zoom)
+        if precision is None:
+            rows = self.detections.iter_recent_rows(
+                FEATURE_COLUMNS, hours=hours, min_confidence=min_confidence, include_dismissed=False, bbox=bbox
+            )
+            return encode_detections(rows, format=format)
+
+        # Zoomed out: one feature per grid cell; cells holding a single detection are sent as that point.
+        cells = self.detections.clusters(hours=hours, min_confidence=min_confidence, precision=precision, bbox=bbox)
+        singles = self.detections.get_many(c["sample_id"] for c in cells if c["count"] == 1)
+        rows = [detection_row(d) for d in sorted(singles.values(), key=lambda d: d.created_at, reverse=True)]
+        return encode_detections(rows, clusters=[c for c in cells if c["count"] > 1], format=format)
+
+    def event_collection(self, hours: int, min_confidence: float, bbox: Optional[BBox] = None) -> Iterator[bytes]:
+        """Serialized FeatureCollection chunks with one feature per fire event."""
+        rows = FireEventRepository(self.session).iter_recent_rows(
+            EVENT_COLUMNS, hours=hours, min_confidence=min_confidence, bbox=bbox
+        )
+        return iter_feature_collection(rows, to_feature=event_row_to_feature)
 
 
 class MetricsService:
@@ -115,13 +337,27 @@ class MetricsService:
         self.session = session
         self.detections = DetectionRepository(session)
         self.verifications = VerificationRepository(session)
+        self.rollups = MetricsRollupRepository(session)
 
     def compute(self, window_hours: int = 24) -> Dict[str, float | Dict[str, int]]:
         now = datetime.now(timezone.utc)
         since = now - timedelta(hours=window_hours)
 
-        dets = self.detections.list_recent(hours=window_hours, min_confidence=0.0, include_dismissed=True)
-        total = len(dets)
+        # Whole hours come from the rollup table; only the leading partial hour hits raw tables.
+        first_full = floor_hour(since)
+        if first_full < since:
+            first_full += timedelta(hours=1)
+        t = self.rollups.sum_since(first_full)
+        head = self.detections.window_totals(since, first_full)
+        for k, v in head.items():
+            t[k] += v
+        t["verifications"] += self.verifications.count_total_in_window(since, until=first_full)
+
+        from .security import abuse_stats
+        attempts, blocked = abuse_stats(since.timestamp())
+        abuse_rate = (blocked / attempts) if attempts else 0.0
+
+        total = t["detections"]
         if total == 0:
             return {
                 "north_star_pct": 0.0,
@@ -130,38 +366,14 @@ class MetricsService:
                 "totals": {"detections": 0, "dismissed": 0, "accepted": 0, "verifications": 0},
             }
 
-        north_ok = 0
-        dismissed = 0
-        accepted = 0
-
-        for d in dets:
-            if d.status == DetectionStatus.dismissed:
-                dismissed += 1
-            if d.status == DetectionStatus.accepted:
-                accepted += 1
-
-            start = d.created_at
-            end = d.created_at + timedelta(minutes=30)
-            from .models import Verification
-            stmt = select(func.count(Verification.id)).where(
-                Verification.detection_id == d.id,
-                Verification.created_at >= start,
-                Verification.created_at <= end,
-            )
-            c = int(self.session.exec(stmt).one())
-            if c >= 3:
-                north_ok += 1
-
-        from .security import abuse_stats
-        attempts, blocked = abuse_stats()
-        abuse_rate = (blocked / attempts) if attempts else 0.0
-
-        false_alarm = dismissed / total
-        verif_total = self.verifications.count_total_in_window(since)
-
         return {
-            "north_star_pct": (north_ok / total) * 100.0,
-            "false_alarm_rate": float(false_alarm),
+            "north_star_pct": (t["north_star_ok"] / total) * 100.0,
+            "false_alarm_rate": float(t["dismissed"] / total),
             "abuse_block_rate": float(abuse_rate),
-            "totals": {"detections": total, "dismissed": dismissed, "accepted": accepted, "verifications": verif_total},
+            "totals": {
+                "detections": total,
+                "dismissed": t["dismissed"],
+                "accepted": t["accepted"],
+                "verifications": t["verifications"],
+            },
         }
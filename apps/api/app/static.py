@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import mimetypes
+import os
+import stat
+from typing import Set
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+mimetypes.add_type("application/geo+json", ".geojson")
+
+# Preferred first.
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def accepted_encodings(header: str) -> Set[str]:
+    """Codings listed in an Accept-Encoding header, minus those refused with q=0."""
+    out: Set[str] = set()
+    refused: Set[str] = set()
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        coding, params = coding.strip().lower(), params.strip().lower()
+        try:
+            q = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            q = 0.0
+        if coding:
+            (out if q > 0 else refused).add(coding)
+    if "*" in out:
+        out.update(e for e, _ in _ENCODINGS)
+    return out - refused
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that answers with a `.br` or `.gz` sibling of the requested file when there is
+    one and the client accepts it, so nothing is compressed per request.
+
+    The directory may not exist yet (it is created by the first publish); until then every path
+    is a 404 rather than a startup error.
+    """
+
+    def __init__(self, *, directory: str, cache_control: str = "") -> None:
+        super().__init__(directory=directory, check_dir=False)
+        self.cache_control = cache_control
+
+    async def check_config(self) -> None:
+        if self.directory is not None and not os.path.isdir(self.directory):
+            return
+        await super().check_config()
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        headers = Headers(scope=scope)
+        accepted = accepted_encodings(headers.get("accept-encoding", ""))
+        response = None
+        if scope["method"] in ("GET", "HEAD"):
+            for encoding, suffix in _ENCODINGS:
+                if encoding not in accepted:
+                    continue
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+                if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+                    response = FileResponse(
+                        full_path,
+                        stat_result=stat_result,
+                        media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+                        headers={"Content-Encoding": encoding},
+                    )
+                    if self.is_not_modified(response.headers, headers):
+                        response = NotModifiedResponse(response.headers)
+                    break
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["Vary"] = "Accept-Encoding"
+        if self.cache_control:
+            response.headers["Cache-Control"] = self.cache_control
+        return response
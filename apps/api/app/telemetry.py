@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[str, ...]
+
+
+def _fmt_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_fmt_labels(self.labelnames, labels)} {value:g}"
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}  # labels -> (bucket counts, [sum])
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            hit = self._values.get(labels)
+            if hit is None:
+                hit = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            hit[0][bisect_left(self.buckets, value)] += 1
+            hit[1][0] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *labels)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._values.items())
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip([*self.buckets, "+Inf"], counts):
+                cumulative += n
+                le = 'le="' + (bound if isinstance(bound, str) else f"{bound:g}") + '"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {total:g}"
+            yield f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {cumulative}"
+
+
+REQUEST_SECONDS = Histogram(
+    "hf_http_request_duration_seconds", "Time to the last body byte, per route.", ("method", "route")
+)
+REQUESTS = Counter("hf_http_requests_total", "Responses by route and status code.", ("method", "route", "status"))
+REQUEST_QUERIES = Histogram(
+    "hf_http_request_db_queries", "SQL statements issued per request.", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_SECONDS = Histogram(
+    "hf_http_request_db_seconds", "Time spent in SQL statements per request.", ("method", "route")
+)
+DB_QUERY_SECONDS = Histogram("hf_db_query_seconds", "Duration of single SQL statements.")
+DB_COMMIT_SECONDS = Histogram("hf_db_commit_seconds", "Session commit latency (flush + COMMIT).")
+PHOTO_SAVE_SECONDS = Histogram("hf_photo_save_seconds", "Time to receive and store a verification photo.")
+LIMITER_DECISIONS = Counter(
+    "hf_limiter_decisions_total", "Rate-limit and cooldown decisions.", ("check", "decision")
+)
+
+_ALL = (
+    REQUEST_SECONDS,
+    REQUESTS,
+    REQUEST_QUERIES,
+    REQUEST_DB_SECONDS,
+    DB_QUERY_SECONDS,
+    DB_COMMIT_SECONDS,
+    PHOTO_SAVE_SECONDS,
+    LIMITER_DECISIONS,
+)
+
+
+def render_prometheus() -> str:
+    """This worker's metrics in the Prometheus text exposition format (version 0.0.4)."""
+    return "\n".join(line for metric in _ALL for line in metric.render()) + "\n"
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+    statements: Optional[List[Tuple[float, str]]] = None  # (seconds, SQL), kept for the slow log
+    statements_dropped: int = 0
+
+
+# Set per request by the middleware. anyio copies context into worker threads, so DB work
+# offloaded from a request is still charged to it (the group-commit writer thread is not).
+_current: ContextVar[Optional[RequestStats]] = ContextVar("hf_request_stats", default=None)
+
+_MAX_LOGGED_STATEMENTS = 50
+
+
+def install_sqlalchemy_hooks(engine: Engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):  # type: ignore[no-untyped-def]
+        conn.info.setdefault("hf_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):  # type: ignore[no-untyped-def]
+        elapsed = time.perf_counter() - conn.info["hf_query_start"].pop()
+        DB_QUERY_SECONDS.observe(elapsed)
+        stats = _current.get()
+        if stats is None:
+            return
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if stats.statements is not None:
+            if len(stats.statements) < _MAX_LOGGED_STATEMENTS:
+                stats.statements.append((elapsed, statement))
+            else:
+                stats.statements_dropped += 1
+
+    @event.listens_for(Session, "before_commit")
+    def _before_commit(session: Session) -> None:
+        session.info["hf_commit_start"] = time.perf_counter()
+
+    @event.listens_for(Session, "after_commit")
+    def _after_commit(session: Session) -> None:
+        start = session.info.pop("hf_commit_start", None)
+        if start is not None:
+            DB_COMMIT_SECONDS.observe(time.perf_counter() - start)
+
+
+def record_limiter_decision(check: str, allowed: bool) -> None:
+    LIMITER_DECISIONS.inc(check, "allow" if allowed else "block")
+
+
+def _route_label(scope: Dict[str, Any]) -> str:
+    # The route template (e.g. /api/tiles/{z}/{x}/{y}), so label cardinality stays fixed.
+    path = getattr(scope.get("route"), "path", None)
+    if path:
+        return path
+    return "unmatched" if scope.get("path", "").startswith("/api/") else "static"
+
+
+class TelemetryMiddleware:
+    """ASGI middleware timing each HTTP request to its last body byte (streams included).
+
+    With HF_SLOW_REQUEST_MS > 0, requests slower than that are logged with their SQL.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        self.slow_seconds = settings.slow_request_ms / 1000.0
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(statements=[] if self.slow_seconds > 0 else None)
+        token = _current.set(stats)
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._record(scope, status, time.perf_counter() - t0, stats)
+
+    def _record(self, scope: Dict[str, Any], status: int, elapsed: float, stats: RequestStats) -> None:
+        method, route = scope["method"], _route_label(scope)
+        REQUEST_SECONDS.observe(elapsed, method, route)
+        REQUESTS.inc(method, route, str(status))
+        REQUEST_QUERIES.observe(stats.queries, method, route)
+        REQUEST_DB_SECONDS.observe(stats.db_seconds, method, route)
+        if self.slow_seconds > 0 and elapsed >= self.slow_seconds:
+            lines = [f"  {secs * 1000:8.1f} ms  {sql}" for secs, sql in stats.statements or []]
+            if stats.statements_dropped:
+                lines.append(f"  ... {stats.statements_dropped} more statements")
+            logger.warning(
+                "slow request %s %s -> %d in %.1f ms (%d queries, %.1f ms in DB)\n%s",
+                method,
+                scope.get("path"),
+                status,
+                elapsed * 1000,
+                stats.queries,
+                stats.db_seconds * 1000,
+                "\n".join(lines),
+            )
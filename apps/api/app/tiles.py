@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from .config import settings
+from .geo import BBox
+
+MAX_TILE_ZOOM = 18
+
+Tile = Tuple[int, int, int]                 # (z, x, y)
+TileKey = Tuple[int, int, int, int, float, str]  # (z, x, y, hours, min_confidence, format)
+
+
+def tile_bbox(z: int, x: int, y: int) -> BBox:
+    """Bounds of a Web Mercator (slippy map) tile."""
+    n = 1 << z
+
+    def lat(yy: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * yy / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def tile_for_point(lat: float, lon: float, z: int) -> Tile:
+    n = 1 << z
+    lat = max(-85.05112878, min(85.05112878, lat))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return z, min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_TILE_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+
+class TileCache:
+    """Bounded LRU of rendered tile bodies with a TTL (windows are relative to now).
+
+    Entries are dropped per tile when a detection inside it changes, so one vote only
+    invalidates the MAX_TILE_ZOOM + 1 tiles that contain that point. Each drop also bumps the
+    tile's generation; a render reads it first and `put` skips storing if it moved, so a body
+    rendered before a commit is never cached after the commit's invalidation.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[TileKey, Tuple[float, bytes, str]]" = OrderedDict()
+        self._by_tile: Dict[Tile, Set[TileKey]] = {}
+        # Generations come from one increasing counter. Tiles without an entry (never
+        # invalidated, or pushed out of the bounded map) read the floor, which only rises,
+        # so a generation never returns to a value an in-flight render has seen.
+        self._counter = itertools.count(1)
+        self._generations: "OrderedDict[Tile, int]" = OrderedDict()
+        self._generation_floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: TileKey) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None:
+                return None
+            expires, body, etag = hit
+            if expires < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return body, etag
+
+    def generation(self, tile: Tile) -> int:
+        """Read before rendering `tile` and pass to `put`."""
+        with self._lock:
+            return self._generations.get(tile, self._generation_floor)
+
+    def put(self, key: TileKey, body: bytes, generation: int) -> Tuple[bytes, str]:
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        with self._lock:
+            if self._generations.get(key[:3], self._generation_floor) != generation:
+                return body, etag  # invalidated while rendering: serve once, do not cache
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, body, etag)
+            self._entries.move_to_end(key)
+            self._by_tile.setdefault(key[:3], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return body, etag
+
+    def invalidate_point(self, lat: float, lon: float) -> None:
+        with self._lock:
+            for z in range(MAX_TILE_ZOOM + 1):
+                tile = tile_for_point(lat, lon, z)
+                for key in self._by_tile.pop(tile, set()):
+                    self._entries.pop(key, None)
+                self._generations[tile] = next(self._counter)
+                self._generations.move_to_end(tile)
+            while len(self._generations) > 4 * self.max_entries:
+                _, dropped = self._generations.popitem(last=False)
+                self._generation_floor = max(self._generation_floor, dropped)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_tile.clear()
+            self._generations.clear()
+            self._generation_floor = next(self._counter)
+
+    def _drop(self, key: TileKey) -> None:
+        self._entries.pop(key, None)
+        keys = self._by_tile.get(key[:3])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_tile[key[:3]]
+
+
+tile_cache = TileCache(settings.tile_cache_size, settings.tile_cache_ttl_seconds)
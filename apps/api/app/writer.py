@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Generic, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class GroupCommitQueue(Generic[T, R]):
+    """One writer thread that applies items queued by concurrent requests as a single batch.
+
+    The writer takes the first waiting item, collects whatever else arrives within
+    `window_ms` (up to `max_batch`), and hands the lot to `apply_batch`, which must commit
+    once and return one result per item. Under load, votes share a transaction and a
+    commit instead of queueing on the database write lock one by one; when idle, the only
+    added latency is the window.
+
+    If a batch fails as a whole, its items are retried one at a time so a single bad item
+    only fails its own request.
+    """
+
+    def __init__(self, apply_batch: Callable[[List[T]], List[R]], window_ms: float, max_batch: int) -> None:
+        self.apply_batch = apply_batch
+        self.window_seconds = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[Tuple[T, Future[R]]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, item: T) -> "Future[R]":
+        fut: "Future[R]" = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="hf-group-commit", daemon=True)
+                self._thread.start()
+            self._queue.put((item, fut))
+        return fut
+
+    def stop(self) -> None:
+        """Commit what is queued, then stop the writer thread (it restarts on the next submit)."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._queue.put(None)
+        thread.join()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stopping = False
+            deadline = time.monotonic() + self.window_seconds
+            while len(batch) < self.max_batch:
+                try:
+                    nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stopping = True
+                    break
+                batch.append(nxt)
+            self._commit(batch)
+            if stopping:
+                return
+
+    def _commit(self, batch: List[Tuple[T, "Future[R]"]]) -> None:
+        try:
+            results = self.apply_batch([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            logger.warning("group commit of %d items failed; retrying one by one", len(batch), exc_info=True)
+            for entry in batch:
+                self._commit([entry])
+            return
+        for (_, fut), result in zip(batch, results):
+            fut.set_result(result)
@@ -20,10 +20,99 @@ function windArrow(deg) {
   return `<span style="display:inline-block; transform: rotate(${deg}deg);">➤</span> ${deg}°`;
 }
 
-async function fetchDetections({ hours, min_confidence }) {
-  const url = `/api/detections?hours=${encodeURIComponent(hours)}&min_confidence=${encodeURIComponent(min_confidence)}`;
+// Unpacks `format=binary` (geojson.pack_columns) into the `format=columnar` layout.
+function unpackColumns(buf) {
+  const view = new DataView(buf);
+  const magic = String.fromCharCode(...new Uint8Array(buf, 0, 4));
+  if (magic !== "HFD1") throw new Error("Unknown detections encoding");
+  const n = view.getUint32(4, true), m = view.getUint32(8, true), metaLen = view.getUint32(12, true);
+  const meta = JSON.parse(new TextDecoder().decode(new Uint8Array(buf, 16, metaLen)));
+
+  let offset = 16 + metaLen;
+  const take = (Type, count) => {
+    const arr = new Type(buf, offset, count);
+    offset += count * Type.BYTES_PER_ELEMENT;
+    return arr;
+  };
+  const cols = { ...meta, clusters: { cell: meta.cell } };
+  cols.lat = take(Int32Array, n); cols.lon = take(Int32Array, n);
+  cols.t = take(Uint32Array, n); cols.counts = take(Uint32Array, 3 * n);
+  cols.clusters.lat = take(Int32Array, m); cols.clusters.lon = take(Int32Array, m);
+  cols.clusters.point_count = take(Uint32Array, m); cols.clusters.counts = take(Uint32Array, 3 * m);
+  cols.confidence = take(Uint16Array, n); cols.wind_dir_deg = take(Uint16Array, n);
+  cols.source = take(Uint16Array, n); cols.clusters.max_confidence = take(Uint16Array, m);
+  cols.fwi_bucket = take(Uint8Array, n); cols.status = take(Uint8Array, n);
+  cols.clusters.max_fwi_bucket = take(Uint8Array, m);
+  return cols;
+}
+
+// `format=columnar`/`binary` payloads back to the GeoJSON features the map code draws.
+function decodeDetections(payload) {
+  const cols = payload instanceof ArrayBuffer ? unpackColumns(payload) : payload;
+  const cs = cols.coord_scale, qs = cols.confidence_scale;
+  const community = (counts, i) => ({ confirms: counts[3 * i], denies: counts[3 * i + 1], unsure: counts[3 * i + 2] });
+
+  const features = cols.id.map((id, i) => ({
+    type: "Feature",
+    id,
+    geometry: { type: "Point", coordinates: [cols.lon[i] / cs, cols.lat[i] / cs] },
+    properties: {
+      id,
+      created_at: new Date(cols.t[i] * 1000).toISOString(),
+      confidence: cols.confidence[i] / qs,
+      source: cols.sources[cols.source[i]],
+      fwi_bucket: cols.fwi_bucket[i],
+      wind_dir_deg: cols.wind_dir_deg[i],
+      status: cols.statuses[cols.status[i]],
+      community: community(cols.counts, i)
+    }
+  }));
+  const cl = cols.clusters;
+  cl.cell.forEach((cell, i) => features.push({
+    type: "Feature",
+    id: `cluster:${cell}`,
+    geometry: { type: "Point", coordinates: [cl.lon[i] / cs, cl.lat[i] / cs] },
+    properties: {
+      cluster: true,
+      cell,
+      point_count: cl.point_count[i],
+      max_confidence: cl.max_confidence[i] / qs,
+      max_fwi_bucket: cl.max_fwi_bucket[i],
+      community: community(cl.counts, i)
+    }
+  }));
+  return { type: "FeatureCollection", features };
+}
+
+async function fetchTile({ z, x, y }, { hours, min_confidence, generation }) {
+  // `v` only changes on an explicit refresh, so the browser/CDN cache serves repeat pans.
+  const url = `/api/tiles/${z}/${x}/${y}?hours=${encodeURIComponent(hours)}` +
+    `&min_confidence=${encodeURIComponent(min_confidence)}&format=binary&v=${generation}`;
+  const res = await fetch(url);
+  if (!res.ok) throw new Error(`Failed to load tile ${z}/${x}/${y} (${res.status})`);
+  return decodeDetections(await res.arrayBuffer());
+}
+
+// Without `since`, only returns the current cursor (start syncing from now).
+async function fetchChanges(since, { hours, min_confidence } = {}) {
+  let url = "/api/detections/changes";
+  if (since !== null && since !== undefined) {
+    url += `?since=${encodeURIComponent(since)}&hours=${encodeURIComponent(hours)}` +
+      `&min_confidence=${encodeURIComponent(min_confidence)}`;
+  }
+  const res = await fetch(url);
+  if (!res.ok) throw new Error(`Failed to load changes (${res.status})`);
+  return await res.json();
+}
+
+const NEARBY_RADIUS_KM = 15;
+
+async function fetchNearby({ lat, lon }, { hours, min_confidence }) {
+  const url = `/api/detections/nearby?lat=${encodeURIComponent(lat)}&lon=${encodeURIComponent(lon)}` +
+    `&radius_km=${NEARBY_RADIUS_KM}&limit=1&hours=${encodeURIComponent(hours)}` +
+    `&min_confidence=${encodeURIComponent(min_confidence)}`;
   const res = await fetch(url);
-  if (!res.ok) throw new Error(`Failed to load detections (${res.status})`);
+  if (!res.ok) throw new Error(`Failed to load nearby detections (${res.status})`);
   return await res.json();
 }
 
@@ -51,19 +140,106 @@ async function submitVerification(detectionId, verdict, photoFile) {
   return payload;
 }
 
-function distanceKm(a, b) {
-  const R = 6371;
-  const toRad = (x) => x * Math.PI / 180;
-  const dLat = toRad(b.lat - a.lat);
-  const dLon = toRad(b.lon - a.lon);
-  const lat1 = toRad(a.lat);
-  const lat2 = toRad(b.lat);
-  const s = Math.sin(dLat/2)**2 + Math.cos(lat1)*Math.cos(lat2)*Math.sin(dLon/2)**2;
-  return 2 * R * Math.asin(Math.sqrt(s));
+/* Offline-first vote queue: verdicts are stored locally and flushed in batches. */
+const VOTE_QUEUE_KEY = "hf_vote_queue";
+const VOTE_RETRY_MIN_MS = 5000;
+const VOTE_RETRY_MAX_MS = 5 * 60 * 1000;
+// Halved whenever the server answers 413 (its HF_BATCH_MAX_ITEMS is lower).
+let voteBatchMax = 50;
+let voteRetryMs = VOTE_RETRY_MIN_MS;
+let voteRetryTimer = null;
+let voteFlushInFlight = null;
+
+function loadVoteQueue() {
+  try {
+    return JSON.parse(localStorage.getItem(VOTE_QUEUE_KEY) || "[]");
+  } catch (e) {
+    return [];
+  }
+}
+
+function saveVoteQueue(queue) {
+  localStorage.setItem(VOTE_QUEUE_KEY, JSON.stringify(queue));
+}
+
+function enqueueVote(detectionId, verdict) {
+  const queue = loadVoteQueue();
+  queue.push({ detection_id: detectionId, verdict, client_timestamp: new Date().toISOString() });
+  saveVoteQueue(queue);
+}
+
+// Rate-limited votes are retried with exponential backoff (window.__hf_flush_votes is set by main).
+function scheduleVoteRetry() {
+  if (voteRetryTimer) return;
+  voteRetryTimer = setTimeout(() => {
+    voteRetryTimer = null;
+    window.__hf_flush_votes && window.__hf_flush_votes();
+  }, voteRetryMs);
+  voteRetryMs = Math.min(voteRetryMs * 2, VOTE_RETRY_MAX_MS);
+}
+
+// Sends queued votes through /api/verifications:batch. Resolves to the per-item results
+// (empty when there was nothing to send); rejects if the network is still unavailable.
+function flushVoteQueue() {
+  if (voteFlushInFlight) return voteFlushInFlight;
+
+  voteFlushInFlight = (async () => {
+    const results = [];
+    let queue = loadVoteQueue();
+    while (queue.length) {
+      const batch = queue.slice(0, voteBatchMax);
+      const res = await fetch("/api/verifications:batch", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ items: batch })
+      });
+      if (res.status === 413 && batch.length > 1) {
+        voteBatchMax = Math.ceil(batch.length / 2);
+        continue;
+      }
+      if (!res.ok) throw new Error(`Batch verify failed (${res.status})`);
+      const payload = await res.json();
+      const batchResults = payload.results || [];
+      results.push(...batchResults);
+
+      // Rate-limited votes go back to the head of the queue, in cast order; every other item
+      // got a definitive answer. Votes queued while this batch was in flight are kept.
+      const limited = batch.filter((_, i) => batchResults[i] && batchResults[i].status_code === 429);
+      queue = limited.concat(loadVoteQueue().slice(batch.length));
+      saveVoteQueue(queue);
+      if (limited.length) {
+        scheduleVoteRetry();
+        break;
+      }
+      voteRetryMs = VOTE_RETRY_MIN_MS;
+    }
+    return results;
+  })();
+
+  return voteFlushInFlight.finally(() => { voteFlushInFlight = null; });
+}
+
+// Sidebar line for queued votes the server refused (e.g. already voted) and votes still waiting.
+function reportVoteResults(results) {
+  const el = document.getElementById("voteStatus");
+  if (!el) return;
+  const rejected = results.filter(r => r.status_code !== 200 && r.status_code !== 429);
+  const pending = loadVoteQueue().length;
+  const parts = [];
+  if (rejected.length) {
+    parts.push(`${rejected.length} queued vote(s) not counted: ${rejected[0].detail || `error ${rejected[0].status_code}`}.`);
+  }
+  if (pending) parts.push(`${pending} vote(s) waiting to be sent.`);
+  el.textContent = parts.join(" ");
+}
+
+// API timestamps are UTC; SQLite-backed ones come without an offset.
+function parseUtc(iso) {
+  return new Date(/(?:[zZ]|[+-]\d\d:?\d\d)$/.test(iso) ? iso : iso + "Z");
 }
 
 function fmtTime(iso) {
-  const d = new Date(iso);
+  const d = parseUtc(iso);
   return d.toLocaleString();
 }
 
@@ -109,16 +285,54 @@ function setupMap() {
     attribution: "&copy; OpenStreetMap contributors"
   }).addTo(map);
 
-  const detectionsLayer = L.layerGroup().addTo(map);
-  const riskLayer = L.layerGroup().addTo(map);
+  return { map };
+}
+
+// Detections are loaded per map tile from /api/tiles; each tile owns its marker and halo layers.
+function setupDetectionTiles(map, getFilters) {
+  const tiles = new Map();  // "z/x/y" -> { detections, risk }
+
+  const DetectionTiles = L.GridLayer.extend({
+    createTile(coords, done) {
+      const key = `${coords.z}/${coords.x}/${coords.y}`;
+      const tile = document.createElement("div");
+      const entry = { detections: L.layerGroup(), risk: L.layerGroup() };
+      tiles.set(key, entry);
+
+      fetchTile(coords, getFilters())
+        .then(fc => {
+          if (tiles.get(key) !== entry) return;  // unloaded while in flight
+          const features = fc.features || [];
+          drawRiskOverlay(entry.risk, features);
+          drawDetections(map, entry.detections, features);
+          entry.risk.addTo(map);
+          entry.detections.addTo(map);
+          done(null, tile);
+        })
+        .catch(e => done(e, tile));
+
+      return tile;
+    }
+  });
 
-  return { map, detectionsLayer, riskLayer };
+  const layer = new DetectionTiles({ pane: "overlayPane" });
+  layer.on("tileunload", (e) => {
+    const key = `${e.coords.z}/${e.coords.x}/${e.coords.y}`;
+    const entry = tiles.get(key);
+    if (!entry) return;
+    map.removeLayer(entry.detections);
+    map.removeLayer(entry.risk);
+    tiles.delete(key);
+  });
+  layer.addTo(map);
+  return layer;
 }
 
 function drawRiskOverlay(riskLayer, features) {
   riskLayer.clearLayers();
   features.forEach(f => {
     const p = f.properties;
+    if (p.cluster) return;
     const latlng = [f.geometry.coordinates[1], f.geometry.coordinates[0]];
     const bucket = p.fwi_bucket ?? 2;
 
@@ -130,54 +344,150 @@ function drawRiskOverlay(riskLayer, features) {
   });
 }
 
-function drawDetections(detectionsLayer, features) {
-  detectionsLayer.clearLayers();
-
-  features.forEach(f => {
-    const p = f.properties;
-    const latlng = [f.geometry.coordinates[1], f.geometry.coordinates[0]];
+function drawCluster(map, detectionsLayer, f) {
+  const p = f.properties;
+  const latlng = [f.geometry.coordinates[1], f.geometry.coordinates[0]];
+  const radius = Math.min(28, 10 + 4 * Math.log2(p.point_count));
+
+  const marker = L.circleMarker(latlng, { radius, weight: 2, className: fwiClass(p.max_fwi_bucket) });
+  marker.bindTooltip(
+    `${p.point_count} detections · max confidence ${(p.max_confidence ?? 0).toFixed(2)} · max FWI ${p.max_fwi_bucket}`
+  );
+  marker.on("click", () => map.setView(latlng, Math.min(map.getZoom() + 2, 19)));
+  marker.addTo(detectionsLayer);
+}
 
-    const marker = L.circleMarker(latlng, { radius: 9, weight: 2 });
-    marker.bindPopup(createPopupContent(p), { maxWidth: 320 });
+function wirePopup(marker) {
+  const popupEl = marker.getPopup().getElement();
+  if (!popupEl) return;
 
-    marker.on("popupopen", () => {
-      const popupEl = marker.getPopup().getElement();
-      if (!popupEl) return;
+  popupEl.querySelectorAll("button[data-verify]").forEach(btn => {
+    btn.addEventListener("click", async () => {
+      const verdict = btn.getAttribute("data-verify");
+      const id = btn.getAttribute("data-id");
+      const msg = popupEl.querySelector(`#msg_${CSS.escape(id)}`);
 
-      popupEl.querySelectorAll("button[data-verify]").forEach(btn => {
-        btn.addEventListener("click", async () => {
-          const verdict = btn.getAttribute("data-verify");
-          const id = btn.getAttribute("data-id");
-          const msg = popupEl.querySelector(`#msg_${CSS.escape(id)}`);
+      const input = popupEl.querySelector(`#photo_${CSS.escape(id)}`);
+      const photoFile = (input && input.files && input.files[0]) ? input.files[0] : null;
 
-          const input = popupEl.querySelector(`#photo_${CSS.escape(id)}`);
-          const photoFile = (input && input.files && input.files[0]) ? input.files[0] : null;
+      try {
+        btn.disabled = true;
+        if (msg) msg.textContent = "Submitting…";
 
+        if (photoFile) {
+          let out;
           try {
-            btn.disabled = true;
-            if (msg) msg.textContent = "Submitting…";
-            const out = await submitVerification(id, verdict, photoFile);
-            if (msg) msg.textContent = `Saved. Status: ${out.status}.`;
-
-            // Refresh map to reflect acceptance/dismissal.
-            window.__hf_refresh && window.__hf_refresh();
+            out = await submitVerification(id, verdict, photoFile);
           } catch (e) {
-            if (msg) msg.textContent = (e && e.message) ? e.message : "Error";
-          } finally {
-            btn.disabled = false;
+            if (!(e instanceof TypeError)) throw e;
+            // Network failure: keep the verdict for later, the photo cannot be queued.
+            enqueueVote(id, verdict);
+            if (msg) msg.textContent = "Offline: vote queued (photo not sent).";
+            return;
           }
-        });
-      });
+          if (msg) msg.textContent = `Saved. Status: ${out.status}.`;
+        } else {
+          enqueueVote(id, verdict);
+          let results;
+          try {
+            results = await flushVoteQueue();
+          } catch (e) {
+            if (msg) msg.textContent = "Offline: vote queued, will send when back online.";
+            return;
+          }
+          reportVoteResults(results);
+          const out = results.filter(r => r.detection_id === id).pop();
+          if (out && out.status_code === 429) {
+            if (msg) msg.textContent = "Too many votes right now: queued, will retry shortly.";
+            return;
+          }
+          if (out && out.status_code !== 200) throw new Error(out.detail || `Verify failed (${out.status_code})`);
+          if (msg) msg.textContent = out ? `Saved. Status: ${out.status}.` : "Saved.";
+        }
+
+        // Refresh map to reflect acceptance/dismissal.
+        window.__hf_refresh && window.__hf_refresh();
+      } catch (e) {
+        if (msg) msg.textContent = (e && e.message) ? e.message : "Error";
+      } finally {
+        btn.disabled = false;
+      }
     });
+  });
+}
+
+// Point markers currently on the map, by detection id, so deltas and live events patch them in place.
+const markersById = new Map();
+const CLUSTER_MAX_ZOOM = 12;  // server clusters at this zoom and below (geo.py)
+
+function drawPoint(detectionsLayer, f) {
+  const p = f.properties;
+  const latlng = [f.geometry.coordinates[1], f.geometry.coordinates[0]];
+
+  const previous = markersById.get(p.id);
+  if (previous) previous.group.removeLayer(previous);
+
+  const marker = L.circleMarker(latlng, { radius: 9, weight: 2 });
+  marker.bindPopup(createPopupContent(p), { maxWidth: 320 });
+  marker.feature = f;
+  marker.group = detectionsLayer;
+  marker.on("popupopen", () => wirePopup(marker));
+  marker.on("remove", () => { if (markersById.get(p.id) === marker) markersById.delete(p.id); });
+  markersById.set(p.id, marker);
+
+  marker.addTo(detectionsLayer);
+}
+
+function matchesFilters(p, { hours, min_confidence }) {
+  if (p.status === "dismissed") return false;
+  if ((p.confidence ?? 0) < min_confidence) return false;
+  return Date.now() - parseUtc(p.created_at).getTime() <= hours * 3600 * 1000;
+}
+
+// Apply one changed feature from /api/detections/changes or the live stream.
+function upsertFeature(map, liveLayer, f, filters) {
+  const p = f.properties;
+  const marker = markersById.get(p.id);
+  const visible = matchesFilters(p, filters);
+
+  if (marker) {
+    if (!visible) {
+      marker.group.removeLayer(marker);
+      return;
+    }
+    Object.assign(marker.feature.properties, p);
+    marker.setPopupContent(createPopupContent(marker.feature.properties));
+    if (marker.isPopupOpen()) wirePopup(marker);
+    return;
+  }
+  // New point: only drawn when the map shows individual points (clusters catch up on reload).
+  if (visible && map.getZoom() > CLUSTER_MAX_ZOOM) drawPoint(liveLayer, f);
+}
+
+function connectLiveUpdates(onChange, onResync) {
+  if (!window.EventSource) return null;
+  const es = new EventSource("/api/stream");
+  es.addEventListener("detection.changed", (e) => onChange(JSON.parse(e.data)));
+  es.addEventListener("resync", () => onResync());
+  return es;
+}
+
+function drawDetections(map, detectionsLayer, features) {
+  detectionsLayer.clearLayers();
 
-    marker.addTo(detectionsLayer);
+  features.forEach(f => {
+    if (f.properties.cluster) {
+      drawCluster(map, detectionsLayer, f);
+      return;
+    }
+    drawPoint(detectionsLayer, f);
   });
 }
 
 async function main() {
   ensureDeviceFingerprint();
 
-  const { detectionsLayer, riskLayer } = setupMap();
+  const { map } = setupMap();
 
   const confInput = document.getElementById("confidence");
   const confValue = document.getElementById("confValue");
@@ -190,32 +500,65 @@ async function main() {
   confValue.textContent = Number(confInput.value).toFixed(2);
   confInput.addEventListener("input", () => confValue.textContent = Number(confInput.value).toFixed(2));
 
-  async function refreshAll() {
-    const hours = Number(hoursSel.value);
-    const min_confidence = Number(confInput.value);
-
-    const fc = await fetchDetections({ hours, min_confidence });
-    const feats = fc.features || [];
-
-    drawRiskOverlay(riskLayer, feats);
-    drawDetections(detectionsLayer, feats);
-
-    if (window.__hf_user_loc) {
-      const user = window.__hf_user_loc;
-      const nearby = feats
-        .map(f => ({
-          d: distanceKm(user, { lat: f.geometry.coordinates[1], lon: f.geometry.coordinates[0] })
-        }))
-        .filter(x => x.d <= 15)
-        .sort((a,b) => a.d - b.d);
-
-      if (nearby.length) {
-        nearbyStatus.textContent = `Nearby detections: ${nearby.length} (closest ${nearby[0].d.toFixed(1)} km). Click the point to verify.`;
+  let generation = 0;
+  const getFilters = () => ({
+    hours: Number(hoursSel.value),
+    min_confidence: Number(confInput.value),
+    generation
+  });
+
+  // The server searches its spatial index; only the count and the closest point come back.
+  async function updateNearby() {
+    if (!window.__hf_user_loc) return;
+    try {
+      const nearby = await fetchNearby(window.__hf_user_loc, getFilters());
+      if (nearby.total) {
+        const closest = nearby.features[0].properties.distance_km;
+        nearbyStatus.textContent = `Nearby detections: ${nearby.total} (closest ${closest.toFixed(1)} km). Click the point to verify.`;
       } else {
-        nearbyStatus.textContent = "No detections within 15 km.";
+        nearbyStatus.textContent = `No detections within ${NEARBY_RADIUS_KM} km.`;
+      }
+    } catch (e) {
+      console.error(e);
+    }
+  }
+
+  // Delta sync: the cursor is taken before tiles load, so no change can fall in between.
+  const liveLayer = L.layerGroup().addTo(map);
+  let syncCursor = (await fetchChanges(null).catch(() => ({ cursor: null }))).cursor;
+  let syncedFilters = `${hoursSel.value}|${confInput.value}`;
+
+  function applyChange(f, cursor) {
+    upsertFeature(map, liveLayer, f, getFilters());
+    if (cursor !== undefined && cursor !== null) syncCursor = Math.max(syncCursor ?? 0, cursor);
+  }
+
+  const detectionTiles = setupDetectionTiles(map, getFilters);
+
+  async function reloadDetections() {
+    syncCursor = (await fetchChanges(null)).cursor;
+    syncedFilters = `${hoursSel.value}|${confInput.value}`;
+    generation += 1;
+    liveLayer.clearLayers();
+    detectionTiles.redraw();
+  }
+
+  async function refreshDetections() {
+    // Same filters: fetch only what changed since the cursor and patch markers by id.
+    if (syncCursor !== null && syncedFilters === `${hoursSel.value}|${confInput.value}`) {
+      try {
+        const delta = await fetchChanges(syncCursor, getFilters());
+        (delta.features || []).forEach(f => applyChange(f));
+        syncCursor = delta.cursor;
+        return;
+      } catch (e) {
+        console.error(e);
       }
     }
+    await reloadDetections();
+  }
 
+  async function refreshMetrics() {
     const m = await fetchMetrics();
     if (m) {
       metricsEl.innerHTML = `
@@ -229,10 +572,35 @@ async function main() {
     }
   }
 
+  async function refreshAll() {
+    await refreshDetections();
+    await Promise.all([refreshMetrics(), updateNearby()]);
+  }
+
   window.__hf_refresh = refreshAll;
+  window.__hf_refresh_metrics = refreshMetrics;
+  window.__hf_live = connectLiveUpdates((ev) => applyChange(ev.feature, ev.cursor), reloadDetections);
+
+  async function flushThenRefresh() {
+    let results;
+    try {
+      results = await flushVoteQueue();
+    } catch (e) {
+      return;
+    }
+    reportVoteResults(results);
+    if (results.length) await refreshAll();
+  }
+
+  window.__hf_flush_votes = flushThenRefresh;
 
   refreshBtn.addEventListener("click", refreshAll);
-  await refreshAll();
+  window.addEventListener("online", flushThenRefresh);
+  // Tiles load as soon as the layer is on the map; only pending votes need a redraw.
+  const flushed = await flushVoteQueue().catch(() => []);
+  reportVoteResults(flushed);
+  if (flushed.length) await refreshDetections();
+  await refreshMetrics();
 
   locateBtn.addEventListener("click", () => {
     if (!navigator.geolocation) {
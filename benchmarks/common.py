@@ -0,0 +1,58 @@
+"""Helpers shared by the benchmark scripts."""
+
+from __future__ import annotations
+
+import os
+import statistics
+from typing import Dict, List
+
+
+def configure_env(tmp: str, **overrides: str) -> None:
+    # Settings are read at import time, so this has to run before the app is imported.
+    os.environ["HF_DB_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ["HF_PHOTOS_DIR"] = os.path.join(tmp, "photos")
+    os.environ["HF_RATE_LIMIT_PER_MINUTE"] = "100000000"
+    os.environ["HF_VERIFY_COOLDOWN_SECONDS"] = "0"
+    os.environ["HF_RESPONSE_CACHE_TTL_SECONDS"] = "1"
+    os.environ.update(overrides)
+
+
+def seed_detections(n: int) -> List[str]:
+    from datetime import datetime, timezone
+
+    from apps.api.app.db import get_session, init_db
+    from apps.api.app.geo import geohash_encode
+    from apps.api.app.models import Detection
+
+    init_db()
+    now = datetime.now(timezone.utc)
+    ids = []
+    with get_session() as s:
+        for i in range(n):
+            lat, lon = 35.0 + (i % 500) * 0.01, 20.0 + (i // 500) * 0.01
+            det = Detection(
+                id=f"bench-{i}",
+                created_at=now,
+                lat=lat,
+                lon=lon,
+                confidence=0.8,
+                source="bench",
+                geohash=geohash_encode(lat, lon),
+            )
+            s.add(det)
+            ids.append(det.id)
+        s.commit()
+    return ids
+
+
+def summary(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"n": 0}
+    q = statistics.quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else samples * 99
+    return {
+        "n": len(samples),
+        "p50_ms": q[49] * 1000,
+        "p95_ms": q[94] * 1000,
+        "p99_ms": q[98] * 1000,
+        "max_ms": max(samples) * 1000,
+    }
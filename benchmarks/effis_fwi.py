@@ -0,0 +1,123 @@
+"""FWI sampling speed and accuracy on a synthetic grid.
+
+Writes a `--rows` x `--cols` grid over Greece whose FWI is a linear function of position
+(bilinear sampling reproduces it exactly), seeds `--detections` detections on the grid's day
+and runs data-pipeline/ingest_effis.py on them, twice: the second run finds nothing to change.
+Reports points/s and checks the stored buckets against the analytic field.
+
+    python -m benchmarks.effis_fwi --detections 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from types import ModuleType
+from typing import Any, Dict
+
+import numpy as np
+
+from .common import configure_env
+
+WEST, SOUTH, EAST, NORTH = 19.0, 34.0, 30.0, 42.0
+DAY = date(2026, 8, 1)
+
+
+def field(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    return (lons - WEST) * 5.0 + (lats - SOUTH) * 2.0  # 0 .. 71
+
+
+def write_grid(tmp: str, rows: int, cols: int) -> str:
+    lats = NORTH - (np.arange(rows) + 0.5) * (NORTH - SOUTH) / rows
+    lons = WEST + (np.arange(cols) + 0.5) * (EAST - WEST) / cols
+    grid = field(lats[:, None], lons[None, :]).astype(np.float32)
+    path = os.path.join(tmp, f"fwi_{DAY.isoformat()}.npy")
+    np.save(path, grid)
+    with open(os.path.splitext(path)[0] + ".json", "w", encoding="utf-8") as f:
+        json.dump({"date": DAY.isoformat(), "west": WEST, "south": SOUTH, "east": EAST, "north": NORTH}, f)
+    return path
+
+
+def seed(n: int) -> None:
+    from apps.api.app.db import get_session, init_db
+    from apps.api.app.geo import geohash_encode
+    from apps.api.app.models import DetectionStatus
+    from apps.api.app.repositories import DetectionRepository
+
+    init_db()
+    rng = np.random.default_rng(1)
+    # Keep clear of the outer half cell, where sampling clamps to the edge cells.
+    lats = rng.uniform(SOUTH + 0.1, NORTH - 0.1, n)
+    lons = rng.uniform(WEST + 0.1, EAST - 0.1, n)
+    start = datetime(DAY.year, DAY.month, DAY.day, tzinfo=timezone.utc)
+    with get_session() as s:
+        rows = [
+            {
+                "id": f"bench-fwi-{i}", "lat": float(lat), "lon": float(lon),
+                "created_at": start + timedelta(seconds=i % 86400), "confidence": 0.8, "source": "bench",
+                "fwi_bucket": 2, "wind_dir_deg": 0, "status": DetectionStatus.unconfirmed,
+                "geohash": geohash_encode(float(lat), float(lon)), "change_seq": 0, "updated_at": None,
+                "confirms": 0, "denies": 0, "unsure": 0, "early_votes": 0,
+            }
+            for i, (lat, lon) in enumerate(zip(lats, lons))
+        ]
+        DetectionRepository(s).insert_new(rows)
+        s.commit()
+
+
+def check(ingest: ModuleType) -> Dict[str, Any]:
+    from apps.api.app.db import get_session
+    from apps.api.app.repositories import DetectionRepository
+
+    start = datetime(DAY.year, DAY.month, DAY.day, tzinfo=timezone.utc)
+    with get_session() as s:
+        rows = DetectionRepository(s).positions_between(start, start + timedelta(days=1))
+    _, lats, lons, stored, _ = zip(*rows)
+    expected = ingest.fwi_buckets(field(np.asarray(lats), np.asarray(lons)))
+    wrong = np.asarray(stored) != expected
+    # Bilinear reproduces the linear field; nearest is off by up to half a cell near class edges.
+    return {"checked": len(rows), "bucket_mismatches": int(wrong.sum())}
+
+
+def _load_ingest() -> ModuleType:
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data-pipeline", "ingest_effis.py")
+    spec = importlib.util.spec_from_file_location("ingest_effis", path)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--detections", type=int, default=200_000)
+    ap.add_argument("--rows", type=int, default=800)
+    ap.add_argument("--cols", type=int, default=1100)
+    ap.add_argument("--method", choices=("bilinear", "nearest"), default="bilinear")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(tmp)
+        grid_path = write_grid(tmp, args.rows, args.cols)
+        seed(args.detections)
+        ingest = _load_ingest()
+
+        report: Dict[str, Any] = {}
+        for run in ("first", "rerun"):
+            t0 = time.perf_counter()
+            stats = ingest.apply_grid(ingest.FwiGrid.load(grid_path), args.method)
+            elapsed = time.perf_counter() - t0
+            report[run] = {**vars(stats), "seconds": round(elapsed, 3), "points_per_s": round(stats.detections / elapsed)}
+        report["check"] = check(ingest)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Fire-event clustering: speed, accuracy and how much it shrinks the map payload.
+
+Synthesizes `--fires` fires over Greece, each seen as `--pixels` hotspots (within ~1 km of
+its centre) on each of `--overpasses` passes six hours apart, plus `--noise` isolated
+hotspots. Clusters them in `--batch-size` batches the way ingest_firms.py does, then compares
+GET /api/detections with and without `group=events`.
+
+    python -m benchmarks.fire_events --fires 300 --pixels 20 --overpasses 6
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from .common import configure_env
+
+
+def synth(fires: int, pixels: int, overpasses: int, noise: int, seed: int = 7) -> List[Dict[str, Any]]:
+    from apps.api.app.geo import geohash_encode
+    from apps.api.app.models import DetectionStatus
+
+    rnd = random.Random(seed)
+    start = datetime.now(timezone.utc) - timedelta(hours=6 * overpasses)
+    points = []
+    # Fire centres on a coarse grid, >= 20 km apart, so the true answer is `fires` events.
+    centres = rnd.sample([(35.0 + i * 0.2, 20.0 + j * 0.25) for i in range(35) for j in range(36)], fires)
+    for f, (clat, clon) in enumerate(centres):
+        for p in range(overpasses):
+            for k in range(pixels):
+                r, a = rnd.uniform(0, 0.009), rnd.uniform(0, 2 * math.pi)
+                points.append((f"bench-f{f}-{p}-{k}", clat + r * math.sin(a), clon + r * math.cos(a), start + timedelta(hours=6 * p)))
+    for n in range(noise):
+        lat, lon = rnd.uniform(34.9, 41.9), rnd.uniform(19.9, 29.0)
+        points.append((f"bench-n{n}", lat, lon, start + timedelta(hours=rnd.uniform(0, 6 * overpasses))))
+    points.sort(key=lambda p: p[3])
+    return [
+        {
+            "id": i, "lat": lat, "lon": lon, "created_at": at, "confidence": 0.8, "source": "bench",
+            "fwi_bucket": 2, "wind_dir_deg": 0, "status": DetectionStatus.unconfirmed,
+            "geohash": geohash_encode(lat, lon), "change_seq": 0, "updated_at": None,
+            "confirms": 0, "denies": 0, "unsure": 0, "early_votes": 0,
+        }
+        for i, lat, lon, at in points
+    ]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--fires", type=int, default=300)
+    ap.add_argument("--pixels", type=int, default=20)
+    ap.add_argument("--overpasses", type=int, default=6)
+    ap.add_argument("--noise", type=int, default=500)
+    ap.add_argument("--batch-size", type=int, default=2000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(tmp)
+        from apps.api.app.clustering import EventClusterer
+        from apps.api.app.db import get_session, init_db
+        from apps.api.app.repositories import DataVersionRepository, DetectionRepository
+        from apps.api.app.services import MapService
+
+        init_db()
+        rows = synth(args.fires, args.pixels, args.overpasses, args.noise)
+        clusterer = EventClusterer()
+        cluster_seconds = 0.0
+        for i in range(0, len(rows), args.batch_size):
+            with get_session() as s:
+                seq = DataVersionRepository(s).bump()
+                DetectionRepository(s).insert_new(rows[i : i + args.batch_size])
+                t0 = time.perf_counter()
+                clusterer.assign(s, seq)
+                cluster_seconds += time.perf_counter() - t0
+                s.commit()
+
+        hours = 6 * args.overpasses + 1
+        with get_session() as s:
+            raw = b"".join(MapService(s).feature_collection(hours=hours, min_confidence=0.0))
+            events = b"".join(MapService(s).event_collection(hours=hours, min_confidence=0.0))
+        n_raw, n_events = len(json.loads(raw)["features"]), len(json.loads(events)["features"])
+        report = {
+            "detections": len(rows),
+            "expected_events": args.fires + args.noise,
+            "events": n_events,
+            "cluster_points_per_s": round(len(rows) / cluster_seconds),
+            "features": {"detections": n_raw, "events": n_events},
+            "payload_bytes": {"detections": len(raw), "events": len(events)},
+            "payload_ratio": round(len(raw) / max(1, len(events)), 1),
+        }
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""FIRMS ingestion throughput on a synthetic VIIRS CSV.
+
+Writes `--rows` rows (about 1 in 50 repeated, as overlapping FIRMS downloads are) and runs
+data-pipeline/ingest_firms.py on them into a fresh SQLite DB, then once more to time the
+all-duplicates rerun. Reports rows/s and this process's peak RSS. With
+`--sqlite-production` the DB is memory-mapped (HF_SQLITE_MMAP_BYTES) and the mapped pages
+count towards RSS, so compare peak RSS without it.
+
+    python -m benchmarks.ingest_firms --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from types import ModuleType
+from typing import Any, Dict
+
+from .common import configure_env
+
+HEADER = "latitude,longitude,bright_ti4,scan,track,acq_date,acq_time,satellite,instrument,confidence,version,bright_ti5,frp,daynight\n"
+
+
+def write_csv(path: str, rows: int, seed: int = 1) -> None:
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER)
+        prev = ""
+        for i in range(rows):
+            if prev and i % 50 == 0:
+                f.write(prev)
+                continue
+            day, minute = 1 + (i // 40000) % 28, (i // 100) % 1440
+            prev = (
+                f"{rnd.uniform(34.8, 41.7):.5f},{rnd.uniform(19.4, 29.6):.5f},330.2,0.41,0.37,"
+                f"2026-08-{day:02d},{minute // 60:02d}{minute % 60:02d},N,VIIRS,{rnd.choice('lnh')},"
+                f"2.0NRT,291.4,{rnd.uniform(0.5, 40):.2f},{'D' if 360 <= minute < 1080 else 'N'}\n"
+            )
+            f.write(prev)
+
+
+def _load_ingest() -> ModuleType:
+    # data-pipeline/ is a directory of scripts, not a package.
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data-pipeline", "ingest_firms.py")
+    spec = importlib.util.spec_from_file_location("ingest_firms", path)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes vs KiB
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--batch-size", type=int, default=5000)
+    ap.add_argument("--sqlite-production", action="store_true")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(tmp, HF_SQLITE_PRODUCTION="1" if args.sqlite_production else "0")
+        csv_path = os.path.join(tmp, "firms.csv")
+        t0 = time.perf_counter()
+        write_csv(csv_path, args.rows)
+        print(f"generated {args.rows} rows ({os.path.getsize(csv_path) / 1e6:.0f} MB) in {time.perf_counter() - t0:.1f}s")
+
+        ingest = _load_ingest()
+        rss_before = _peak_rss_mb()
+        report: Dict[str, Any] = {}
+        for run in ("first", "rerun"):
+            t0 = time.perf_counter()
+            stats = ingest.ingest([csv_path], checkpoint_path=None, batch_size=args.batch_size)
+            elapsed = time.perf_counter() - t0
+            report[run] = {**asdict(stats), "seconds": round(elapsed, 2), "rows_per_s": round(stats.rows / elapsed)}
+        report["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+        report["peak_rss_mb_before_ingest"] = round(rss_before, 1)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
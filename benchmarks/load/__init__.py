@@ -0,0 +1,2 @@
+"""Load and benchmark suite: synthetic nationwide datasets (`dataset`), a mixed-workload
+runner in-process and over uvicorn (`python -m benchmarks.load`) and a report diff (`compare`)."""
@@ -0,0 +1,79 @@
+"""Compare two `python -m benchmarks.load` reports (e.g. main vs a branch).
+
+Prints latency percentiles and throughput per mode and operation, and queries per request
+per route, with the relative change. With `--fail-over PCT`, exits 1 if any p95 got more
+than PCT percent slower or any route issues more queries per request, so it can gate CI.
+
+    python -m benchmarks.load.compare base.json new.json --fail-over 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+
+def _pct(old: Optional[float], new: Optional[float]) -> str:
+    if old is None or new is None:
+        return "n/a"
+    if old == 0:
+        return "=" if new == 0 else "new"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], fail_over: Optional[float] = None) -> List[str]:
+    """Printable lines, plus a final "REGRESSION: ..." line per failed check."""
+    lines: List[str] = [
+        f"base {base['meta'].get('commit', '?')[:12]}  new {new['meta'].get('commit', '?')[:12]}",
+    ]
+    failures: List[str] = []
+    for mode, run in new["runs"].items():
+        old_run = base["runs"].get(mode)
+        if old_run is None:
+            continue
+        lines.append(f"\n[{mode}] requests/s {old_run['requests_per_second']} -> {run['requests_per_second']} "
+                     f"({_pct(old_run['requests_per_second'], run['requests_per_second'])})")
+        for op, stats in run["ops"].items():
+            old = old_run["ops"].get(op)
+            if old is None or "p50_ms" not in stats or "p50_ms" not in old:
+                continue
+            cols = [f"{k[:-3]} {old[k]:.1f} -> {stats[k]:.1f} ({_pct(old[k], stats[k])})" for k in ("p50_ms", "p95_ms", "p99_ms")]
+            lines.append(f"  {op:8} " + "  ".join(cols) + f"  /s {_pct(old['per_second'], stats['per_second'])}")
+            if fail_over is not None and old["p95_ms"] > 0 and (stats["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 > fail_over:
+                failures.append(f"{mode} {op} p95 {old['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms")
+        for route, db in run.get("db", {}).items():
+            old_db = old_run.get("db", {}).get(route)
+            if old_db is None:
+                continue
+            q_old, q_new = old_db["queries_per_request"], db["queries_per_request"]
+            lines.append(f"  {route}: queries/request {q_old} -> {q_new}, db ms/request "
+                         f"{old_db['db_ms_per_request']} -> {db['db_ms_per_request']}")
+            if fail_over is not None and q_new > q_old + 0.5:
+                failures.append(f"{mode} {route} queries/request {q_old} -> {q_new}")
+        old_mem, mem = old_run.get("memory", {}), run.get("memory", {})
+        lines.append(f"  peak RSS MB {old_mem.get('peak_rss_mb')} -> {mem.get('peak_rss_mb')}")
+    lines.extend(f"REGRESSION: {f}" for f in failures)
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("base")
+    ap.add_argument("new")
+    ap.add_argument("--fail-over", type=float, help="exit 1 if a p95 regresses by more than this percentage")
+    args = ap.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    lines = compare(base, new, args.fail_over)
+    print("\n".join(lines))
+    if any(line.startswith("REGRESSION") for line in lines):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
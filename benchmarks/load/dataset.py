@@ -0,0 +1,193 @@
+"""Synthetic nationwide dataset: detections clustered like a Greek fire season, plus votes.
+
+Most detections belong to fires around regions that burn most summers (Attica, Evia, the
+Peloponnese, Crete, Rhodes, Evros, ...), each fire a few hotspots within ~1 km; the rest are
+scattered over the whole country. Creation times are spread over `--hours`. Votes are
+skewed (a few detections near towns get most of them), arrive mostly in the first hours, and
+agree with whether the fire is real; the denormalized counters, status, hourly rollups and
+fire events are computed to match, as the API would have left them.
+
+    python -m benchmarks.load.dataset --out /tmp/hf-100k.db --detections 100000 --verifications 2000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..common import configure_env
+
+# (lat, lon, relative weight): areas with large fires in recent seasons.
+REGIONS: List[Tuple[float, float, float]] = [
+    (38.08, 23.80, 6.0),   # Attica
+    (38.80, 23.45, 4.0),   # Evia
+    (37.60, 21.65, 4.0),   # Ilia
+    (36.95, 22.55, 2.0),   # Laconia
+    (37.95, 22.90, 2.0),   # Corinthia
+    (35.25, 24.90, 2.5),   # Crete
+    (36.20, 27.95, 2.5),   # Rhodes
+    (40.95, 26.05, 3.0),   # Evros
+    (40.20, 23.60, 2.0),   # Halkidiki
+    (39.40, 22.40, 1.5),   # Thessaly
+    (39.65, 20.85, 1.0),   # Epirus
+    (39.60, 19.90, 1.0),   # Corfu
+    (38.40, 26.00, 1.0),   # Chios
+    (39.20, 26.30, 1.0),   # Lesvos
+]
+BBOX = (19.4, 34.8, 28.3, 41.8)  # west, south, east, north
+HOTSPOTS_PER_FIRE = 40
+NOISE_SHARE = 0.15
+EARLY_VOTE_SHARE = 0.4
+UNSEEN_SHARE = 0.6
+
+
+def _fire_centres(rnd: random.Random, n: int) -> List[Tuple[float, float]]:
+    weights = [w for _, _, w in REGIONS]
+    centres = []
+    for lat, lon, _ in rnd.choices(REGIONS, weights=weights, k=n):
+        # ~30 km around the region centre.
+        centres.append((lat + rnd.gauss(0, 0.27), lon + rnd.gauss(0, 0.27 / math.cos(math.radians(lat)))))
+    return centres
+
+
+def _positions(rnd: random.Random, n: int) -> List[Tuple[float, float]]:
+    n_noise = int(n * NOISE_SHARE)
+    centres = _fire_centres(rnd, max(1, (n - n_noise) // HOTSPOTS_PER_FIRE))
+    out = []
+    for i in range(n - n_noise):
+        clat, clon = centres[i % len(centres)]
+        out.append((clat + rnd.gauss(0, 0.004), clon + rnd.gauss(0, 0.005)))
+    west, south, east, north = BBOX
+    out += [(rnd.uniform(south, north), rnd.uniform(west, east)) for _ in range(n_noise)]
+    rnd.shuffle(out)
+    return out
+
+
+def _vote_counts(rnd: random.Random, positions: List[Tuple[float, float]], total: int) -> List[int]:
+    # Most detections get no votes at all (nobody around); the rest have heavy-tailed
+    # popularity, higher near Athens where most users are.
+    weights = []
+    for lat, lon in positions:
+        if rnd.random() < UNSEEN_SHARE:
+            weights.append(0.0)
+            continue
+        near = 1.0 + 4.0 * math.exp(-(((lat - 38.0) / 0.6) ** 2 + ((lon - 23.7) / 0.6) ** 2))
+        weights.append(rnd.paretovariate(1.3) * near)
+    scale = total / sum(weights)
+    counts = []
+    for w in weights:
+        x = w * scale
+        counts.append(int(x) + (1 if rnd.random() < x - int(x) else 0))
+    return counts
+
+
+def generate(
+    detections: int,
+    verifications: int,
+    hours: float = 72.0,
+    seed: int = 11,
+    events: bool = True,
+    chunk: int = 20_000,
+) -> Dict[str, Any]:
+    """Fill the configured (empty) database; returns what was written."""
+    from sqlalchemy import insert
+
+    from apps.api.app.clustering import cluster_all
+    from apps.api.app.db import get_session, init_db
+    from apps.api.app.geo import geohash_encode
+    from apps.api.app.models import DetectionStatus, Verdict, Verification
+    from apps.api.app.repositories import DataVersionRepository, DetectionRepository, MetricsRollupRepository
+    from apps.api.app.services import AggregatedCounts, VerificationService
+
+    init_db()
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    positions = _positions(rnd, detections)
+    votes_per = _vote_counts(rnd, positions, verifications)
+    t0 = time.perf_counter()
+    written = {"detections": 0, "verifications": 0, **{st.value: 0 for st in DetectionStatus}}
+    vote_no = 0
+
+    with get_session() as s:
+        status_of = VerificationService(s)._evaluate_status
+        for start in range(0, detections, chunk):
+            det_rows: List[Dict[str, Any]] = []
+            vote_rows: List[Dict[str, Any]] = []
+            for i in range(start, min(start + chunk, detections)):
+                lat, lon = positions[i]
+                created = now - timedelta(hours=rnd.uniform(0, hours))
+                real = rnd.random() < 0.85
+                counts = {Verdict.confirm: 0, Verdict.deny: 0, Verdict.unsure: 0}
+                early = 0
+                det_id = f"synth-{i:08d}"
+                for _ in range(votes_per[i]):
+                    r = rnd.random()
+                    if real:
+                        verdict = Verdict.confirm if r < 0.7 else Verdict.deny if r < 0.8 else Verdict.unsure
+                    else:
+                        verdict = Verdict.deny if r < 0.7 else Verdict.confirm if r < 0.8 else Verdict.unsure
+                    if rnd.random() < EARLY_VOTE_SHARE:
+                        at = min(now, created + timedelta(minutes=rnd.uniform(0, 30)))
+                        early += 1
+                    else:
+                        at = min(now, created + timedelta(minutes=30 + rnd.expovariate(1 / 180)))
+                    counts[verdict] += 1
+                    vote_rows.append({
+                        "detection_id": det_id, "created_at": at, "verdict": verdict,
+                        "device_fp_hash": f"{vote_no:064x}", "ip_hash": f"{rnd.randrange(50_000):064x}",
+                        "photo_path": None,
+                    })
+                    vote_no += 1
+                agg = AggregatedCounts(counts[Verdict.confirm], counts[Verdict.deny], counts[Verdict.unsure])
+                status = status_of(agg)
+                written[status.value] += 1
+                det_rows.append({
+                    "id": det_id, "lat": lat, "lon": lon, "created_at": created,
+                    "confidence": round(rnd.uniform(0.3, 0.99), 2), "source": rnd.choice(("firms_viirs", "firms_modis")),
+                    "fwi_bucket": rnd.choices(range(6), weights=(1, 2, 3, 3, 2, 1))[0], "wind_dir_deg": rnd.randrange(360),
+                    "status": status, "geohash": geohash_encode(lat, lon), "change_seq": 0, "updated_at": None,
+                    "confirms": agg.confirms, "denies": agg.denies, "unsure": agg.unsure, "early_votes": early,
+                })
+            DetectionRepository(s).insert_new(det_rows)
+            if vote_rows:
+                s.connection().execute(insert(Verification.__table__), vote_rows)  # type: ignore[attr-defined]
+            s.commit()
+            written["detections"] += len(det_rows)
+            written["verifications"] += len(vote_rows)
+
+        MetricsRollupRepository(s).rebuild()
+        seq = DataVersionRepository(s).bump()
+        if events:
+            written["events"] = cluster_all(s, seq).created
+        s.commit()
+    return {**written, "hours": hours, "seed": seed, "seconds": round(time.perf_counter() - t0, 1)}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--out", required=True, help="SQLite file to create")
+    ap.add_argument("--detections", type=int, default=100_000)
+    ap.add_argument("--verifications", type=int, default=2_000_000)
+    ap.add_argument("--hours", type=float, default=72.0, help="spread of detection times before now")
+    ap.add_argument("--seed", type=int, default=11)
+    ap.add_argument("--no-events", action="store_true", help="skip fire-event clustering")
+    args = ap.parse_args(argv)
+
+    out = os.path.abspath(args.out)
+    if os.path.exists(out):
+        ap.error(f"{out} exists")
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(tmp, HF_DB_URL=f"sqlite:///{out}")
+        result = generate(args.detections, args.verifications, args.hours, args.seed, events=not args.no_events)
+    print(json.dumps({"path": out, **result}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""Mixed-workload load test of the whole app, with a JSON report to compare between commits.
+
+Each mode gets its own copy of a dataset (`--dataset`, made with `benchmarks.load.dataset`;
+by default a small one is generated) and `--concurrency` clients that, for `--seconds`, pick
+operations by the `--mix` weights:
+
+- map: GET /api/detections for a random viewport over the burning regions (list_detections)
+- tile: GET /api/tiles/{z}/{x}/{y}?format=binary, what the web map loads
+- metrics: GET /api/metrics (MetricsService.compute; every vote invalidates its cache)
+- verify: POST /api/detections/{id}/verify from a new device (VerificationService.submit)
+- photo: the same with a 640x480 JPEG attached
+
+Modes: `inprocess` drives the ASGI app on this event loop through httpx (no network, app
+cost only); `uvicorn` starts `uvicorn --workers N` and goes over TCP. The report has
+p50/p95/p99 latency, throughput and status codes per operation, SQL statements and DB time
+per request by route (from /api/ops/metrics; with several workers that samples one of them;
+votes queued to the group-commit writer run their SQL outside the request) and the RSS of
+the serving process(es).
+
+    python -m benchmarks.load --dataset /tmp/hf-100k.db --seconds 30 --out base.json
+    python -m benchmarks.load.compare base.json new.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..common import configure_env, summary
+from .dataset import REGIONS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_MIX = "map=35,tile=25,metrics=15,verify=20,photo=5"
+MODES = ("inprocess", "uvicorn")
+
+_PROM_LINE = re.compile(r"^(\w+)\{(.*)\} (\S+)$")  # route labels contain braces
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"map", "tile", "metrics", "verify", "photo"}
+    if unknown:
+        raise ValueError(f"unknown operation(s): {', '.join(sorted(unknown))}")
+    return mix
+
+
+def _jpeg() -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 480), (200, 90, 40)).save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def _copy_db(src: str, dst: str) -> None:
+    # The backup API also picks up a WAL the generator may have left behind.
+    with sqlite3.connect(src) as a, sqlite3.connect(dst) as b:
+        a.backup(b)
+
+
+def _dataset_info(path: str) -> Dict[str, Any]:
+    with sqlite3.connect(path) as c:
+        return {
+            "detections": c.execute("SELECT count(*) FROM detection").fetchone()[0],
+            "verifications": c.execute("SELECT count(*) FROM verification").fetchone()[0],
+        }
+
+
+def _vote_targets(path: str, n: int = 5000) -> List[str]:
+    with sqlite3.connect(path) as c:
+        rows = c.execute(
+            "SELECT id FROM detection WHERE status != 'dismissed' ORDER BY created_at DESC LIMIT ?", (n,)
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def _rss_mb(pids: List[int]) -> Dict[str, Optional[float]]:
+    """Current and peak resident set size summed over `pids` (Linux /proc; None elsewhere)."""
+    rss = hwm = 0
+    try:
+        for pid in pids:
+            with open(f"/proc/{pid}/status", encoding="ascii") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("VmHWM:"):
+                        hwm += int(line.split()[1])
+    except OSError:
+        return {"rss_mb": None, "peak_rss_mb": None}
+    return {"rss_mb": round(rss / 1024, 1), "peak_rss_mb": round(hwm / 1024, 1)}
+
+
+def _children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _db_counters(text: str) -> Dict[Tuple[str, str], float]:
+    out: Dict[Tuple[str, str], float] = {}
+    for line in text.splitlines():
+        m = _PROM_LINE.match(line)
+        if not m or not m.group(1).startswith(("hf_http_request_db_queries_", "hf_http_request_db_seconds_")):
+            continue
+        labels = dict(re.findall(r'(\w+)="([^"]*)"', m.group(2)))
+        if m.group(1).endswith(("_sum", "_count")):
+            key = (m.group(1), f"{labels.get('method')} {labels.get('route')}")
+            out[key] = float(m.group(3))
+    return out
+
+
+def _db_report(before: Dict[Tuple[str, str], float], after: Dict[Tuple[str, str], float]) -> Dict[str, Any]:
+    delta = {k: v - before.get(k, 0.0) for k, v in after.items()}
+    report = {}
+    for (name, route), n in delta.items():
+        if name != "hf_http_request_db_queries_count" or n <= 0 or route.endswith("/api/ops/metrics"):
+            continue
+        report[route] = {
+            "requests": int(n),
+            "queries_per_request": round(delta.get(("hf_http_request_db_queries_sum", route), 0.0) / n, 2),
+            "db_ms_per_request": round(delta.get(("hf_http_request_db_seconds_sum", route), 0.0) / n * 1000, 2),
+        }
+    return dict(sorted(report.items()))
+
+
+class Workload:
+    """Picks and issues one operation at a time; records latency and status per operation."""
+
+    def __init__(self, mix: Dict[str, float], vote_ids: List[str], seed: int) -> None:
+        self.ops = [op for op, w in mix.items() if w > 0]
+        self.weights = [mix[op] for op in self.ops]
+        self.vote_ids = vote_ids
+        self.rnd = random.Random(seed)
+        self.photo = _jpeg() if "photo" in self.ops else b""
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.votes = 0
+
+    def _centre(self) -> Tuple[float, float]:
+        lat, lon, _ = self.rnd.choices(REGIONS, weights=[w for _, _, w in REGIONS])[0]
+        return lat + self.rnd.gauss(0, 0.3), lon + self.rnd.gauss(0, 0.3)
+
+    def _request(self, op: str) -> Tuple[str, str, Dict[str, Any]]:
+        if op == "map":
+            zoom = self.rnd.randint(7, 13)
+            lat, lon = self._centre()
+            # A phone-sized viewport: about 2 x 3 tiles.
+            half_w, half_h = 360.0 / (1 << zoom), 270.0 / (1 << zoom)
+            bbox = f"{lon - half_w:.5f},{lat - half_h:.5f},{lon + half_w:.5f},{lat + half_h:.5f}"
+            return "GET", "/api/detections", {"params": {"hours": 24, "bbox": bbox, "zoom": zoom}}
+        if op == "tile":
+            from apps.api.app.tiles import tile_for_point
+
+            lat, lon = self._centre()
+            z, x, y = tile_for_point(lat, lon, self.rnd.randint(6, 12))
+            return "GET", f"/api/tiles/{z}/{x}/{y}", {"params": {"hours": 24, "format": "binary"}}
+        if op == "metrics":
+            return "GET", "/api/metrics", {"params": {"window_hours": self.rnd.choice((24, 24, 24, 72))}}
+        self.votes += 1
+        det_id = self.rnd.choice(self.vote_ids)
+        kw: Dict[str, Any] = {
+            "data": {"verdict": self.rnd.choice(("confirm", "confirm", "deny", "unsure"))},
+            # Header, not the client's cookie jar, which all coroutines share.
+            "headers": {"cookie": f"hf_fp=load-{self.votes}-{self.rnd.random()}"},
+        }
+        if op == "photo":
+            kw["files"] = {"photo": ("fire.jpg", self.photo, "image/jpeg")}
+        return "POST", f"/api/detections/{det_id}/verify", kw
+
+    async def client(self, http: Any, deadline: float, record: bool) -> None:
+        while time.perf_counter() < deadline:
+            op = self.rnd.choices(self.ops, weights=self.weights)[0]
+            method, path, kw = self._request(op)
+            t0 = time.perf_counter()
+            try:
+                r = await http.request(method, path, **kw)
+                await r.aread()
+                status = str(r.status_code)
+            except Exception as e:  # a failed request is a data point
+                status = type(e).__name__
+            if record:
+                self.latencies[op].append(time.perf_counter() - t0)
+                self.statuses[op][status] += 1
+
+    def report(self, seconds: float) -> Dict[str, Any]:
+        ops = {}
+        for op in self.ops:
+            stats = summary(self.latencies[op])
+            stats["per_second"] = round(len(self.latencies[op]) / seconds, 1)
+            stats["statuses"] = dict(self.statuses[op])
+            ops[op] = {k: round(v, 2) if isinstance(v, float) else v for k, v in stats.items()}
+        total = sum(len(v) for v in self.latencies.values())
+        return {"ops": ops, "requests_per_second": round(total / seconds, 1)}
+
+
+async def _drive(http: Any, workload: Workload, concurrency: int, seconds: float, warmup: float) -> Dict[str, Any]:
+    before = _db_counters((await http.get("/api/ops/metrics")).text)
+    if warmup > 0:
+        end = time.perf_counter() + warmup
+        await asyncio.gather(*(workload.client(http, end, record=False) for _ in range(concurrency)))
+        before = _db_counters((await http.get("/api/ops/metrics")).text)
+    end = time.perf_counter() + seconds
+    await asyncio.gather(*(workload.client(http, end, record=True) for _ in range(concurrency)))
+    after = _db_counters((await http.get("/api/ops/metrics")).text)
+    return {**workload.report(seconds), "db": _db_report(before, after)}
+
+
+def run_inprocess(db: str, args: argparse.Namespace, mix: Dict[str, float]) -> Dict[str, Any]:
+    import httpx
+
+    from apps.api.app.main import app
+
+    workload = Workload(mix, _vote_targets(db), args.seed)
+
+    async def run() -> Dict[str, Any]:
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+                return await _drive(http, workload, args.concurrency, args.seconds, args.warmup)
+
+    result = asyncio.run(run())
+    result["memory"] = _rss_mb([os.getpid()])  # includes the load generator
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_uvicorn(db: str, args: argparse.Namespace, mix: Dict[str, float]) -> Dict[str, Any]:
+    import httpx
+
+    port = _free_port()
+    env = {**os.environ, "HF_DB_URL": f"sqlite:///{db}", "PYTHONPATH": REPO_ROOT}
+    cmd = [
+        sys.executable, "-m", "uvicorn", "apps.api.app.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    server = subprocess.Popen(cmd, cwd=REPO_ROOT, env=env)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 120
+        while True:
+            try:
+                if httpx.get(f"{base}/api/metrics", timeout=5).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if server.poll() is not None or time.time() > deadline:
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.2)
+
+        workload = Workload(mix, _vote_targets(db), args.seed)
+
+        async def run() -> Dict[str, Any]:
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as http:
+                return await _drive(http, workload, args.concurrency, args.seconds, args.warmup)
+
+        result = asyncio.run(run())
+        pids = [server.pid] + _children(server.pid)
+        result["memory"] = _rss_mb(pids)
+        result["workers"] = args.workers
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _git_revision() -> Dict[str, Any]:
+    def git(*a: str) -> str:
+        return subprocess.run(["git", *a], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--dataset", help="SQLite file from benchmarks.load.dataset (copied, never modified)")
+    ap.add_argument("--detections", type=int, default=20_000, help="size of the generated dataset without --dataset")
+    ap.add_argument("--verifications", type=int, default=200_000)
+    ap.add_argument("--modes", default=",".join(MODES), help="comma-separated: inprocess, uvicorn")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="operation weights")
+    ap.add_argument("--concurrency", type=int, default=16, help="clients with one request in flight each")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--warmup", type=float, default=2.0, help="seconds of unrecorded load first")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    ap.add_argument("--seed", type=int, default=5)
+    ap.add_argument("--out", help="write the JSON report here as well as to stdout")
+    args = ap.parse_args(argv)
+    mix = parse_mix(args.mix)
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    if set(modes) - set(MODES):
+        ap.error(f"--modes must be from {', '.join(MODES)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dbs = {mode: os.path.join(tmp, f"{mode}.db") for mode in modes}
+        # Settings are read once per process, so this process's app is pointed at its copy up
+        # front; uvicorn gets its own through the environment.
+        configure_env(tmp, HF_DB_URL=f"sqlite:///{dbs.get('inprocess', os.path.join(tmp, 'unused.db'))}")
+        dataset = args.dataset
+        if dataset is None:
+            dataset = os.path.join(tmp, "dataset.db")
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.load.dataset", "--out", dataset,
+                 "--detections", str(args.detections), "--verifications", str(args.verifications)],
+                cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL,
+            )
+        report: Dict[str, Any] = {
+            "meta": {
+                **_git_revision(),
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "dataset": {"path": args.dataset, **_dataset_info(dataset)},
+                "args": {k: v for k, v in vars(args).items() if k not in ("out", "dataset")},
+            },
+            "runs": {},
+        }
+        for mode in modes:
+            _copy_db(dataset, dbs[mode])
+            runner = run_uvicorn if mode == "uvicorn" else run_inprocess
+            report["runs"][mode] = runner(dbs[mode], args, mix)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
@@ -0,0 +1,130 @@
+"""Check that the hot queries are answered through an index, not a table scan.
+
+Runs the repository calls behind the map, tiles, metrics, votes, delta sync and archival
+against a synthetic dataset (or `--db`, e.g. one from benchmarks.load.dataset), captures the
+SQL they issue and prints SQLite's EXPLAIN QUERY PLAN for each. Exits 1 if any of them scans
+`detection` or `verification` (with or without an index) instead of searching, so it can gate
+CI next to the load comparison.
+
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --db /tmp/hf-100k.db --analyze
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List, Optional, Tuple
+
+from .common import configure_env
+
+# Full passes over the big tables; SQLite writes "SCAN <table> [USING [COVERING] INDEX ...]".
+TABLE_SCAN = re.compile(r"^SCAN (detection|verification)\b")
+ATTICA = (23.5, 37.8, 24.1, 38.3)
+
+
+def _hot_queries() -> List[Tuple[str, Callable[[Any], Any]]]:
+    from apps.api.app.geojson import EVENT_COLUMNS, FEATURE_COLUMNS
+    from apps.api.app.models import Verdict, Verification
+    from apps.api.app.repositories import (
+        DetectionRepository,
+        FireEventRepository,
+        MetricsRollupRepository,
+        VerificationRepository,
+    )
+
+    now = datetime.now(timezone.utc)
+    det_id, device = "synth-00000001", f"{1:064x}"
+    vote = Verification(
+        detection_id=det_id, created_at=now, verdict=Verdict.confirm, device_fp_hash=device, ip_hash=device
+    )
+    return [
+        ("map", lambda s: list(DetectionRepository(s).iter_recent_rows(FEATURE_COLUMNS, 24, 0.5))),
+        ("map bbox", lambda s: list(DetectionRepository(s).iter_recent_rows(FEATURE_COLUMNS, 24, 0.5, bbox=ATTICA))),
+        ("map list", lambda s: DetectionRepository(s).list_recent(6, 0.0)),
+        ("clusters", lambda s: DetectionRepository(s).clusters(72, 0.0, 4, bbox=ATTICA)),
+        ("get_many", lambda s: DetectionRepository(s).get_many([det_id, "synth-00000002"])),
+        ("changes", lambda s: DetectionRepository(s).changes_since(10**9, FEATURE_COLUMNS, hours=24)),
+        ("metrics head", lambda s: DetectionRepository(s).window_totals(now - timedelta(hours=1), now)),
+        ("metrics votes", lambda s: VerificationRepository(s).count_total_in_window(now - timedelta(hours=1), now)),
+        ("metrics rollup", lambda s: MetricsRollupRepository(s).sum_since(now - timedelta(hours=72))),
+        ("vote check", lambda s: VerificationRepository(s).exists_for_device(det_id, device)),
+        ("vote insert", lambda s: VerificationRepository(s).add_once(vote)),
+        ("vote counts", lambda s: VerificationRepository(s).counts(det_id)),
+        ("events", lambda s: list(FireEventRepository(s).iter_recent_rows(EVENT_COLUMNS, 24, 0.5))),
+        ("archive ids", lambda s: DetectionRepository(s).ids_created_between(now - timedelta(days=40), now - timedelta(days=39))),
+        ("archive votes", lambda s: VerificationRepository(s).column_dicts_for_detections([det_id])),
+    ]
+
+
+def check(analyze: bool = False) -> List[str]:
+    """Printable lines, plus a final "SCAN: ..." line per query that scans a big table."""
+    from sqlalchemy import event, text
+
+    from apps.api.app.db import engine, get_session
+
+    if analyze:
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+    captured: List[Tuple[str, Any]] = []
+
+    def _capture(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        if not executemany and not statement.startswith("EXPLAIN"):
+            captured.append((statement, parameters))
+
+    lines: List[str] = []
+    failures: List[str] = []
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        for name, run in _hot_queries():
+            with get_session() as s:
+                captured.clear()
+                run(s)
+                statements = list(captured)
+                for statement, params in statements:
+                    plan = [row[3] for row in s.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, params)]
+                    lines.append(f"{name}: {' '.join(statement.split())[:120]}")
+                    for step in plan:
+                        lines.append(f"    {step}")
+                        if TABLE_SCAN.match(step):
+                            failures.append(f"{name}: {step}")
+                s.rollback()
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+    lines.extend(f"SCAN: {f}" for f in failures)
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", help="SQLite file to check (copied first); default: a fresh synthetic dataset")
+    ap.add_argument("--detections", type=int, default=5000)
+    ap.add_argument("--verifications", type=int, default=50000)
+    ap.add_argument("--analyze", action="store_true", help="run ANALYZE first, as a tuned deployment would")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(tmp)
+        if args.db:
+            shutil.copyfile(args.db, os.path.join(tmp, "bench.db"))
+            from apps.api.app.db import init_db
+
+            init_db()  # brings an older file's indexes up to date
+        else:
+            from .load.dataset import generate
+
+            generate(args.detections, args.verifications)
+        lines = check(args.analyze)
+    print("\n".join(lines))
+    if any(line.startswith("SCAN") for line in lines):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
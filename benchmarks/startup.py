@@ -0,0 +1,144 @@
+"""Cold start: app import time and time to first response of a fresh uvicorn worker.
+
+Every sample is a new Python process, as after a scale-to-zero host wakes up:
+
+- import: `import apps.api.app.main` alone (`--top N` also lists the N slowest modules)
+- first response, empty database: uvicorn start until the first 200 from GET /api/detections,
+  with the worker preparing schema and seed itself (HF_DB_INIT=auto on a new DB)
+- first response, prepared database: the same after `cli init` ran (as gunicorn's pre-fork hook
+  does), so the worker only checks the schema version
+- first response, prepared copy of --db: as above on a copy of a real-sized database
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --runs 5 --db /tmp/hf-100k.db --top 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_IMPORT = "import time; t = time.perf_counter(); import apps.api.app.main; print(time.perf_counter() - t)"
+
+
+def _env(tmp: str) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT,
+        "HF_DB_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        "HF_PHOTOS_DIR": os.path.join(tmp, "photos"),
+        "HF_DB_INIT": "auto",
+    }
+
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_seconds(tmp: str) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT], cwd=REPO_ROOT, env=_env(tmp), check=True, capture_output=True, text=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(tmp: str, top: int) -> List[Tuple[int, str]]:
+    """(self time in us, module) of the `top` slowest modules of one import."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import apps.api.app.main"],
+        cwd=REPO_ROOT, env=_env(tmp), check=True, capture_output=True, text=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def first_response_seconds(tmp: str) -> float:
+    import httpx
+
+    port = _free_port()
+    cmd = [
+        sys.executable, "-m", "uvicorn", "apps.api.app.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ]
+    t0 = time.perf_counter()
+    server = subprocess.Popen(cmd, cwd=REPO_ROOT, env=_env(tmp))
+    try:
+        deadline = t0 + 120
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/api/detections", timeout=30).status_code == 200:
+                    return time.perf_counter() - t0
+            except httpx.HTTPError:
+                pass
+            if server.poll() is not None or time.perf_counter() > deadline:
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _prepare(tmp: str, db: Optional[str]) -> None:
+    if db is not None:
+        shutil.copyfile(db, os.path.join(tmp, "bench.db"))
+    subprocess.run(
+        [sys.executable, "-m", "apps.api.app.cli", "init"],
+        cwd=REPO_ROOT, env=_env(tmp), check=True, stdout=subprocess.DEVNULL,
+    )
+
+
+def sample(runs: int, measure: Callable[[str], float], setup: Optional[Callable[[str], None]] = None) -> Dict[str, float]:
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            if setup is not None:
+                setup(tmp)
+            samples.append(measure(tmp))
+    return {"median_ms": statistics.median(samples) * 1000, "max_ms": max(samples) * 1000}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5, help="fresh processes per scenario")
+    ap.add_argument("--db", help="also measure on a copy of this SQLite database")
+    ap.add_argument("--top", type=int, default=0, help="list the N slowest modules of the import")
+    args = ap.parse_args()
+
+    scenarios: List[Tuple[str, Callable[[str], float], Optional[Callable[[str], None]]]] = [
+        ("import", import_seconds, None),
+        ("first response, empty database", first_response_seconds, None),
+        ("first response, prepared database", first_response_seconds, lambda tmp: _prepare(tmp, None)),
+    ]
+    if args.db:
+        scenarios.append(
+            ("first response, prepared copy of --db", first_response_seconds, lambda tmp: _prepare(tmp, args.db))
+        )
+    for name, measure, setup in scenarios:
+        stats = sample(args.runs, measure, setup)
+        print(f"{name}: " + ", ".join(f"{k}={v:.1f}" for k, v in stats.items()))
+
+    if args.top:
+        with tempfile.TemporaryDirectory() as tmp:
+            for self_us, module in slowest_imports(tmp, args.top):
+                print(f"  {self_us / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
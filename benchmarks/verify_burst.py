@@ -0,0 +1,127 @@
+"""GET latency while a burst of votes is being written.
+
+Runs the app in-process (one event loop, like a single uvicorn worker) against a throwaway
+SQLite DB: first GET /api/detections alone, then the same GET load alongside concurrent
+POST /api/detections/{id}/verify calls, and prints latency percentiles for both phases.
+
+`loop_lag` is how late a 10 ms sleep on the same loop wakes up: if the verify path blocked
+the loop it would track the write time. GET latency also rises during the burst because
+every vote bumps the data version and so invalidates the cached /api/detections body.
+
+Exits 1 when, against the reads-only phase, GET p95 grows by more than `--max-get-p95-ratio`
+or loop lag p95 by more than `--max-loop-lag-ms`.
+
+    python -m benchmarks.verify_burst --seconds 5 --readers 8 --writers 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from .common import configure_env, seed_detections, summary
+
+
+async def _phase(app, seconds: float, readers: int, writers: int, ids: List[str]) -> Dict[str, Dict[str, float]]:
+    import httpx
+
+    deadline = time.perf_counter() + seconds
+    get_lat: List[float] = []
+    post_lat: List[float] = []
+    next_vote = iter(range(len(ids) * 1000))
+
+    async def reader(client: httpx.AsyncClient) -> None:
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            r = await client.get("/api/detections", params={"hours": 24})
+            get_lat.append(time.perf_counter() - t0)
+            r.raise_for_status()
+
+    async def writer(client: httpx.AsyncClient, w: int) -> None:
+        while time.perf_counter() < deadline:
+            n = next(next_vote)
+            t0 = time.perf_counter()
+            r = await client.post(
+                f"/api/detections/{ids[n % len(ids)]}/verify",
+                data={"verdict": "unsure"},
+                cookies={"hf_fp": f"bench-{w}-{n}"},
+            )
+            post_lat.append(time.perf_counter() - t0)
+            if r.status_code not in (200, 409, 410):
+                r.raise_for_status()
+
+    async def probe() -> None:
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag.append(time.perf_counter() - t0 - 0.01)
+
+    lag: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(
+            probe(),
+            *(reader(client) for _ in range(readers)),
+            *(writer(client, w) for w in range(writers)),
+        )
+    out = {"loop_lag": summary(lag), "get": summary(get_lat)}
+    if writers:
+        out["verify"] = summary(post_lat)
+        out["verify"]["per_second"] = len(post_lat) / seconds
+    return out
+
+
+def check(
+    baseline: Dict[str, Dict[str, float]], burst: Dict[str, Dict[str, float]], args: argparse.Namespace
+) -> List[str]:
+    """Threshold violations of the burst phase relative to the reads-only one."""
+    failures: List[str] = []
+    base_get, burst_get = baseline["get"]["p95_ms"], burst["get"]["p95_ms"]
+    if burst_get > base_get * args.max_get_p95_ratio:
+        failures.append(
+            f"GET p95 {burst_get:.1f} ms is over {args.max_get_p95_ratio:g}x the reads-only {base_get:.1f} ms"
+        )
+    base_lag, burst_lag = baseline["loop_lag"]["p95_ms"], burst["loop_lag"]["p95_ms"]
+    if burst_lag - base_lag > args.max_loop_lag_ms:
+        failures.append(
+            f"loop lag p95 {burst_lag:.1f} ms is over {args.max_loop_lag_ms:g} ms above the reads-only {base_lag:.1f} ms"
+        )
+    return failures
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--readers", type=int, default=8)
+    ap.add_argument("--writers", type=int, default=16)
+    ap.add_argument("--detections", type=int, default=2000)
+    ap.add_argument("--max-get-p95-ratio", type=float, default=10.0, help="burst GET p95 / reads-only GET p95")
+    ap.add_argument("--max-loop-lag-ms", type=float, default=50.0, help="burst minus reads-only loop lag p95")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(tmp)
+        ids = seed_detections(args.detections)
+        from apps.api.app.main import app
+
+        results: List[Tuple[str, Dict[str, Dict[str, float]]]] = []
+        for name, writers in (("reads only", 0), ("reads + verify burst", args.writers)):
+            result = asyncio.run(_phase(app, args.seconds, args.readers, writers, ids))
+            results.append((name, result))
+            print(f"{name}:")
+            for kind, stats in result.items():
+                print("  " + kind + ": " + ", ".join(f"{k}={v:.1f}" for k, v in stats.items()))
+
+    failures = check(results[0][1], results[1][1], args)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
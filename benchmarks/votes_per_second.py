@@ -0,0 +1,129 @@
+"""Verification throughput (votes/s) with several worker processes on one SQLite file.
+
+Each scenario gets a fresh DB. `--workers` processes (like `gunicorn -w N`) each run the app
+in-process and keep `--concurrency` POST /api/detections/{id}/verify calls in flight for
+`--seconds`; every vote is from a new device so none is refused. Scenarios:
+
+- baseline: default SQLite settings, one commit per vote
+- sqlite production: HF_SQLITE_PRODUCTION (WAL, synchronous=NORMAL, busy_timeout, mmap)
+- production + group commit: the above plus HF_GROUP_COMMIT
+
+    python -m benchmarks.votes_per_second --workers 2 --concurrency 16 --seconds 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from .common import configure_env, seed_detections, summary
+
+SCENARIOS: List[Tuple[str, Dict[str, str]]] = [
+    ("baseline", {"HF_SQLITE_PRODUCTION": "0", "HF_GROUP_COMMIT": "0"}),
+    ("sqlite production", {"HF_SQLITE_PRODUCTION": "1", "HF_GROUP_COMMIT": "0"}),
+    ("production + group commit", {"HF_SQLITE_PRODUCTION": "1", "HF_GROUP_COMMIT": "1"}),
+]
+
+
+def _seed(tmp: str, env: Dict[str, str], n: int, out: "mp.Queue[List[str]]") -> None:
+    configure_env(tmp, **env)
+    out.put(seed_detections(n))
+
+
+def _worker(
+    tmp: str,
+    env: Dict[str, str],
+    worker: int,
+    ids: List[str],
+    args: argparse.Namespace,
+    start: "mp.synchronize.Barrier",
+    out: "mp.Queue[Tuple[int, List[float], int]]",
+) -> None:
+    configure_env(tmp, **env)
+    import httpx
+
+    from apps.api.app.main import app
+    from apps.api.app.services import vote_writer
+
+    async def run() -> Tuple[List[float], int]:
+        latencies: List[float] = []
+        errors = 0
+        counter = iter(range(10**9))
+        deadline = time.perf_counter() + args.seconds
+
+        async def client_loop(client: httpx.AsyncClient) -> None:
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                n = next(counter)
+                t0 = time.perf_counter()
+                r = await client.post(
+                    f"/api/detections/{ids[(worker * 7919 + n) % len(ids)]}/verify",
+                    data={"verdict": "unsure"},
+                    cookies={"hf_fp": f"bench-{worker}-{n}"},
+                )
+                if r.status_code == 200:
+                    latencies.append(time.perf_counter() - t0)
+                else:
+                    errors += 1
+
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        vote_writer.stop()
+        return latencies, errors
+
+    start.wait()
+    latencies, errors = asyncio.run(run())
+    out.put((worker, latencies, errors))
+
+
+def run_scenario(env: Dict[str, str], args: argparse.Namespace) -> Dict[str, float]:
+    ctx = mp.get_context("spawn")  # fresh imports, so each process reads its own settings
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded: "mp.Queue[List[str]]" = ctx.Queue()
+        p = ctx.Process(target=_seed, args=(tmp, env, args.detections, seeded))
+        p.start()
+        ids = seeded.get()
+        p.join()
+
+        start = ctx.Barrier(args.workers)
+        out: "mp.Queue[Tuple[int, List[float], int]]" = ctx.Queue()
+        procs = [
+            ctx.Process(target=_worker, args=(tmp, env, w, ids, args, start, out)) for w in range(args.workers)
+        ]
+        for proc in procs:
+            proc.start()
+        latencies: List[float] = []
+        errors = 0
+        for _ in procs:
+            _, lat, err = out.get()
+            latencies.extend(lat)
+            errors += err
+        for proc in procs:
+            proc.join()
+
+    stats = summary(latencies)
+    stats["votes_per_second"] = len(latencies) / args.seconds
+    stats["errors"] = errors
+    return stats
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--concurrency", type=int, default=16, help="requests in flight per worker")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--detections", type=int, default=2000)
+    args = ap.parse_args()
+
+    for name, env in SCENARIOS:
+        stats = run_scenario(env, args)
+        print(f"{name}: " + ", ".join(f"{k}={v:.1f}" for k, v in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Payload size and server encode time of the /api/detections formats.
+
+Encodes `--detections` synthetic FIRMS-like detections (ids of the real ingest shape, random
+positions over Greece, spread over a day) as geojson, columnar and binary, and reports bytes
+raw and gzipped (what a mobile client downloads) plus encode time.
+
+    python -m benchmarks.wire_formats --detections 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Sequence, Tuple
+
+
+def synth(n: int, seed: int = 3) -> List[Tuple[Any, ...]]:
+    from apps.api.app.models import DetectionStatus
+
+    rnd = random.Random(seed)
+    start = datetime(2026, 8, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(n):
+        lat, lon = rnd.uniform(34.8, 41.8), rnd.uniform(19.3, 29.7)
+        at = start + timedelta(seconds=rnd.randrange(86400))
+        rows.append((
+            f"firms-viirs-N-{at:%Y%m%d%H%M}-{lat:.3f}-{lon:.3f}", lat, lon, at, round(rnd.uniform(0.3, 0.99), 2),
+            "firms_viirs", rnd.randrange(6), rnd.randrange(360), DetectionStatus.unconfirmed,
+            rnd.randrange(3), rnd.randrange(2), 0,
+        ))
+    rows.sort(key=lambda r: r[3], reverse=True)
+    return rows
+
+
+def measure(rows: Sequence[Tuple[Any, ...]], fmt: str, repeat: int = 3) -> Dict[str, Any]:
+    from apps.api.app.geojson import encode_detections
+
+    best = float("inf")
+    body = b""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = b"".join(encode_detections(rows, format=fmt))
+        best = min(best, time.perf_counter() - t0)
+    return {"bytes": len(body), "gzip_bytes": len(gzip.compress(body, 6)), "encode_ms": round(best * 1000, 1)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--detections", type=int, default=20_000)
+    args = ap.parse_args()
+
+    rows = synth(args.detections)
+    report: Dict[str, Any] = {"detections": args.detections}
+    for fmt in ("geojson", "columnar", "binary"):
+        report[fmt] = measure(rows, fmt)
+    for fmt in ("columnar", "binary"):
+        report[fmt]["vs_geojson"] = round(report["geojson"]["bytes"] / report[fmt]["bytes"], 1)
+        report[fmt]["gzip_vs_geojson"] = round(report["geojson"]["gzip_bytes"] / report[fmt]["gzip_bytes"], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
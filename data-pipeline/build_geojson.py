@@ -1,28 +1,138 @@
-"""Export detections from DB to GeoJSON (optional)."""
+"""Publish the map's detections as static GeoJSON snapshots.
+
+    PYTHONPATH=. python data-pipeline/build_geojson.py [--out DIR] [--windows 6,24,72]
+
+For each window writes `detections-<hours>h.geojson` (compact JSON, dismissed detections left
+out, like GET /api/detections) plus `.gz` and `.br` siblings into HF_SNAPSHOT_DIR, which the API
+serves at /snapshots/ with the precompressed variant the client accepts. Every file is written
+under a temporary name and renamed into place, so readers never see a partial snapshot.
+
+`manifest.json` records the data version the snapshots were built from. While it is current
+nothing is rewritten, except that snapshots older than --max-age-minutes are refreshed anyway
+because detections age out of the windows. Run it from cron or after each ingestion.
+"""
 
 from __future__ import annotations
 
+import argparse
+import gzip
 import json
-from pathlib import Path
-from sqlmodel import Session
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None  # type: ignore[assignment]
+
+from apps.api.app.config import settings
+from apps.api.app.db import get_session, init_db
+from apps.api.app.geojson import FEATURE_COLUMNS, iter_feature_collection
+from apps.api.app.repositories import DataVersionRepository, DetectionRepository
+
+MANIFEST = "manifest.json"
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
 
-from apps.api.app.db import engine
-from apps.api.app.repositories import DetectionRepository
-from apps.api.app.services import VerificationService
-from apps.api.app.geojson import detections_to_feature_collection
+def _read_manifest(out_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
 
-def export(path: str = "public/data/detections.geojson", hours: int = 24) -> None:
-    p = Path(path)
-    p.parent.mkdir(parents=True, exist_ok=True)
-    with Session(engine) as s:
+def parse_windows(value: str) -> List[int]:
+    return sorted({int(h) for h in value.split(",") if h.strip()})
+
+
+def publish(
+    out_dir: Optional[str] = None,
+    windows: Optional[Sequence[int]] = None,
+    max_age_minutes: float = 15.0,
+    force: bool = False,
+) -> Dict[str, Any]:
+    """Rebuild the snapshots if the data changed; returns the manifest (with `skipped`)."""
+    out_dir = out_dir or settings.snapshot_dir
+    windows = list(windows) if windows is not None else parse_windows(settings.snapshot_windows_hours)
+    os.makedirs(out_dir, exist_ok=True)
+    init_db()
+
+    previous = _read_manifest(out_dir)
+    with get_session() as s:
+        version = DataVersionRepository(s).current()
+        if (
+            not force
+            and previous is not None
+            and previous.get("version") == version
+            and previous.get("windows") == windows
+            and time.time() - previous.get("published_at_epoch", 0) < max_age_minutes * 60
+        ):
+            return {**previous, "skipped": True}
+
         repo = DetectionRepository(s)
-        items = repo.list_recent(hours=hours, min_confidence=0.0, include_dismissed=False)
-        vs = VerificationService(s)
-        enriched = [{"detection": d, "counts": vs.get_counts(d.id).as_dict()} for d in items]
-        fc = detections_to_feature_collection(enriched)
-    p.write_text(json.dumps(fc, ensure_ascii=False, indent=2), encoding="utf-8")
+        files: Dict[str, Dict[str, int]] = {}
+        for hours in windows:
+            rows = repo.iter_recent_rows(FEATURE_COLUMNS, hours=hours, min_confidence=0.0, include_dismissed=False)
+            body = b"".join(iter_feature_collection(rows))
+            name = f"detections-{hours}h.geojson"
+            path = os.path.join(out_dir, name)
+            sizes = {"json": len(body)}
+            # Compressed siblings first: a client is never offered a variant older than the original.
+            gz = gzip.compress(body, compresslevel=9, mtime=0)
+            _write_atomic(path + ".gz", gz)
+            sizes["gz"] = len(gz)
+            if brotli is not None:
+                br = brotli.compress(body, quality=11)
+                _write_atomic(path + ".br", br)
+                sizes["br"] = len(br)
+            elif os.path.exists(path + ".br"):
+                os.unlink(path + ".br")  # would go stale
+            _write_atomic(path, body)
+            files[name] = sizes
+
+    now = time.time()
+    manifest = {
+        "version": version,
+        "windows": windows,
+        "published_at": datetime.fromtimestamp(now, tz=timezone.utc).isoformat(),
+        "published_at_epoch": now,
+        "files": files,
+    }
+    _write_atomic(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=2).encode("utf-8"))
+    return {**manifest, "skipped": False}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Publish static GeoJSON snapshots of recent detections.")
+    ap.add_argument("--out", help=f"output directory (default HF_SNAPSHOT_DIR, {settings.snapshot_dir})")
+    ap.add_argument("--windows", help=f"comma-separated hours (default {settings.snapshot_windows_hours})")
+    ap.add_argument("--max-age-minutes", type=float, default=15.0, help="refresh unchanged snapshots this old")
+    ap.add_argument("--force", action="store_true", help="rebuild even if the data version is unchanged")
+    args = ap.parse_args()
+
+    result = publish(
+        args.out,
+        parse_windows(args.windows) if args.windows else None,
+        max_age_minutes=args.max_age_minutes,
+        force=args.force,
+    )
+    print(json.dumps({k: result[k] for k in ("version", "skipped", "files")}))
 
 
 if __name__ == "__main__":
-    export()
+    main()
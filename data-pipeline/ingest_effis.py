@@ -1,7 +1,150 @@
-"""Stub: EFFIS FWI ingestion (Python)."""
+"""EFFIS FWI ingestion: sample a daily Fire Weather Index grid at that day's detections.
+
+    PYTHONPATH=. python data-pipeline/ingest_effis.py fwi_2026-08-01.npy [--method nearest]
+
+The grid is a 2-D float `.npy` (row 0 is the northern edge, NaN = no data) with a JSON
+sidecar of the same name, `fwi_2026-08-01.json`:
+{"date": "2026-08-01", "west": 19.0, "south": 34.0, "east": 30.0, "north": 42.0}
+(outer cell edges, degrees). EFFIS GeoTIFF/NetCDF exports convert with rasterio or xarray
+and `numpy.save`.
+
+The grid is memory-mapped, so only the cells around the detections are read. All of the
+day's detections are sampled in one vectorized lookup (bilinear by default), classed into
+EFFIS danger buckets 0..5, and the ones whose bucket changed are written in one bulk UPDATE
+that also bumps `change_seq`; the fire events they belong to get their `max_fwi_bucket` recomputed
+in the same transaction. Rerun it after each FIRMS import: detections that already have
+the right bucket are not touched.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+
+from apps.api.app.db import get_session, init_db
+from apps.api.app.models import Detection  # noqa: F401  (registers the tables for init_db)
+from apps.api.app.repositories import DataVersionRepository, DetectionRepository, FireEventRepository
+
+# EFFIS danger classes: very low < 5.2 <= low < 11.2 <= moderate < 21.3 <= high < 38 <=
+# very high < 50 <= extreme, i.e. buckets 0..5.
+FWI_CLASS_BOUNDS = np.array([5.2, 11.2, 21.3, 38.0, 50.0])
+
+
+@dataclass(frozen=True)
+class FwiGrid:
+    values: np.ndarray  # (rows, cols), usually a read-only memmap
+    west: float
+    south: float
+    east: float
+    north: float
+    day: date
+
+    @classmethod
+    def load(cls, path: str, day: Optional[date] = None) -> "FwiGrid":
+        with open(os.path.splitext(path)[0] + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        values = np.load(path, mmap_mode="r")
+        if values.ndim != 2:
+            raise ValueError(f"{path}: expected a 2-D grid, got shape {values.shape}")
+        return cls(
+            values=values,
+            west=float(meta["west"]),
+            south=float(meta["south"]),
+            east=float(meta["east"]),
+            north=float(meta["north"]),
+            day=day or date.fromisoformat(meta["date"]),
+        )
+
+    def sample(self, lats: np.ndarray, lons: np.ndarray, method: str = "bilinear") -> np.ndarray:
+        """FWI at each point; NaN outside the grid or where the grid has no data."""
+        rows, cols = self.values.shape
+        # Fractional indices in cell-centre coordinates: (0, 0) is the centre of the NW cell.
+        x = (lons - self.west) / (self.east - self.west) * cols - 0.5
+        y = (self.north - lats) / (self.north - self.south) * rows - 0.5
+        inside = (lons >= self.west) & (lons <= self.east) & (lats >= self.south) & (lats <= self.north)
+        x = np.clip(x, 0, cols - 1)
+        y = np.clip(y, 0, rows - 1)
+
+        r = np.floor(y + 0.5).astype(np.intp)
+        c = np.floor(x + 0.5).astype(np.intp)
+        out = np.asarray(self.values[r, c], dtype=np.float64)
+        if method == "bilinear" and rows > 1 and cols > 1:
+            r0 = np.minimum(np.floor(y).astype(np.intp), rows - 2)
+            c0 = np.minimum(np.floor(x).astype(np.intp), cols - 2)
+            fy, fx = y - r0, x - c0
+            v = self.values
+            bilinear = (
+                v[r0, c0] * (1 - fx) * (1 - fy)
+                + v[r0, c0 + 1] * fx * (1 - fy)
+                + v[r0 + 1, c0] * (1 - fx) * fy
+                + v[r0 + 1, c0 + 1] * fx * fy
+            )
+            # Next to a no-data cell (coast, grid edge) fall back to the nearest cell.
+            out = np.where(np.isnan(bilinear), out, bilinear)
+        elif method not in ("bilinear", "nearest"):
+            raise ValueError(f"Unknown method {method!r} (expected bilinear or nearest)")
+        out[~inside] = np.nan
+        return out
+
+
+def fwi_buckets(values: np.ndarray) -> np.ndarray:
+    return np.digitize(values, FWI_CLASS_BOUNDS).astype(np.int64)
+
+
+@dataclass
+class FwiStats:
+    detections: int = 0
+    no_data: int = 0
+    updated: int = 0
+
+
+def apply_grid(grid: FwiGrid, method: str = "bilinear") -> FwiStats:
+    """Set `fwi_bucket` from `grid` on the detections created on `grid.day` (UTC)."""
+    start = datetime(grid.day.year, grid.day.month, grid.day.day, tzinfo=timezone.utc)
+    stats = FwiStats()
+    with get_session() as s:
+        repo = DetectionRepository(s)
+        rows = repo.positions_between(start, start + timedelta(days=1))
+        stats.detections = len(rows)
+        if not rows:
+            return stats
+        ids, lats, lons, current, event_ids = zip(*rows)
+        values = grid.sample(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64), method)
+        known = ~np.isnan(values)
+        stats.no_data = int((~known).sum())
+        current_arr = np.asarray(current, dtype=np.int64)
+        buckets = np.where(known, fwi_buckets(np.nan_to_num(values)), current_arr)
+        changed = np.flatnonzero(buckets != current_arr)
+        if changed.size == 0:
+            return stats
+        seq = DataVersionRepository(s).bump()
+        ids_arr = np.asarray(ids, dtype=object)
+        stats.updated = repo.set_fwi_buckets(ids_arr[changed].tolist(), buckets[changed].tolist(), seq)
+        # Fire events carry the highest bucket of their members.
+        FireEventRepository(s).refresh({event_ids[i] for i in changed if event_ids[i] is not None}, seq)
+        s.commit()
+    return stats
+
 
 def main() -> None:
-    raise SystemExit("Not implemented for MVP; use the placeholder fwi_bucket.")
+    ap = argparse.ArgumentParser(description="Sample an EFFIS FWI grid at detections and set fwi_bucket.")
+    ap.add_argument("grid", help="FWI grid .npy with a .json sidecar (date and bounds)")
+    ap.add_argument("--date", help="UTC day to apply the grid to (default: the sidecar's date)")
+    ap.add_argument("--method", choices=("bilinear", "nearest"), default="bilinear")
+    args = ap.parse_args()
+
+    init_db()
+    t0 = time.perf_counter()
+    grid = FwiGrid.load(args.grid, date.fromisoformat(args.date) if args.date else None)
+    stats = apply_grid(grid, args.method)
+    print(json.dumps({**asdict(stats), "date": grid.day.isoformat(), "seconds": round(time.perf_counter() - t0, 2)}))
 
 
 if __name__ == "__main__":
@@ -1,15 +1,280 @@
-"""Stub: NASA FIRMS ingestion (Python).
+"""NASA FIRMS ingestion: stream active-fire CSVs into the `detection` table.
 
-In production:
-- Download FIRMS hotspot data
-- Normalize and upsert detections
-- Schedule via GitHub Actions/cron
+    PYTHONPATH=. python data-pipeline/ingest_firms.py PATH [PATH ...] [--bbox 19,34,30,42]
 
-MVP ships with seeded detections in the DB.
+PATH is a FIRMS CSV (MODIS or VIIRS layout, optionally .gz) or a mirror directory of them.
+Rows are parsed one at a time and inserted in batches, each batch in one transaction that
+also bumps the data version, the hourly rollups and `change_seq` (so running servers pick
+the new points up through their change feed) and groups the new hotspots into fire events
+(apps/api/app/clustering.py). Ids are derived from satellite, acquisition
+time and position rounded to 3 decimals, so re-importing a file inserts nothing.
+
+A checkpoint (byte offset per file, written after every committed batch) makes reruns and
+growing mirror files only read new rows.
 """
 
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from apps.api.app.clustering import EventClusterer
+from apps.api.app.db import get_session, init_db
+from apps.api.app.geo import BBox, geohash_encode, parse_bbox
+from apps.api.app.models import DetectionStatus
+from apps.api.app.repositories import DataVersionRepository, DetectionRepository, MetricsRollupRepository, floor_hour
+
+DEFAULT_CHECKPOINT = "./var/firms_checkpoint.json"
+
+# VIIRS reports confidence as a class, MODIS as 0-100.
+_CONFIDENCE_CLASSES = {"l": 0.3, "low": 0.3, "n": 0.6, "nominal": 0.6, "h": 0.9, "high": 0.9}
+_REQUIRED = ("latitude", "longitude", "acq_date", "acq_time", "confidence")
+_HEAD_BYTES = 4096
+
+
+@dataclass
+class IngestStats:
+    files: int = 0
+    rows: int = 0
+    invalid: int = 0
+    outside_bbox: int = 0
+    inserted: int = 0
+    batches: int = 0
+
+    @property
+    def duplicates(self) -> int:
+        return self.rows - self.invalid - self.outside_bbox - self.inserted
+
+
+class Checkpoint:
+    """{path: {offset, head}} in a JSON file.
+
+    `head` hashes the first bytes already read, so a file rewritten in place (rather than
+    appended to) is read again from the start.
+    """
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    def start_offset(self, path: str) -> int:
+        entry = self.files.get(os.path.abspath(path))
+        if entry is None:
+            return 0
+        offset = int(entry.get("offset", 0))
+        if offset > _file_size(path) or entry.get("head") != _head(path, offset):
+            return 0
+        return offset
+
+    def advance(self, path: str, offset: int) -> None:
+        self.files[os.path.abspath(path)] = {"offset": offset, "head": _head(path, offset)}
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f)
+        os.replace(tmp, self.path)
+
+
+def _open(path: str) -> IO[bytes]:
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def _file_size(path: str) -> int:
+    # For .gz the offsets are in the decompressed stream; the compressed size is only a bound.
+    return os.path.getsize(path) if not path.endswith(".gz") else 1 << 62
+
+
+def _head(path: str, offset: int) -> str:
+    with _open(path) as f:
+        return hashlib.sha1(f.read(min(offset, _HEAD_BYTES))).hexdigest()
+
+
+def iter_records(path: str, offset: int = 0) -> Iterator[Tuple[Dict[str, int], List[str], int]]:
+    """Yield (column index, fields, byte offset after the row), starting after `offset`."""
+    with _open(path) as f:
+        header_line = f.readline()
+        header = next(csv.reader([header_line.decode("utf-8-sig")]))
+        index = {name.strip().lower(): i for i, name in enumerate(header)}
+        missing = [c for c in _REQUIRED if c not in index]
+        if missing:
+            raise ValueError(f"{path}: not a FIRMS CSV (missing {', '.join(missing)})")
+        pos = len(header_line)
+        if offset > pos:
+            f.seek(offset)
+            pos = offset
+
+        def lines() -> Iterator[str]:
+            nonlocal pos
+            for raw in f:
+                pos += len(raw)
+                yield raw.decode("utf-8")
+
+        for fields in csv.reader(lines()):  # FIRMS rows never span lines, so `pos` is exact
+            if fields:
+                yield index, fields, pos
+
+
+def detection_id(instrument: str, satellite: str, acq_date: str, acq_time: str, lat: float, lon: float) -> str:
+    return f"firms-{instrument}-{satellite}-{acq_date.replace('-', '')}{acq_time}-{lat:.3f}-{lon:.3f}"
+
+
+def normalize(index: Dict[str, int], fields: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """FIRMS row -> full `detection` column dict, or None if the row is unusable."""
+    try:
+        lat = float(fields[index["latitude"]])
+        lon = float(fields[index["longitude"]])
+        acq_date = fields[index["acq_date"]].strip()
+        acq_time = fields[index["acq_time"]].strip().zfill(4)
+        created_at = datetime(
+            int(acq_date[0:4]), int(acq_date[5:7]), int(acq_date[8:10]),
+            int(acq_time[0:2]), int(acq_time[2:4]), tzinfo=timezone.utc,
+        )
+        raw_conf = fields[index["confidence"]].strip().lower()
+        confidence = _CONFIDENCE_CLASSES.get(raw_conf)
+        if confidence is None:
+            confidence = min(1.0, max(0.0, float(raw_conf) / 100.0))
+    except (KeyError, IndexError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+
+    i_inst, i_sat = index.get("instrument"), index.get("satellite")
+    instrument = (fields[i_inst].strip() if i_inst is not None else "") or ("VIIRS" if raw_conf.isalpha() else "MODIS")
+    satellite = fields[i_sat].strip() if i_sat is not None else ""
+    return {
+        "id": detection_id(instrument.lower(), satellite.lower(), acq_date, acq_time, lat, lon),
+        "lat": lat,
+        "lon": lon,
+        "created_at": created_at,
+        "confidence": round(confidence, 3),
+        "source": f"firms-{instrument.lower()}",
+        "fwi_bucket": 2,  # until ingest_effis.py applies the day's FWI grid
+        "wind_dir_deg": 0,
+        "status": DetectionStatus.unconfirmed,
+        "geohash": geohash_encode(lat, lon),
+        "change_seq": 0,
+        "updated_at": None,
+        "confirms": 0,
+        "denies": 0,
+        "unsure": 0,
+        "early_votes": 0,
+    }
+
+
+def _in_bbox(row: Dict[str, Any], bbox: Optional[BBox]) -> bool:
+    if bbox is None:
+        return True
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return min_lon <= row["lon"] <= max_lon and min_lat <= row["lat"] <= max_lat
+
+
+def commit_batch(rows: List[Dict[str, Any]], clusterer: EventClusterer) -> int:
+    """Insert the new rows of a batch and group them into fire events, in one transaction;
+    returns how many were new."""
+    with get_session() as s:
+        seq = DataVersionRepository(s).bump()
+        for r in rows:
+            r["change_seq"] = seq
+        inserted = DetectionRepository(s).insert_new(rows)
+        if not inserted:
+            s.rollback()  # nothing new: leave the data version (and every cache) alone
+            return 0
+        rollups = MetricsRollupRepository(s)
+        for hour, n in Counter(floor_hour(r["created_at"]) for r in inserted).items():
+            rollups.bump(hour, detections=n)
+        clusterer.assign(s, seq)
+        s.commit()
+        return len(inserted)
+
+
+def ingest_file(
+    path: str,
+    checkpoint: Checkpoint,
+    stats: IngestStats,
+    batch_size: int,
+    bbox: Optional[BBox],
+    clusterer: EventClusterer,
+) -> None:
+    batch: List[Dict[str, Any]] = []
+    offset = checkpoint.start_offset(path)
+    stats.files += 1
+
+    def flush(upto: int) -> None:
+        if batch:
+            stats.inserted += commit_batch(batch, clusterer)
+            stats.batches += 1
+            batch.clear()
+        checkpoint.advance(path, upto)
+
+    for index, fields, offset in iter_records(path, offset):
+        stats.rows += 1
+        row = normalize(index, fields)
+        if row is None:
+            stats.invalid += 1
+        elif not _in_bbox(row, bbox):
+            stats.outside_bbox += 1
+        else:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush(offset)
+    flush(offset)
+
+
+def _expand(paths: Sequence[str]) -> List[str]:
+    out: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(
+                os.path.join(p, name)
+                for name in sorted(os.listdir(p))
+                if name.endswith((".csv", ".csv.gz", ".txt"))
+            )
+        else:
+            out.append(p)
+    return out
+
+
+def ingest(
+    paths: Sequence[str],
+    checkpoint_path: Optional[str] = DEFAULT_CHECKPOINT,
+    batch_size: int = 5000,
+    bbox: Optional[BBox] = None,
+) -> IngestStats:
+    init_db()
+    checkpoint = Checkpoint(checkpoint_path)
+    stats = IngestStats()
+    clusterer = EventClusterer()  # keeps recent events in memory across batches and files
+    for path in _expand(paths):
+        ingest_file(path, checkpoint, stats, batch_size, bbox, clusterer)
+    return stats
+
+
 def main() -> None:
-    raise SystemExit("Not implemented for MVP; use the seeded detections.")
+    ap = argparse.ArgumentParser(description="Stream NASA FIRMS CSVs into the detection table.")
+    ap.add_argument("paths", nargs="+", help="FIRMS CSV files (.csv/.csv.gz) or mirror directories")
+    ap.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="checkpoint file ('' to disable)")
+    ap.add_argument("--batch-size", type=int, default=5000)
+    ap.add_argument("--bbox", help="only keep points inside min_lon,min_lat,max_lon,max_lat")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    stats = ingest(args.paths, args.checkpoint or None, args.batch_size, parse_bbox(args.bbox) if args.bbox else None)
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({**asdict(stats), "duplicates": stats.duplicates, "seconds": round(elapsed, 2)}))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,21 @@
+"""gunicorn settings for apps.api.app.main:app (read from the working directory).
+
+The schema and seed are prepared once in the master, before any worker is forked, so workers
+start with a single schema-version query (HF_DB_INIT=auto finds nothing to do).
+"""
+
+import os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from gunicorn.arbiter import Arbiter
+
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+bind = f"0.0.0.0:{os.getenv('PORT', '7860')}"
+
+
+def on_starting(server: "Arbiter") -> None:
+    from apps.api.app.bootstrap import prepare_before_fork
+
+    prepare_before_fork()